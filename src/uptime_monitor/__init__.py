@@ -1,19 +1,66 @@
 import asyncio
+import contextlib
+import fnmatch
+import itertools
+import json
 import logging
+import random
+import secrets
+import signal
 import smtplib
 import socket
-from datetime import datetime, timedelta
+import sys
+from collections import deque
+from datetime import timedelta, timezone
 from email.message import EmailMessage
-from typing import Dict
+from typing import Dict, List
 
 import aiohttp
 import ping3
 import pytz
 import yaml
+from aiohttp import web
 from rich.console import Console
 from rich.logging import RichHandler
 from rich.theme import Theme
 
+from uptime_monitor.assertions import ContentAssertion
+from uptime_monitor.clock import Clock
+from uptime_monitor.dependencies import DependencyGraph
+from uptime_monitor.executors import ExecutorFull, create_pools, open_file_limit
+from uptime_monitor.history import CheckHistory
+from uptime_monitor.maintenance import MaintenanceCalendar
+from uptime_monitor.metrics import CONTENT_TYPE, MonitorMetrics
+from uptime_monitor.notifications import WebhookNotifier
+from uptime_monitor.persistence import StateStore, decode_time, encode_time
+from uptime_monitor.priorities import RoundDispatcher
+from uptime_monitor.profiling import (
+    DEFAULT_SAMPLE_INTERVAL,
+    CostTracker,
+    CpuMeter,
+    StackSampler,
+    charge,
+    charging,
+)
+from uptime_monitor.probes import (
+    ProbeCoalescer,
+    group_by_probe,
+    probe_key,
+    target_key,
+)
+from uptime_monitor.push import PushTracker
+from uptime_monitor.rollups import UptimeRollups
+from uptime_monitor.routing import DEFAULT_ROUTE, AlertRouter
+from uptime_monitor.scheduling import IntervalScheduler
+from uptime_monitor.status_index import StatusIndex
+from uptime_monitor.tracing import (
+    HttpPhaseTimings,
+    create_trace_config,
+    transfer_sizes,
+)
+from uptime_monitor.transitions import TransitionLog
+from uptime_monitor.uplink import AGENT_HEADER, MAX_BATCH_BYTES, decode_batch
+
 # Initialize rich console with custom theme
 custom_theme = Theme(
     {
@@ -23,6 +70,7 @@ custom_theme = Theme(
         "maintenance": "yellow",
         "up": "green",
         "down": "red",
+        "unreachable": "magenta",
     }
 )
 console = Console(theme=custom_theme)
@@ -30,15 +78,140 @@ console = Console(theme=custom_theme)
 # Default timezone
 DEFAULT_TIMEZONE = "Europe/Berlin"
 
+# Retry settings, overridable globally and per service under `retry`. The
+# round deadline defaults to timeout * max_tries.
+DEFAULT_RETRY_POLICY = {
+    "deadline": None,
+    "backoff": 0.5,  # delay before the first retry, in seconds
+    "multiplier": 2.0,
+    "backoff_max": 10.0,
+    "jitter": 0.2,  # +/- fraction of the delay
+    "hedge_percentile": None,  # e.g. 0.95 to enable hedged attempts
+    "hedge_min_samples": 20,
+    "hedge_window": 100,  # successful latencies kept per service
+}
+
+# Runs of one agent whose sequence numbers are remembered for deduplication
+AGENT_RUNS_KEPT = 8
+
+# Where `--profile` writes the folded stacks
+DEFAULT_PROFILE_OUTPUT = "profile.folded"
+
+# Longest sleep of a service in maintenance before looking at its calendar
+# again; `reload_maintenance` wakes it sooner when its schedule changes
+MAINTENANCE_RECHECK = 300
+
+# Service settings `reload_maintenance` reads again from the config file
+MAINTENANCE_KEYS = ("maintenance", "maintenance_window", "timezone")
+
+# Actions of the control API, applied to the running monitor
+CONTROL_ACTIONS = ("pause", "resume", "mute", "unmute", "check")
+
+# Share of the open file limit the one-shot `check` command may use for
+# concurrent probes, each holding a socket
+CHECK_FD_SHARE = 0.5
+
 
 class ServiceMonitor:
-    def __init__(self, config_path: str):
+    def __init__(self, config_path: str, clock: Clock = None, persist: bool = True):
+        self.config_path = config_path
         self.config = self._load_config(config_path)
+        # Without persistence (one-shot commands) nothing is written to disk:
+        # no log file, state snapshot, history, transitions or rollups
+        self.persist = persist
+        # Source of all timestamps and sleeps, replaceable by a VirtualClock
+        self.clock = clock or Clock()
         self.service_states = {}  # Tracks current state of services
         self.down_since = {}  # Tracks when services went down
+        # Inverted indexes for filtered dashboard queries
+        self.status_index = StatusIndex(self.config.get("services", {}))
+        # Parent/child and composite relations between services
+        self.dependencies = DependencyGraph(self.config.get("services", {}))
+        self.unreachable = {}  # Service -> failed parent it sits behind
+        self._sleeping = {}  # Service -> task sleeping until its next round
+        self._woken = set()  # Services whose sleep was cut short
+        self._round_waiters = {}  # Service -> children awaiting its next round
+        # Push services ping us; one heap tracks all their deadlines
+        self.push = PushTracker(self.config.get("services", {}))
+        self._push_changed = None  # Set when the earliest deadline may move
+        self._push_updates = set()  # Push services with a state change pending
+        # Remote probe agents and the last result sequence per agent run
+        self.agents = self.config.get("agents") or {}
+        self._agent_runs = {}
+        # Changed at runtime through the control API
+        self.paused = set()  # Services not checked until resumed
+        self.muted = set()  # Services whose status changes aren't alerted
+        self._forced = {}  # Service -> waiter of the round a check-now started
+        # Adaptive check intervals within the global probe budget
+        self.scheduler = IntervalScheduler(self.config)
+        # Services probing the same target share one probe
+        self.probe_dedup_config = self.config.get("probe_dedup", {})
+        self.probe_coalescer = ProbeCoalescer(
+            self.clock, self.probe_dedup_config.get("window", 5.0)
+        )
         self._setup_logging()
         self._setup_email()
         self.healthcheck_config = self.config.get("healthcheck", {})
+        self.metrics_config = self.config.get("metrics", {})
+        self.metrics = MonitorMetrics()
+        # Status changes are also posted to the configured webhooks
+        self.webhooks = None
+        if self.config.get("webhooks"):
+            self.webhooks = WebhookNotifier(
+                self.config["webhooks"], self.clock, self.metrics
+            )
+        # Alert routes by tag, name, type, severity and time of day
+        self.router = None
+        if self.config.get("routes"):
+            self.router = AlertRouter(
+                self.config["routes"],
+                self.config.get("services", {}),
+                self.config.get("webhooks") or {},
+                self.notification_email,
+            )
+        # One bounded thread pool per kind of blocking work
+        self.executors = create_pools(self.config.get("executors") or {}, self.metrics)
+        # CPU, wall and executor time and bytes of each service's rounds
+        self.costs = CostTracker()
+        self._profiling = False
+        # Round slots by priority class, shedding low tiers when late
+        self.dispatcher = RoundDispatcher(self.config, self.clock, self.metrics)
+        self.http_trace_config = create_trace_config()
+        # Last per-phase timing breakdown and failure reason per HTTP probe
+        # target (target_key), shared by the services probing it
+        self.http_timings = {}
+        self.http_failures = {}
+        # ETag/Last-Modified for conditional GETs, per probe target too
+        self.http_validators = {}
+        self.latency_samples = {}  # Recent successful check latencies
+        self.last_check = {}  # When each service last finished a round
+        self.next_check = {}  # When each service's next round is due
+        # Snapshot of states and schedule phase, reloaded on restart
+        self.state_config = self.config.get("state", {})
+        self.state_store = None
+        if persist and self.state_config.get("file"):
+            self.state_store = StateStore(self.state_config["file"])
+        self._resume_at = {}  # Next round per service from the snapshot
+        self._snapshot_sequence = itertools.count()
+        # Columnar per-round history for vectorized analytics
+        self.history_config = self.config.get("history", {})
+        self.history = None
+        if persist and self.history_config.get("directory"):
+            self.history = CheckHistory(
+                self.history_config["directory"],
+                self.history_config.get("retention_days"),
+            )
+        # Run-length encoded log of state changes per service
+        self.transitions = None
+        if persist and self.config.get("transitions", {}).get("directory"):
+            self.transitions = TransitionLog(self.config["transitions"]["directory"])
+        # Minute/hour/day uptime rollups for SLA reports
+        self.rollup_config = self.config.get("rollups", {})
+        self.rollups = None
+        if persist and self.rollup_config.get("file"):
+            self.rollups = UptimeRollups(
+                self.rollup_config["file"], self.rollup_config.get("retention")
+            )
         # Get timezone from config or use default
         self.timezone = self.config.get("timezone", DEFAULT_TIMEZONE)
         try:
@@ -50,6 +223,11 @@ class ServiceMonitor:
             )
             self.timezone = DEFAULT_TIMEZONE
             self.tz = pytz.timezone(DEFAULT_TIMEZONE)
+        # Maintenance windows and groups, expanded into sorted timelines
+        self.maintenance = MaintenanceCalendar(
+            self.config, self.tz, self._service_timezone
+        )
+        self._restore_state()
 
     def _load_config(self, config_path: str) -> dict:
         with open(config_path, "r") as file:
@@ -68,17 +246,20 @@ class ServiceMonitor:
             omit_repeated_times=False,
         )
 
-        # Configure file handler for log file
-        file_handler = logging.FileHandler("service_monitor.log")
-        file_handler.setFormatter(
-            logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-        )
+        handlers = [rich_handler]
+        if self.persist:
+            # Configure file handler for log file
+            file_handler = logging.FileHandler("service_monitor.log")
+            file_handler.setFormatter(
+                logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+            )
+            handlers.append(file_handler)
 
         # Set up the root logger
         logging.basicConfig(
             level=logging.INFO,
             format="%(message)s",
-            handlers=[rich_handler, file_handler],
+            handlers=handlers,
             force=True,
         )
 
@@ -90,23 +271,75 @@ class ServiceMonitor:
         self.smtp_password = self.email_config.get("password")
         self.notification_email = self.email_config.get("notification_email")
 
+    async def _notify(self, service_name: str, status: str, reason: str = None):
+        """Alert a status change on its routed channels: webhooks, then email."""
+        if service_name in self.muted:
+            self.metrics.notifications_muted.inc(status=status)
+            logging.info(f"Service {service_name} is muted, not alerting {status}")
+            return
+        routes, emails, webhooks = (DEFAULT_ROUTE,), None, None
+        if self.router is not None:
+            service = self.config["services"].get(service_name, {})
+            routes, emails, webhooks = self.router.route(
+                service_name, service, status, self.clock.now(self.tz)
+            )
+        for route in routes:
+            self.metrics.route_matches.inc(route=route, status=status)
+
+        if self.webhooks is not None and webhooks != ():
+            downtime = None
+            if status == "UP" and service_name in self.down_since:
+                since = self.down_since[service_name]
+                downtime = int((self.clock.now() - since).total_seconds())
+            message = f"{'🔴' if status == 'DOWN' else '✅'} {service_name} is {status}"
+            if downtime is not None:
+                message += f" after {self._format_duration(downtime)}"
+            if reason:
+                message += f": {reason}"
+            self.webhooks.notify(
+                {
+                    "service": service_name,
+                    "status": status,
+                    "reason": reason,
+                    "downtime": downtime,
+                    "timestamp": self.clock.now(timezone.utc).isoformat(),
+                    "message": message,
+                },
+                routes,
+                webhooks,
+            )
+        if emails == ():
+            return  # Routed to webhooks only
+        if emails is None:
+            sent = await self._send_email_notification(service_name, status, reason)
+        else:
+            sent = await self._send_email_notification(
+                service_name, status, reason, emails
+            )
+        if sent is not None:
+            for route in routes:
+                self.metrics.route_notifications.inc(
+                    route=route, channel="email", outcome="sent" if sent else "failed"
+                )
+
     async def _send_email_notification(
-        self, service_name: str, status: str, reason: str = None
+        self, service_name: str, status: str, reason: str = None, recipients=None
     ):
+        """Email a status change; returns whether it was sent, None if skipped."""
         if not all(
             [
                 self.smtp_server,
                 self.smtp_port,
                 self.smtp_user,
                 self.smtp_password,
-                self.notification_email,
+                recipients or self.notification_email,
             ]
         ):
             logging.warning("Email configuration incomplete. Skipping notification.")
-            return
+            return None
 
         # Use timezone-aware datetime for timestamp
-        timestamp = datetime.now(self.tz).strftime("%Y-%m-%d %H:%M:%S %Z")
+        timestamp = self.clock.now(self.tz).strftime("%Y-%m-%d %H:%M:%S %Z")
 
         # Build email content
         content = [
@@ -119,10 +352,9 @@ class ServiceMonitor:
         if status == "UP" and service_name in self.down_since:
             down_start = self.down_since[service_name]
             downtime = self._format_duration(
-                (datetime.now() - down_start).total_seconds()
+                (self.clock.now() - down_start).total_seconds()
             )
             content.append(f"Total downtime: {downtime}")
-            del self.down_since[service_name]  # Clear the downtime tracker
 
         if reason:
             content.append(f"Reason: {reason}")
@@ -136,17 +368,25 @@ class ServiceMonitor:
             f"{status_emoji} Service Monitor Alert - {service_name} is {status}"
         )
         msg["From"] = self.smtp_user
-        msg["To"] = self.notification_email
+        msg["To"] = ", ".join(recipients or [self.notification_email])
 
         # Run SMTP operations in a thread to not block the event loop
-        loop = asyncio.get_running_loop()
+        started = self.clock.monotonic()
         try:
-            await loop.run_in_executor(None, self._send_email_sync, msg)
+            await self._run_blocking("email", self._send_email_sync, msg)
+            self.metrics.notifications.inc(channel="email", status=status)
             logging.info(
                 f"Email notification sent for service {service_name} - Status: {status}"
             )
+            return True
         except Exception as e:
+            self.metrics.notification_failures.inc(channel="email")
             logging.error(f"Failed to send email notification: {e}")
+            return False
+        finally:
+            self.metrics.notification_duration.observe(
+                self.clock.monotonic() - started, channel="email"
+            )
 
     def _send_email_sync(self, msg):
         """Synchronous method to send email, to be run in an executor."""
@@ -155,6 +395,10 @@ class ServiceMonitor:
             server.login(self.smtp_user, self.smtp_password)
             server.send_message(msg)
 
+    async def _run_blocking(self, pool: str, func, *args):
+        """Run a blocking function in the thread pool for its kind of work."""
+        return await self.executors[pool].run(func, *args)
+
     def _format_duration(self, seconds):
         """Convert seconds into human readable duration."""
         minutes, seconds = divmod(seconds, 60)
@@ -173,78 +417,189 @@ class ServiceMonitor:
 
         return ", ".join(parts)
 
-    def _is_in_maintenance(self, service: Dict) -> bool:
-        if "maintenance_window" not in service:
-            return False
-
-        # Get service-specific timezone or use default
+    def _service_timezone(self, service: Dict):
+        """Timezone of a service's own maintenance windows."""
         service_tz = service.get("timezone", self.timezone)
         try:
-            tz = pytz.timezone(service_tz)
+            return pytz.timezone(service_tz)
         except pytz.exceptions.UnknownTimeZoneError:
             logging.warning(
                 f"Unknown timezone for service: {service_tz}, using {self.timezone}"
             )
-            tz = self.tz
-
-        # Use timezone-aware datetime for current time
-        now = datetime.now(tz).time()
-
-        # Get hour and minute values for start and end
-        start_time = service["maintenance_window"]["start"]
-        end_time = service["maintenance_window"]["end"]
+            return self.tz
 
-        # Create datetime objects for today with the maintenance window times
-        today = datetime.now(tz).date()
+    def _is_in_maintenance(self, service: Dict, service_name: str = None) -> bool:
+        now = self.clock.now(timezone.utc).timestamp()
+        timeline = self.maintenance.timeline(service, now, service_name)
+        return timeline is not None and timeline.active(now)
 
-        # Create timezone-aware datetime objects for start and end times
-        start_dt = tz.localize(
-            datetime.combine(today, datetime.strptime(start_time, "%H:%M").time())
-        )
-        end_dt = tz.localize(
-            datetime.combine(today, datetime.strptime(end_time, "%H:%M").time())
-        )
+    def _status(self, service_name: str, service: Dict) -> str:
+        """Status of a service as shown on the dashboard."""
+        if self._is_in_maintenance(service, service_name):
+            return "MAINTENANCE"
+        if service_name in self.paused:
+            return "PAUSED"
+        if service_name in self.unreachable:
+            return "UNREACHABLE"
+        state = self.service_states.get(service_name)
+        if state is None:
+            return "UNKNOWN"
+        return "UP" if state else "DOWN"
 
-        # If end time is earlier than start time, it means the window crosses midnight
-        # So we need to add one day to the end time
-        if end_dt < start_dt:
-            end_dt = end_dt + timedelta(days=1)
+    def reload_maintenance(self) -> bool:
+        """Read the maintenance schedules from the config file again.
 
-        # Get the time components for comparison
-        start = start_dt.time()
-        end = end_dt.time()
+        Services sleeping through a window, or inside a window of the new
+        schedules, are woken so the change applies right away. Returns False
+        and keeps the current schedules if the file can't be used.
+        """
+        try:
+            config = self._load_config(self.config_path)
+            services = {}
+            for name, service in self.config["services"].items():
+                if name not in config["services"]:
+                    continue
+                # Only the schedule is taken over, other settings need a restart
+                services[name] = {
+                    key: value
+                    for key, value in service.items()
+                    if key not in MAINTENANCE_KEYS
+                }
+                services[name].update(
+                    (key, value)
+                    for key, value in config["services"][name].items()
+                    if key in MAINTENANCE_KEYS
+                )
+            self.maintenance.reload(
+                {"maintenance": config.get("maintenance"), "services": services}
+            )
+        except (OSError, yaml.YAMLError, KeyError, TypeError, ValueError) as e:
+            logging.error(f"Maintenance schedules not reloaded: {e}")
+            return False
+        self.config["maintenance"] = config.get("maintenance")
+        for name, service in self.config["services"].items():
+            if name not in services:
+                continue
+            # Running rounds hold these dicts, so they are updated in place
+            for key in MAINTENANCE_KEYS:
+                if key in services[name]:
+                    service[key] = services[name][key]
+                else:
+                    service.pop(key, None)
+        for name, service in self.config["services"].items():
+            was_in_maintenance = self.status_index.status(name) == "MAINTENANCE"
+            if was_in_maintenance or self._is_in_maintenance(service, name):
+                self._wake(name)
+        logging.info("Maintenance schedules reloaded")
+        return True
 
-        # If the window crosses midnight and we need to compare with naive time objects
-        # we need special handling
-        if start_dt.date() != end_dt.date():  # Window crosses midnight
-            return now >= start or now <= end
-        else:  # Window is within the same day
-            return start <= now <= end
+    def _maintenance_remaining(self, service_name: str, service: Dict) -> float:
+        """Seconds until the current maintenance window of a service is over."""
+        now = self.clock.now(timezone.utc).timestamp()
+        timeline = self.maintenance.timeline(service, now, service_name)
+        end = timeline.next_change(now) if timeline is not None else None
+        if end is None:
+            return MAINTENANCE_RECHECK
+        # Windows include their end time
+        return min(end - now + 1, MAINTENANCE_RECHECK)
 
     async def _check_http(self, service: Dict) -> bool:
+        url = service["url"]
+        method = service.get("method", "GET").upper()
+        assertion = ContentAssertion.from_config(service.get("expect"))
+        # Cached validators from the previous response for conditional GETs
+        validators = None
+        headers = {}
+        if service.get("conditional") and method == "GET":
+            validators = self.http_validators.get(target_key(service))
+            # A 304 stands for the outcome of the content assertions, so the
+            # validators must come from a check with the same ones
+            if validators and validators["expect"] != service.get("expect"):
+                validators = None
+            if validators and validators.get("etag"):
+                headers["If-None-Match"] = validators["etag"]
+            if validators and validators.get("last_modified"):
+                headers["If-Modified-Since"] = validators["last_modified"]
+
+        timings = HttpPhaseTimings()
+        response = None
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    service["url"], timeout=service["timeout"]
+            async with aiohttp.ClientSession(
+                trace_configs=[self.http_trace_config]
+            ) as session:
+                request = session.head if method == "HEAD" else session.get
+                async with request(
+                    url,
+                    timeout=service["timeout"],
+                    headers=headers,
+                    trace_request_ctx=timings,
                 ) as response:
-                    if response.status == 200:
-                        return True
-                    else:
+                    if response.status == 304 and validators:
+                        # Unchanged since the last full check, which decided
+                        # the content assertions
+                        return self._http_result(service, validators["ok"])
+                    if response.status != 200:
                         logging.warning(
-                            f"HTTP check failed for {service['url']}: status code {response.status}"
+                            f"HTTP check failed for {url}: status code {response.status}"
+                        )
+                        return self._http_result(
+                            service, False, f"HTTP status {response.status}"
                         )
-                        return False
+
+                    ok, reason = True, None
+                    if assertion and method != "HEAD":
+                        ok, read = await assertion.matches(response.content)
+                        # Don't download the rest of the body
+                        response.close()
+                        if not ok:
+                            reason = (
+                                f"Expected {assertion.describe()} not found "
+                                f"in first {read} bytes"
+                            )
+                            logging.warning(f"HTTP check failed for {url}: {reason}")
+                    if service.get("conditional") and method == "GET":
+                        self.http_validators[target_key(service)] = {
+                            "etag": response.headers.get("ETag"),
+                            "last_modified": response.headers.get("Last-Modified"),
+                            "expect": service.get("expect"),
+                            "ok": ok,
+                        }
+                    return self._http_result(service, ok, reason)
         except Exception as e:
             logging.warning(
-                f"HTTP check exception for {service['url']}: {type(e).__name__}: {str(e)}"
+                f"HTTP check exception for {url}: {type(e).__name__}: {str(e)}"
             )
-            return False
+            return self._http_result(service, False, f"{type(e).__name__}: {e}")
+        finally:
+            self._record_http_timings(service, timings)
+            if response is not None and charging():
+                sent, received = transfer_sizes(response)
+                charge("sent", sent)
+                charge("received", received)
+
+    def _http_result(self, service: Dict, ok: bool, reason: str = None) -> bool:
+        """Remember why the last HTTP check of a target failed."""
+        key = target_key(service)
+        if ok:
+            self.http_failures.pop(key, None)
+        else:
+            self.http_failures[key] = reason or "HTTP check failed"
+        return ok
+
+    def _record_http_timings(self, service: Dict, timings: HttpPhaseTimings):
+        phases = timings.finish()
+        if not phases:
+            return
+        for phase, duration in phases.items():
+            self.metrics.http_phase_duration.observe(duration, phase=phase)
+        self.http_timings[target_key(service)] = phases
 
     async def _check_port(self, service: Dict) -> bool:
-        loop = asyncio.get_running_loop()
         try:
             # Run socket operations in executor to prevent blocking the event loop
-            return await loop.run_in_executor(None, self._check_port_sync, service)
+            return await self._run_blocking("port", self._check_port_sync, service)
+        except ExecutorFull:
+            raise  # Reported as the reason of the failed attempt
         except Exception:
             return False
 
@@ -260,10 +615,11 @@ class ServiceMonitor:
             return False
 
     async def _check_ping(self, service: Dict) -> bool:
-        loop = asyncio.get_running_loop()
         try:
             # Run ping operation in executor as it's blocking
-            return await loop.run_in_executor(None, self._check_ping_sync, service)
+            return await self._run_blocking("ping", self._check_ping_sync, service)
+        except ExecutorFull:
+            raise  # Reported as the reason of the failed attempt
         except Exception:
             return False
 
@@ -275,27 +631,563 @@ class ServiceMonitor:
         except Exception:
             return False
 
-    async def _check_service(self, service_name: str, service: Dict):
-        check_functions = {
+    def _retry_policy(self, service: Dict) -> Dict:
+        """Retry settings for a service: defaults, global `retry`, service `retry`."""
+        policy = dict(DEFAULT_RETRY_POLICY)
+        policy.update(self.config.get("retry") or {})
+        policy.update(service.get("retry") or {})
+        if policy.get("deadline") is None:
+            policy["deadline"] = service["timeout"] * service["max_tries"]
+        return policy
+
+    def _backoff_delay(self, policy: Dict, retry: int) -> float:
+        """Exponential backoff with jitter before retry number `retry`."""
+        delay = min(
+            policy["backoff"] * policy["multiplier"] ** retry, policy["backoff_max"]
+        )
+        spread = delay * policy["jitter"]
+        return max(0.0, delay + random.uniform(-spread, spread))
+
+    def _failure_reason(self, service: Dict) -> str:
+        if service["type"] == "http":
+            return self.http_failures.get(target_key(service), "HTTP status not 200")
+        elif service["type"] == "port":
+            return f"Could not connect to port {service['port']}"
+        else:  # ping
+            return "No ping response"
+
+    def _hedge_delay(self, service_name: str, policy: Dict):
+        """Latency after which a hedged second attempt is started, if enabled."""
+        percentile = policy.get("hedge_percentile")
+        samples = self.latency_samples.get(service_name)
+        if not percentile or not samples or len(samples) < policy["hedge_min_samples"]:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(int(percentile * len(ordered)), len(ordered) - 1)]
+
+    async def _run_attempt(
+        self,
+        service_name: str,
+        service: Dict,
+        check_func,
+        timeout: float,
+        policy: Dict,
+        attempt: int = 0,
+        fresh: bool = False,
+    ) -> bool:
+        """Run one check attempt bounded by `timeout`, hedging slow attempts."""
+        attempt_service = dict(service, timeout=timeout)
+        hedge_after = self._hedge_delay(service_name, policy)
+        if hedge_after is None or hedge_after >= timeout:
+            return await asyncio.wait_for(
+                self._shared_probe(
+                    service, check_func, attempt_service, attempt, fresh=fresh
+                ),
+                timeout,
+            )
+        return await asyncio.wait_for(
+            self._run_hedged(
+                service_name,
+                service,
+                check_func,
+                attempt_service,
+                hedge_after,
+                attempt,
+                fresh,
+            ),
+            timeout,
+        )
+
+    async def _shared_probe(
+        self,
+        service: Dict,
+        check_func,
+        attempt_service: Dict,
+        attempt: int,
+        hedge: bool = False,
+        fresh: bool = False,
+    ) -> bool:
+        """Run a probe, sharing it with services that probe the same target.
+
+        A ``fresh`` probe, for a forced round, may join a running probe but
+        never reuses a finished one.
+        """
+        # Keyed by the attempt's timeout, which the deadline may have cut short
+        key = probe_key(attempt_service)
+        if key is None or not self.probe_dedup_config.get("enabled", True):
+            return await check_func(attempt_service)
+        # Attempts are shared per retry number, so a retry never just reuses
+        # the failed result of the previous attempt; hedges are shared apart
+        # from the attempt they race
+        result, shared = await self.probe_coalescer.run(
+            (key, attempt, hedge), lambda: check_func(attempt_service), fresh
+        )
+        if shared:
+            self.metrics.probes_deduplicated.inc(reason=shared)
+        return result
+
+    async def _run_hedged(
+        self,
+        service_name: str,
+        service: Dict,
+        check_func,
+        attempt_service: Dict,
+        hedge_after: float,
+        attempt: int = 0,
+        fresh: bool = False,
+    ) -> bool:
+        first = asyncio.ensure_future(
+            self._shared_probe(
+                service, check_func, attempt_service, attempt, fresh=fresh
+            )
+        )
+        attempts = [first]
+        try:
+            done, _ = await asyncio.wait({first}, timeout=hedge_after)
+            if done:
+                return first.result()
+
+            # The first attempt is slower than usual: race a second one
+            self.metrics.check_hedges.inc(service=service_name, type=service["type"])
+            attempts.append(
+                asyncio.ensure_future(
+                    self._shared_probe(
+                        service,
+                        check_func,
+                        attempt_service,
+                        attempt,
+                        hedge=True,
+                        fresh=fresh,
+                    )
+                )
+            )
+            pending = set(attempts)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None and task.result():
+                        return True
+            return first.result()
+        finally:
+            for task in attempts:
+                if not task.done():
+                    task.cancel()
+
+    async def _run_check_round(
+        self, service_name: str, service: Dict, check_func, fresh: bool = False
+    ):
+        """Try a service up to max_tries times within the round deadline.
+
+        Returns whether the service is UP and the reason of the last failure.
+        Probe results other services got moments ago are reused unless the
+        round must be ``fresh``.
+        """
+        labels = {"service": service_name, "type": service["type"]}
+        policy = self._retry_policy(service)
+        deadline = self.clock.monotonic() + policy["deadline"]
+        error_reason = None
+
+        for attempt in range(service["max_tries"]):
+            remaining = deadline - self.clock.monotonic()
+            if attempt > 0 and remaining <= 0:
+                break
+            timeout = min(service["timeout"], max(remaining, 0.001))
+            self.metrics.check_attempts.inc(**labels)
+            if attempt > 0:
+                self.metrics.check_retries.inc(**labels)
+            started = self.clock.monotonic()
+            try:
+                logging.debug(
+                    f"Service {service_name} ({service['type']}) - Attempt {attempt + 1}/{service['max_tries']}"
+                )
+                ok = await self._run_attempt(
+                    service_name, service, check_func, timeout, policy, attempt, fresh
+                )
+                duration = self.clock.monotonic() - started
+                self.metrics.check_duration.observe(duration, type=service["type"])
+                if ok:
+                    self.latency_samples.setdefault(
+                        service_name, deque(maxlen=policy["hedge_window"])
+                    ).append(duration)
+                    logging.debug(
+                        f"Service {service_name} ({service['type']}) - Attempt {attempt + 1} successful"
+                    )
+                    return True, None
+                error_reason = self._failure_reason(service)
+            except asyncio.TimeoutError:
+                self.metrics.check_duration.observe(
+                    self.clock.monotonic() - started, type=service["type"]
+                )
+                error_reason = f"Timed out after {timeout:.1f} seconds"
+            except Exception as e:
+                self.metrics.check_duration.observe(
+                    self.clock.monotonic() - started, type=service["type"]
+                )
+                error_reason = str(e)
+            self.metrics.check_failures.inc(**labels)
+            logging.debug(
+                f"Service {service_name} ({service['type']}) - Attempt {attempt + 1} failed: {error_reason}"
+            )
+
+            if attempt + 1 < service["max_tries"]:
+                # Wait between retries, but never past the round deadline
+                delay = min(
+                    self._backoff_delay(policy, attempt),
+                    deadline - self.clock.monotonic(),
+                )
+                if delay <= 0:
+                    break
+                await self.clock.sleep(delay)
+
+        return False, error_reason
+
+    def _log_transition(self, service_name: str, state: str, reason: str = None):
+        # Appends are a few bytes and only happen on actual changes
+        if self.transitions is None:
+            return
+        try:
+            self.transitions.append(
+                service_name, self.clock.now(timezone.utc).timestamp(), state, reason
+            )
+        except OSError as e:
+            logging.error(f"Failed to log transition of {service_name}: {e}")
+
+    def _is_down(self, service_name: str) -> bool:
+        return (
+            self.service_states.get(service_name) is False
+            or service_name in self.unreachable
+        )
+
+    def _is_up(self, service_name: str) -> bool:
+        return (
+            self.service_states.get(service_name) is True
+            and service_name not in self.unreachable
+        )
+
+    async def _set_state(
+        self, service_name: str, service: Dict, is_up: bool, error_reason: str = None
+    ):
+        labels = {"service": service_name, "type": service["type"]}
+        was = (self._is_up(service_name), self._is_down(service_name))
+        self.unreachable.pop(service_name, None)
+        if not is_up:  # Service is DOWN
+            if (
+                service_name not in self.service_states
+                or self.service_states[service_name]
+            ):
+                await self._notify(service_name, "DOWN", error_reason)
+                self.down_since[service_name] = (
+                    self.clock.now()
+                )  # Record when service went down
+            self.service_states[service_name] = False
+            self.status_index.set_status(service_name, "DOWN")
+            self._log_transition(service_name, "DOWN", error_reason)
+            self.metrics.service_up.set(0, **labels)
+            logging.info(
+                f"Service {service_name} ({service['type']}) status: [down]DOWN[/down]"
+            )
+        else:  # Service is UP
+            if (
+                service_name in self.service_states
+                and not self.service_states[service_name]
+            ):
+                await self._notify(
+                    service_name, "UP"
+                )  # Downtime will be included if available
+            # Cleared here whichever channels alerted, or none if muted
+            self.down_since.pop(service_name, None)
+            self.service_states[service_name] = True
+            self.status_index.set_status(service_name, "UP")
+            self._log_transition(service_name, "UP")
+            self.metrics.service_up.set(1, **labels)
+            logging.info(
+                f"Service {service_name} ({service['type']}) status: [up]UP[/up]"
+            )
+        await self._state_changed(service_name, *was)
+
+    async def _set_unreachable(self, service_name: str, service: Dict, parent: str):
+        """Report a service behind a failed parent, without alerting."""
+        if self.unreachable.get(service_name) == parent:
+            return
+        was = (self._is_up(service_name), self._is_down(service_name))
+        self.unreachable[service_name] = parent
+        self.status_index.set_status(service_name, "UNREACHABLE")
+        self._log_transition(service_name, "UNREACHABLE", f"behind {parent}")
+        logging.info(
+            f"Service {service_name} ({service['type']}) status: [unreachable]UNREACHABLE[/unreachable] behind {parent}"
+        )
+        await self._state_changed(service_name, *was)
+
+    async def _state_changed(self, service_name: str, was_up: bool, was_down: bool):
+        """Propagate a state change to composites and children."""
+        is_up = self._is_up(service_name)
+        if is_up != was_up:
+            self.dependencies.member_changed(service_name, is_up)
+        for composite in self.dependencies.composites_of.get(service_name, ()):
+            await self._evaluate_composite(composite)
+        if self._is_down(service_name) != was_down:
+            # Children re-evaluate right away: they become UNREACHABLE
+            # without probing, or are probed as soon as the parent is back
+            for child in self.dependencies.children.get(service_name, ()):
+                if self.dependencies.is_composite(child):
+                    await self._evaluate_composite(child)
+                else:
+                    self._wake(child)
+
+    async def _evaluate_composite(self, service_name: str):
+        members = self.dependencies.members[service_name]
+        if not all(
+            member in self.service_states or member in self.unreachable
+            for member in members
+        ):
+            return  # Wait until every member has been checked once
+        service = self.config["services"][service_name]
+        parent = self.dependencies.blocking_parent(service_name, self._is_down)
+        if parent is not None:
+            await self._set_unreachable(service_name, service, parent)
+            return
+        is_up = self.dependencies.composite_is_up(service_name)
+        if (
+            self.service_states.get(service_name) is is_up
+            and service_name not in self.unreachable
+        ):
+            return
+        await self._set_state(
+            service_name, service, is_up, self.dependencies.describe(service_name)
+        )
+
+    async def _confirm_parents(self, service_name: str):
+        """Let parents finish a fresh round before a failed child alerts.
+
+        Parents and children usually share a schedule, so a child can notice
+        an outage before its parent does. Each parent still believed UP (or,
+        for composites, each member) is woken or its running round awaited,
+        bounded by its round deadline. Push and agent-probed parents are
+        taken as last reported.
+        Returns the parent the child is unreachable behind, if any.
+        """
+        loop = asyncio.get_running_loop()
+        waiters = []
+        deadline = 0.0
+        # Composite parents are confirmed through their members
+        pending = list(self.dependencies.parents.get(service_name, ()))
+        while pending:
+            parent = pending.pop()
+            if self._is_down(parent):
+                continue
+            if self.dependencies.is_composite(parent):
+                pending.extend(self.dependencies.members[parent])
+                continue
+            if not self._runs_locally(parent, self.config["services"][parent]):
+                # Pinged or probed by an agent: nothing here can run a round,
+                # its state is as fresh as the last report
+                continue
+            waiter = loop.create_future()
+            self._round_waiters.setdefault(parent, []).append(waiter)
+            waiters.append(waiter)
+            policy = self._retry_policy(self.config["services"][parent])
+            deadline = max(deadline, policy["deadline"])
+            self._wake(parent)
+        if waiters:
+            await asyncio.wait(waiters, timeout=deadline)
+        return self.dependencies.blocking_parent(service_name, self._is_down)
+
+    def _round_done(self, service_name: str):
+        self.last_check[service_name] = self.clock.now()
+        for waiter in self._round_waiters.pop(service_name, ()):
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def _start_forced_round(self, service_name: str) -> bool:
+        """Let the round starting now settle a pending check-now request."""
+        forced = self._forced.get(service_name)
+        if forced is None or forced.done():
+            return False
+        # Resolved by _round_done when the round is over
+        self._round_waiters.setdefault(service_name, []).append(forced)
+        return True
+
+    async def _sleep(self, service_name: str, delay: float):
+        """Sleep until the next round unless woken early by ``_wake``."""
+        forced = self._forced.get(service_name)
+        if forced is not None and not forced.done():
+            # Requested while the last round ran, too late to be settled by it
+            return
+        task = asyncio.current_task()
+        self._sleeping[service_name] = task
+        self.next_check[service_name] = self.clock.now() + timedelta(seconds=delay)
+        try:
+            await self.clock.sleep(delay)
+        except asyncio.CancelledError:
+            if service_name not in self._woken:
+                raise
+            task.uncancel()
+        finally:
+            self._woken.discard(service_name)
+            del self._sleeping[service_name]
+
+    def _wake(self, service_name: str):
+        task = self._sleeping.get(service_name)
+        if task is not None and service_name not in self._woken:
+            self._woken.add(service_name)
+            task.cancel()
+
+    def _snapshot(self) -> Dict:
+        services = {}
+        for name in self.config["services"]:
+            entry = {}
+            if name in self.service_states:
+                entry["up"] = self.service_states[name]
+            if name in self.down_since:
+                entry["down_since"] = encode_time(self.down_since[name])
+            if name in self.unreachable:
+                entry["unreachable"] = self.unreachable[name]
+            if name in self.last_check:
+                entry["last_check"] = encode_time(self.last_check[name])
+            if name in self.next_check:
+                entry["next_check"] = encode_time(self.next_check[name])
+            if name in self.paused:
+                entry["paused"] = True
+            if name in self.muted:
+                entry["muted"] = True
+            if entry:
+                services[name] = entry
+        return {
+            "sequence": next(self._snapshot_sequence),
+            "saved_at": encode_time(self.clock.now()),
+            "services": services,
+        }
+
+    def _restore_state(self):
+        """Resume states, downtimes and schedule phase from the last snapshot."""
+        if self.state_store is None:
+            return
+        snapshot = self.state_store.load()
+        if snapshot is None:
+            return
+        services = self.config["services"]
+        for name, entry in snapshot.get("services", {}).items():
+            if name not in services:
+                continue  # Removed from the config since
+            if "up" in entry:
+                self.service_states[name] = entry["up"]
+                self.status_index.set_status(name, "UP" if entry["up"] else "DOWN")
+                self.metrics.service_up.set(
+                    1 if entry["up"] else 0, service=name, type=services[name]["type"]
+                )
+            if entry.get("down_since"):
+                self.down_since[name] = decode_time(entry["down_since"])
+            if entry.get("unreachable") in self.dependencies.parents.get(name, ()):
+                self.unreachable[name] = entry["unreachable"]
+                self.status_index.set_status(name, "UNREACHABLE")
+            if entry.get("last_check"):
+                self.last_check[name] = decode_time(entry["last_check"])
+            if entry.get("next_check"):
+                self._resume_at[name] = decode_time(entry["next_check"])
+            if entry.get("paused"):
+                self.paused.add(name)
+                self.status_index.set_status(name, "PAUSED")
+            if entry.get("muted"):
+                self.muted.add(name)
+        for name in self.service_states:
+            if self._is_up(name):
+                self.dependencies.member_changed(name, True)
+        self.metrics.services_paused.set(len(self.paused))
+        self.metrics.services_muted.set(len(self.muted))
+        logging.info(
+            f"Restored state of {len(self.service_states)} services from {self.state_store.path}"
+        )
+
+    async def _save_state_periodically(self):
+        while True:
+            await self.clock.sleep(self.state_config.get("interval", 60))
+            try:
+                await self._run_blocking(
+                    "storage", self.state_store.save, self._snapshot()
+                )
+            except OSError as e:
+                logging.error(f"Failed to save state to {self.state_store.path}: {e}")
+
+    async def _flush_periodically(self, store, interval: float):
+        """Flush buffered rollups or history to disk every ``interval`` seconds."""
+        while True:
+            await self.clock.sleep(interval)
+            try:
+                await self._run_blocking(
+                    "storage", store.flush, self.clock.now(timezone.utc).timestamp()
+                )
+            except Exception as e:
+                logging.error(f"Failed to flush {store.path}: {e}")
+
+    def _save_on_shutdown(self):
+        if self.state_store is not None:
+            try:
+                self.state_store.save(self._snapshot())
+                logging.info(f"Saved state to {self.state_store.path}")
+            except OSError as e:
+                logging.error(f"Failed to save state to {self.state_store.path}: {e}")
+        for store in (self.rollups, self.history):
+            if store is None:
+                continue
+            try:
+                store.flush(self.clock.now(timezone.utc).timestamp())
+            except Exception as e:
+                logging.error(f"Failed to flush {store.path}: {e}")
+
+    def _initial_delay(self, service_name: str, service: Dict) -> float:
+        """Delay before the first round, keeping the phase from the snapshot."""
+        resume_at = self._resume_at.pop(service_name, None)
+        if resume_at is None:
+            return 0.0
+        remaining = (resume_at - self.clock.now()).total_seconds()
+        if remaining > 0:
+            return min(remaining, service["interval"])
+        # Overdue after a long stop: spread the catch-up rounds out
+        spread = min(service["interval"], self.state_config.get("spread", 30))
+        return random.uniform(0, spread)
+
+    def _check_function(self, service: Dict):
+        return {
             "http": self._check_http,
             "port": self._check_port,
             "ping": self._check_ping,
-        }
+        }[service["type"]]
 
+    async def _check_service(self, service_name: str, service: Dict):
         was_in_maintenance = False
-        check_func = check_functions[service["type"]]
+        check_func = self._check_function(service)
+        # Work done by this task, its probes and executor jobs is charged here
+        cost = self.costs.bind(service_name)
+        delay = self._initial_delay(service_name, service)
+        if delay:
+            await self._sleep(service_name, delay)
+        next_due = self.clock.monotonic()
 
         while True:
-            if self._is_in_maintenance(service):
+            # How late this round starts compared to when it was scheduled
+            self.metrics.scheduler_lag.observe(
+                max(0.0, self.clock.monotonic() - next_due)
+            )
+            # A pending check-now request is settled by this round
+            fresh = self._start_forced_round(service_name)
+
+            if self._is_in_maintenance(service, service_name):
                 if not was_in_maintenance:
                     logging.info(
                         f"Service {service_name} ({service['type']}) entering maintenance window"
                     )
                     was_in_maintenance = True
+                    self.status_index.set_status(service_name, "MAINTENANCE")
+                    self._log_transition(service_name, "MAINTENANCE")
                 logging.info(
                     f"Service {service_name} ({service['type']}) status: [maintenance]MAINTENANCE[/maintenance]"
                 )
-                await asyncio.sleep(60)  # Check maintenance status every minute
+                self._round_done(service_name)
+                delay = self._maintenance_remaining(service_name, service)
+                next_due = self.clock.monotonic() + delay
+                await self._sleep(service_name, delay)
                 continue
             elif was_in_maintenance:
                 logging.info(
@@ -303,71 +1195,358 @@ class ServiceMonitor:
                 )
                 was_in_maintenance = False
 
-            # Count failures over all retry attempts
-            failures = 0
-            error_reason = None
+            if service_name in self.paused:
+                # Woken by resume
+                self.status_index.set_status(service_name, "PAUSED")
+                self._round_done(service_name)
+                next_due = self.clock.monotonic() + service["interval"]
+                await self._sleep(service_name, service["interval"])
+                continue
 
-            # Try service check up to max_tries times
-            for attempt in range(service["max_tries"]):
+            # Don't probe behind a failed parent; woken when it changes
+            parent = self.dependencies.blocking_parent(service_name, self._is_down)
+            if parent is None:
+                # Higher priorities get a slot first, low ones may be shed
+                if not await self.dispatcher.acquire(service_name, next_due):
+                    self._round_done(service_name)
+                    next_due = self.clock.monotonic() + service["interval"]
+                    await self._sleep(service_name, service["interval"])
+                    continue
+                # Run one retry round within the round deadline; a forced
+                # round must not answer with a result from before it was asked
+                started = self.clock.monotonic()
                 try:
-                    logging.debug(
-                        f"Service {service_name} ({service['type']}) - Attempt {attempt + 1}/{service['max_tries']}"
+                    is_up, error_reason = await CpuMeter(
+                        self._run_check_round(service_name, service, check_func, fresh),
+                        cost,
                     )
-                    if await check_func(service):
-                        logging.debug(
-                            f"Service {service_name} ({service['type']}) - Attempt {attempt + 1} successful"
-                        )
-                        break
-                    failures += 1
-                    if service["type"] == "http":
-                        error_reason = "HTTP status not 200"
-                    elif service["type"] == "port":
-                        error_reason = f"Could not connect to port {service['port']}"
-                    else:  # ping
-                        error_reason = "No ping response"
-                    logging.debug(
-                        f"Service {service_name} ({service['type']}) - Attempt {attempt + 1} failed: {error_reason}"
-                    )
-                except Exception as e:
-                    failures += 1
-                    error_reason = str(e)
-                    logging.debug(
-                        f"Service {service_name} ({service['type']}) - Attempt {attempt + 1} failed with error: {e}"
+                finally:
+                    self.dispatcher.release()
+                duration = self.clock.monotonic() - started
+                cost.rounds += 1
+                cost.wall += duration
+                # The failure may be the parent's: confirm before alerting
+                if not is_up:
+                    parent = await self._confirm_parents(service_name)
+            if parent is not None:
+                await self._set_unreachable(service_name, service, parent)
+                self._round_done(service_name)
+                next_due = self.clock.monotonic() + service["interval"]
+                await self._sleep(service_name, service["interval"])
+                continue
+
+            # After all retries, update state and send notification if needed
+            await self._report_round(
+                service_name, service, is_up, duration, error_reason
+            )
+
+            interval = self.scheduler.next_interval(service_name, service, is_up)
+            interval = self.dispatcher.interval(service_name, interval)
+            self.metrics.effective_interval.set(interval, service=service_name)
+            self.metrics.probe_demand.set(self.scheduler.demand)
+            next_due = self.clock.monotonic() + interval
+            await self._sleep(service_name, interval)
+
+    async def _report_round(
+        self,
+        service_name: str,
+        service: Dict,
+        is_up: bool,
+        duration: float,
+        error_reason: str = None,
+        finished: float = None,
+    ):
+        """Apply a finished round: state, alerts, rollups and history."""
+        await self._set_state(service_name, service, is_up, error_reason)
+        self._round_done(service_name)
+        if finished is None:
+            finished = self.clock.now(timezone.utc).timestamp()
+        if self.rollups is not None:
+            self.rollups.record(service_name, finished, is_up, duration)
+        if self.history is not None:
+            self.history.record(service_name, finished, is_up, duration, error_reason)
+
+    def _runs_locally(self, service_name: str, service: Dict) -> bool:
+        """Whether this process probes the service on a schedule.
+
+        Composites follow their members, while push services and services
+        assigned to a remote agent report in on their own.
+        """
+        return not (
+            self.dependencies.is_composite(service_name)
+            or service_name in self.push.timeouts
+            or service.get("agent")
+        )
+
+    def request_check(self, service_name: str) -> str:
+        """Run a round of a service now instead of at its next interval.
+
+        Single-flight: requests while a forced round is pending or running
+        share it instead of starting another probe. Returns the outcome.
+        """
+        service = self.config["services"][service_name]
+        if service_name in self.paused:
+            return "paused"
+        if self._is_in_maintenance(service, service_name):
+            return "in maintenance"
+        forced = self._forced.get(service_name)
+        if forced is not None and not forced.done():
+            return "already running"
+        waiter = asyncio.get_running_loop().create_future()
+        # Taken up by the next round to start, which wakes up now, or starts
+        # right after the round running at the moment
+        self._forced[service_name] = waiter
+
+        def forget(_):
+            if self._forced.get(service_name) is waiter:
+                del self._forced[service_name]
+
+        waiter.add_done_callback(forget)
+        self._wake(service_name)
+        return "started"
+
+    async def control(
+        self, action: str, names: List[str] = None, tags: List[str] = None
+    ) -> Dict[str, str]:
+        """Apply a control action to services selected by name, glob or tag.
+
+        Runs on the monitor loop; returns the outcome for each service.
+        Pause, resume and check only apply to services probed by this
+        process, mute and unmute to any service.
+        """
+        if action not in CONTROL_ACTIONS:
+            raise ValueError(f"Unknown action {action}")
+        if not names and not tags:
+            raise ValueError("Select services by name, glob or tag")
+        results = {}
+        for name in self.select_services(names, tags):
+            service = self.config["services"][name]
+            if action == "mute":
+                results[name] = "already muted" if name in self.muted else "muted"
+                self.muted.add(name)
+            elif action == "unmute":
+                results[name] = "unmuted" if name in self.muted else "not muted"
+                self.muted.discard(name)
+            elif not self._runs_locally(name, service):
+                results[name] = "not probed here"
+            elif action == "pause":
+                results[name] = "already paused" if name in self.paused else "paused"
+                self.paused.add(name)
+                self.status_index.set_status(name, "PAUSED")
+            elif action == "resume":
+                if name in self.paused:
+                    self.paused.discard(name)
+                    self.status_index.set_status(name, self._status(name, service))
+                    self._wake(name)
+                    results[name] = "resumed"
+                else:
+                    results[name] = "not paused"
+            else:
+                results[name] = self.request_check(name)
+        changed = sum(
+            1
+            for outcome in results.values()
+            if outcome in ("muted", "unmuted", "paused", "resumed", "started")
+        )
+        self.metrics.control_actions.inc(changed, action=action)
+        self.metrics.services_paused.set(len(self.paused))
+        self.metrics.services_muted.set(len(self.muted))
+        logging.info(
+            f"Control: {action} applied to {changed} of {len(results)} services"
+        )
+        return results
+
+    async def receive_agent_batch(self, authorization: str, agent: str, body: bytes):
+        """Authenticate and merge a batch uploaded by a probe agent.
+
+        The agent named in the header is authenticated before the body is
+        decompressed. Returns the HTTP status and the response body.
+        """
+        token = (self.agents.get(agent) or {}).get("token")
+        if not token or not secrets.compare_digest(
+            authorization or "", f"Bearer {token}"
+        ):
+            return 401, {"error": "Unknown agent or token"}
+        try:
+            batch = decode_batch(body)
+        except ValueError as e:
+            return 400, {"error": f"Invalid batch: {e}"}
+        if batch["agent"] != agent:
+            return 400, {"error": f"Invalid batch: not from agent {agent}"}
+        run, results = batch["run"], batch["results"]
+        self.metrics.agent_last_seen.set(
+            self.clock.now(timezone.utc).timestamp(), agent=agent
+        )
+        return 200, await self.merge_agent_results(agent, run, results)
+
+    async def merge_agent_results(
+        self, agent: str, run: str, results: List[Dict]
+    ) -> Dict[str, int]:
+        """Apply rounds run by an agent in the order they happened.
+
+        Batches are replayed after upload failures, so results are
+        deduplicated by their sequence number within the agent's run.
+        """
+        runs = self._agent_runs.setdefault(agent, {})
+        last = runs.pop(run, -1)
+        runs[run] = last  # Most recent run last
+        while len(runs) > AGENT_RUNS_KEPT:
+            del runs[next(iter(runs))]
+        counts = {"accepted": 0, "duplicate": 0, "rejected": 0}
+        services = self.config["services"]
+        for result in results:
+            name = result.get("service")
+            if result["seq"] <= runs[run]:
+                outcome = "duplicate"
+            elif name not in services or services[name].get("agent") != agent:
+                outcome = "rejected"
+            else:
+                outcome = "accepted"
+                runs[run] = result["seq"]
+                service = services[name]
+                parent = None
+                if not result["up"]:
+                    parent = self.dependencies.blocking_parent(name, self._is_down)
+                if parent is not None:
+                    await self._set_unreachable(name, service, parent)
+                    self._round_done(name)
+                else:
+                    await self._report_round(
+                        name,
+                        service,
+                        result["up"],
+                        result.get("latency"),
+                        result.get("reason"),
+                        result["timestamp"],
                     )
+            counts[outcome] += 1
+            self.metrics.agent_results.inc(agent=agent, outcome=outcome)
+        return counts
 
-                if failures < service["max_tries"]:
-                    await asyncio.sleep(1)  # Wait between retries
+    def record_ping(self, token: str, failed: bool = False) -> bool:
+        """Register a ping of a push service; runs on the monitor's loop.
 
-            # After all retries, update state and send notification if needed
-            if failures == service["max_tries"]:  # Service is DOWN
-                if (
-                    service_name not in self.service_states
-                    or self.service_states[service_name]
-                ):
-                    await self._send_email_notification(
-                        service_name, "DOWN", error_reason
+        Returns False for an unknown token. Only state changes start a task,
+        so steady pings from UP services cost a few dictionary updates.
+        """
+        name = self.push.service(token)
+        if name is None:
+            return False
+        self.metrics.push_pings.inc(service=name)
+        self.last_check[name] = self.clock.now()
+        if self.push.ping(name, self.clock.monotonic()) and self._push_changed:
+            self._push_changed.set()
+        if failed:
+            self._update_push(name, False, "Failure reported by ping")
+        elif not self._is_up(name):
+            self._update_push(name, True)
+        return True
+
+    def _update_push(self, service_name: str, is_up: bool, reason: str = None):
+        if service_name in self._push_updates:
+            return
+        self._push_updates.add(service_name)
+        asyncio.ensure_future(self._set_push_state(service_name, is_up, reason))
+
+    async def _set_push_state(self, service_name: str, is_up: bool, reason: str = None):
+        service = self.config["services"][service_name]
+        try:
+            parent = None
+            if not is_up:
+                parent = self.dependencies.blocking_parent(service_name, self._is_down)
+            if parent is not None:
+                await self._set_unreachable(service_name, service, parent)
+            else:
+                await self._set_state(service_name, service, is_up, reason)
+        finally:
+            self._push_updates.discard(service_name)
+
+    async def _expire_push_services(self):
+        """Mark push services DOWN when no ping arrived before their deadline."""
+        self._push_changed = asyncio.Event()
+        now, wall = self.clock.monotonic(), self.clock.now()
+        for name, timeout in self.push.timeouts.items():
+            # Continue from the last ping before a restart, but allow at least
+            # the grace period for pings sent while the monitor was down
+            remaining = timeout
+            if name in self.last_check:
+                elapsed = (wall - self.last_check[name]).total_seconds()
+                remaining = max(timeout - elapsed, self.push.graces[name])
+            self.push.arm(name, now + remaining)
+
+        while True:
+            for name in self.push.expired(self.clock.monotonic()):
+                service = self.config["services"][name]
+                if self._is_in_maintenance(service, name):
+                    # Look again when the window is over
+                    self.push.arm(
+                        name,
+                        self.clock.monotonic()
+                        + self._maintenance_remaining(name, service),
                     )
-                    self.down_since[service_name] = (
-                        datetime.now()
-                    )  # Record when service went down
-                self.service_states[service_name] = False
-                logging.info(
-                    f"Service {service_name} ({service['type']}) status: [down]DOWN[/down]"
-                )
-            else:  # Service is UP
-                if (
-                    service_name in self.service_states
-                    and not self.service_states[service_name]
-                ):
-                    await self._send_email_notification(
-                        service_name, "UP"
-                    )  # Downtime will be included if available
-                self.service_states[service_name] = True
-                logging.info(
-                    f"Service {service_name} ({service['type']}) status: [up]UP[/up]"
-                )
+                    continue
+                timeout = self._format_duration(int(self.push.timeouts[name]))
+                await self._set_push_state(name, False, f"No ping for {timeout}")
+            self._push_changed.clear()
+            deadline = self.push.next_deadline()
+            if deadline is not None:
+                deadline = max(deadline - self.clock.monotonic(), 0)
+            try:
+                await asyncio.wait_for(self._push_changed.wait(), deadline)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _monitor_event_loop(self, interval: float = 1.0):
+        """Measure how late the event loop wakes up a sleeping task."""
+        while True:
+            started = self.clock.monotonic()
+            await self.clock.sleep(interval)
+            lag = max(0.0, self.clock.monotonic() - started - interval)
+            self.metrics.event_loop_lag.set(lag)
+            self.metrics.event_loop_lag_histogram.observe(lag)
+
+    async def _serve_metrics(self):
+        """Serve /metrics, push pings and agent uploads without the dashboard."""
 
-            await asyncio.sleep(service["interval"])
+        async def handle_metrics(request):
+            return web.Response(
+                body=self.metrics.render().encode(),
+                headers={"Content-Type": CONTENT_TYPE},
+            )
+
+        async def handle_ping(request):
+            failed = request.path.endswith("/fail")
+            if not self.record_ping(request.match_info["token"], failed):
+                return web.Response(status=404, text="Unknown token")
+            return web.Response(text="OK")
+
+        async def handle_agent_results(request):
+            status, body = await self.receive_agent_batch(
+                request.headers.get("Authorization"),
+                request.headers.get(AGENT_HEADER),
+                await request.read(),
+            )
+            return web.json_response(body, status=status)
+
+        app = web.Application(client_max_size=MAX_BATCH_BYTES)
+        app.router.add_get("/metrics", handle_metrics)
+        if self.agents:
+            app.router.add_post("/api/agents/results", handle_agent_results)
+        if len(self.push):
+            for path in ("/ping/{token}", "/ping/{token}/fail"):
+                app.router.add_route("GET", path, handle_ping)
+                app.router.add_route("POST", path, handle_ping)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        host = self.metrics_config.get("host", "0.0.0.0")
+        port = self.metrics_config["port"]
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        logging.info(f"Serving metrics on http://{host}:{port}/metrics")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
 
     async def _ping_healthcheck(self):
         """Ping healthcheck.io endpoint."""
@@ -392,16 +1571,67 @@ class ServiceMonitor:
                 )
 
             # Sleep for the configured interval (default 1 hour)
-            await asyncio.sleep(self.healthcheck_config.get("interval", 3600))
+            await self.clock.sleep(self.healthcheck_config.get("interval", 3600))
 
     async def start_monitoring(self):
-        tasks = []
+        tasks = [
+            asyncio.create_task(
+                self._monitor_event_loop(
+                    self.metrics_config.get("event_loop_interval", 1.0)
+                )
+            )
+        ]
+        # Serve metrics on a dedicated listener if configured
+        if self.metrics_config.get("port"):
+            tasks.append(asyncio.create_task(self._serve_metrics()))
+
+        # Open the shared session and start the webhook workers
+        if self.webhooks is not None:
+            await self.webhooks.start()
+
+        # Snapshot state to disk if configured
+        if self.state_store is not None:
+            tasks.append(asyncio.create_task(self._save_state_periodically()))
+
+        # Flush uptime rollups and check history if configured
+        if self.rollups is not None:
+            interval = self.rollup_config.get("flush_interval", 60)
+            tasks.append(
+                asyncio.create_task(self._flush_periodically(self.rollups, interval))
+            )
+        if self.history is not None:
+            interval = self.history_config.get("flush_interval", 60)
+            tasks.append(
+                asyncio.create_task(self._flush_periodically(self.history, interval))
+            )
+
+        # One timer for the deadlines of all push services
+        if len(self.push):
+            tasks.append(asyncio.create_task(self._expire_push_services()))
+            if not self.metrics_config.get("port"):
+                logging.warning(
+                    "Push services configured: pings are received on the "
+                    "dashboard or the metrics listener (metrics.port)"
+                )
+
         # Add healthcheck task if configured
         if self.healthcheck_config.get("url"):
             tasks.append(asyncio.create_task(self._ping_healthcheck()))
 
+        # Report services that share a probe target
+        groups = group_by_probe(self.config["services"])
+        shared = sum(len(names) for names in groups.values() if len(names) > 1)
+        if shared:
+            logging.info(
+                f"{shared} services share {sum(len(n) > 1 for n in groups.values())} probe targets"
+            )
+        self.metrics.probe_targets.set(len(groups))
+
         # Create tasks for each service
+        # Composite services are evaluated from their members instead
         for service_name, service in self.config["services"].items():
+            if not self._runs_locally(service_name, service):
+                continue
             tasks.append(
                 asyncio.create_task(self._check_service(service_name, service))
             )
@@ -413,16 +1643,387 @@ class ServiceMonitor:
             logging.info("Monitoring tasks cancelled")
         except Exception as e:
             logging.error(f"Error in monitoring: {e}")
+        finally:
+            for task in tasks:
+                task.cancel()
+            self._save_on_shutdown()
+            if self.webhooks is not None:
+                await self.webhooks.close()
+            self.close_executors()
+
+    async def profile(
+        self, seconds: float, interval: float = DEFAULT_SAMPLE_INTERVAL
+    ) -> str:
+        """Sample the stacks of all threads for ``seconds``.
+
+        Returns folded stacks for flame graph tools. Only one profile runs
+        at a time.
+        """
+        if self._profiling:
+            raise RuntimeError("A profile is already running")
+        self._profiling = True
+        sampler = StackSampler(interval)
+        sampler.start()
+        try:
+            await self.clock.sleep(seconds)
+        finally:
+            sampler.stop()
+            self._profiling = False
+        logging.info(f"Collected {sampler.samples} stack samples in {seconds}s")
+        return sampler.folded()
+
+    async def write_profile(self, seconds: float, path: str):
+        """Profile for ``seconds``, then write the folded stacks to ``path``."""
+        folded = await self.profile(seconds)
+        with open(path, "w") as f:
+            f.write(folded)
+        logging.info(f"Wrote profile to {path}")
+        for row in self.costs.top(10):
+            logging.info(
+                f"{row['service']}: {row['rounds']} rounds, "
+                f"CPU {row['cpu_per_round'] * 1000:.2f}ms, "
+                f"wall {row['wall_per_round'] * 1000:.1f}ms, "
+                f"executor {row['executor_per_round'] * 1000:.1f}ms, "
+                f"{row['sent_per_round'] + row['received_per_round']:.0f} bytes per round"
+            )
+
+    def close_executors(self):
+        for pool in self.executors.values():
+            pool.close()
+
+    def select_services(self, names=None, tags=None) -> List[str]:
+        """Services named in ``names`` or tagged with any of ``tags``.
+
+        Names may be globs such as ``db-*``. Without names or tags, all
+        services are selected. Members of selected composite services are
+        added, since composites follow their members.
+        """
+        services = self.config.get("services", {})
+        patterns = [name for name in names or () if any(c in name for c in "*?[")]
+        unknown = [
+            name
+            for name in names or ()
+            if name not in services and name not in patterns
+        ]
+        unknown += [
+            pattern
+            for pattern in patterns
+            if not any(fnmatch.fnmatchcase(name, pattern) for name in services)
+        ]
+        if unknown:
+            raise ValueError(f"Unknown service: {', '.join(unknown)}")
+        if not names and not tags:
+            selected = list(services)
+        else:
+            selected = [
+                name
+                for name, service in services.items()
+                if name in (names or ())
+                or any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns)
+                or set(tags or ()).intersection(service.get("tags", []))
+            ]
+        pending = list(selected)
+        while pending:
+            for member in self.dependencies.members.get(pending.pop(), ()):
+                if member not in selected:
+                    selected.append(member)
+                    pending.append(member)
+        return selected
+
+    async def check_once(
+        self, service_names: List[str], concurrency: int = None
+    ) -> Dict[str, Dict]:
+        """Run one retry round per service, at most ``concurrency`` at a time.
+
+        By default all rounds run at once, so the check takes about one round
+        deadline however many services there are.
+
+        Nothing is alerted or persisted. Returns status, latency and failure
+        reason per service; a failure behind a failed parent is UNREACHABLE
+        and composites are evaluated from their members.
+        """
+        services = self.config["services"]
+        limit = asyncio.Semaphore(concurrency or max(len(service_names), 1))
+        results = {}
+
+        async def check(name: str):
+            service = services[name]
+            if name in self.push.timeouts or service.get("agent"):
+                results[name] = {
+                    "status": "UNKNOWN",
+                    "latency": None,
+                    "reason": f"Probed by agent {service['agent']}"
+                    if service.get("agent")
+                    else "Push services are not probed",
+                }
+                return
+            if self._is_in_maintenance(service, name):
+                results[name] = {
+                    "status": "MAINTENANCE",
+                    "latency": None,
+                    "reason": None,
+                }
+                return
+            async with limit:
+                started = self.clock.monotonic()
+                is_up, reason = await self._run_check_round(
+                    name, service, self._check_function(service)
+                )
+                latency = self.clock.monotonic() - started
+            results[name] = {
+                "status": "UP" if is_up else "DOWN",
+                "latency": round(latency, 6),
+                "reason": reason,
+            }
+
+        await asyncio.gather(
+            *(
+                check(name)
+                for name in service_names
+                if not self.dependencies.is_composite(name)
+            )
+        )
+
+        def status(name: str) -> str:
+            if name not in results and self.dependencies.is_composite(name):
+                members = self.dependencies.members[name]
+                min_up = self.dependencies.min_up[name]
+                up = sum(status(member) == "UP" for member in members)
+                reason = f"{up}/{len(members)} members UP, {min_up} required"
+                results[name] = {
+                    "status": "UP" if up >= min_up else "DOWN",
+                    "latency": None,
+                    "reason": None if up >= min_up else reason,
+                }
+            return results.get(name, {}).get("status")
+
+        for name in service_names:
+            status(name)
+        for name in service_names:
+            if self.dependencies.is_composite(name) or status(name) != "DOWN":
+                continue
+            parent = self.dependencies.blocking_parent(
+                name, lambda parent: status(parent) in ("DOWN", "UNREACHABLE")
+            )
+            if parent is not None:
+                results[name].update(status="UNREACHABLE", reason=f"behind {parent}")
+
+        return {
+            name: dict(type=services[name]["type"], **results[name])
+            for name in service_names
+        }
 
 
-async def main():
-    monitor = ServiceMonitor("config.yaml")
+async def main(
+    config_path: str = "config.yaml",
+    profile: float = None,
+    profile_output: str = DEFAULT_PROFILE_OUTPUT,
+):
+    monitor = ServiceMonitor(config_path)
+    if hasattr(signal, "SIGHUP"):
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGHUP, monitor.reload_maintenance
+        )
+    if profile:
+        # Monitoring goes on after the profile was written
+        profiler = asyncio.create_task(monitor.write_profile(profile, profile_output))
     await monitor.start_monitoring()
+    if profile:
+        profiler.cancel()
+
+
+def check_concurrency(services: int) -> int:
+    """Rounds the `check` command runs at once: all of them, file limit allowing."""
+    fd_limit = open_file_limit()
+    if fd_limit is None:
+        return max(services, 1)
+    return max(min(services, int(fd_limit * CHECK_FD_SHARE)), 1)
+
+
+async def check_main(args) -> int:
+    """One-shot `check` command: print results, return the exit code."""
+    # Log messages go to stderr, stdout is kept for the results
+    with contextlib.redirect_stdout(sys.stderr):
+        monitor = ServiceMonitor(args.config, persist=False)
+        # Failures are part of the results, don't log them as well
+        logging.getLogger().setLevel(logging.ERROR)
+        try:
+            names = monitor.select_services(args.service, args.tag)
+        except ValueError as e:
+            console.print(f"[error]{e}[/error]")
+            return 2
+        concurrency = args.concurrency or check_concurrency(len(names))
+        # Port and ping checks block a worker thread each, so size their
+        # pools to the rounds running at once to finish within about one
+        # round deadline
+        services = monitor.config["services"]
+        for pool in ("port", "ping"):
+            count = sum(services[name]["type"] == pool for name in names)
+            monitor.executors[pool].resize(max(min(concurrency, count), 1))
+        try:
+            results = await monitor.check_once(names, concurrency)
+        finally:
+            monitor.close_executors()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        header = ("Service", "Type", "Status", "Latency ms", "Reason")
+        rows = [
+            (
+                name,
+                result["type"],
+                result["status"],
+                "-" if result["latency"] is None else f"{result['latency'] * 1000:.1f}",
+                result["reason"] or "",
+            )
+            for name, result in results.items()
+        ]
+        widths = [max(len(row[i]) for row in [header, *rows]) for i in range(4)]
+        for row in [header, *rows]:
+            print(
+                *(cell.ljust(width) for cell, width in zip(row[:3], widths)),
+                row[3].rjust(widths[3]),
+                row[4],
+            )
+    failed = any(
+        result["status"] in ("DOWN", "UNREACHABLE") for result in results.values()
+    )
+    return 1 if failed else 0
 
 
 def run():
     """Entry point for the application."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Service uptime monitor")
+    parser.add_argument(
+        "--config", "-c", default="config.yaml", help="Path to the configuration file"
+    )
+    # Also accepted after the command, without overriding the default above
+    config = argparse.ArgumentParser(add_help=False)
+    config.add_argument("--config", "-c", default=argparse.SUPPRESS)
+    parser.add_argument(
+        "--profile",
+        type=float,
+        metavar="SECONDS",
+        help="Sample stacks for SECONDS after starting, for a flame graph",
+    )
+    parser.add_argument(
+        "--profile-output",
+        default=DEFAULT_PROFILE_OUTPUT,
+        help=f"File for the folded stacks (default: {DEFAULT_PROFILE_OUTPUT})",
+    )
+    profiling = argparse.ArgumentParser(add_help=False)
+    profiling.add_argument("--profile", type=float, default=argparse.SUPPRESS)
+    profiling.add_argument("--profile-output", default=argparse.SUPPRESS)
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser(
+        "run",
+        parents=[config, profiling],
+        help="Monitor services continuously (default)",
+    )
+    commands.add_parser(
+        "agent",
+        parents=[config, profiling],
+        help="Probe the services assigned to this agent for a collector",
+    )
+    check = commands.add_parser(
+        "check",
+        parents=[config],
+        help="Check services once, exit non-zero if any is DOWN",
+    )
+    check.add_argument(
+        "--service", "-s", action="append", help="Service to check (repeatable)"
+    )
+    check.add_argument(
+        "--tag", "-t", action="append", help="Check services with this tag (repeatable)"
+    )
+    check.add_argument(
+        "--concurrency",
+        type=int,
+        help="Rounds run at the same time (default: all, up to half the open "
+        "file limit)",
+    )
+    check.add_argument("--json", action="store_true", help="Print JSON")
+    plan = commands.add_parser(
+        "plan",
+        parents=[config],
+        help="Predict the load of the schedule, exit non-zero if it can't be met",
+    )
+    plan.add_argument("plan_config", nargs="?", metavar="CONFIG")
+    plan.add_argument(
+        "--failure-rate",
+        "-f",
+        type=float,
+        action="append",
+        help="Fraction of services failing to model (repeatable, "
+        "default: 0, 0.1, 0.5 and 1)",
+    )
+    plan.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="Multiply the number of services, to plan for growth",
+    )
+    plan.add_argument(
+        "--latency",
+        type=float,
+        help="Seconds a successful check takes (default: 0.25)",
+    )
+    plan.add_argument("--json", action="store_true", help="Print JSON")
+    sla = commands.add_parser(
+        "sla", parents=[config], help="Report uptime per service from the rollups"
+    )
+    sla.add_argument(
+        "--service", "-s", action="append", help="Service to report (repeatable)"
+    )
+    sla.add_argument(
+        "--days",
+        "-d",
+        type=int,
+        action="append",
+        help="Period in days (repeatable, default: 30, 90 and 365)",
+    )
+    sla.add_argument("--json", action="store_true", help="Print JSON")
+    analytics = commands.add_parser(
+        "analytics",
+        parents=[config],
+        help="Report availability and latency from the check history",
+    )
+    analytics.add_argument(
+        "--days", "-d", type=float, default=7, help="Period in days (default: 7)"
+    )
+    analytics.add_argument(
+        "--regressions",
+        action="store_true",
+        help="Only show services whose p99 latency regressed",
+    )
+    analytics.add_argument("--json", action="store_true", help="Print JSON")
+    args = parser.parse_args()
+
+    if args.command == "check":
+        sys.exit(asyncio.run(check_main(args)))
+    if args.command == "plan":
+        from uptime_monitor.planning import plan_main
+
+        if args.plan_config:
+            args.config = args.plan_config
+        sys.exit(plan_main(args))
+    if args.command == "sla":
+        from uptime_monitor.rollups import sla_main
+
+        sys.exit(sla_main(args))
+    if args.command == "analytics":
+        from uptime_monitor.analytics import analytics_main
+
+        sys.exit(analytics_main(args))
     try:
-        asyncio.run(main())
+        if args.command == "agent":
+            from uptime_monitor.agent import agent_main
+
+            asyncio.run(agent_main(args.config, args.profile, args.profile_output))
+        else:
+            asyncio.run(main(args.config, args.profile, args.profile_output))
     except KeyboardInterrupt:
         logging.info("Monitoring stopped by user")
@@ -0,0 +1,212 @@
+import asyncio
+import logging
+import uuid
+from datetime import timezone
+from itertools import count
+from typing import Dict, List
+
+import aiohttp
+
+from uptime_monitor import DEFAULT_PROFILE_OUTPUT, ServiceMonitor
+from uptime_monitor.clock import Clock
+from uptime_monitor.dependencies import DependencyGraph
+from uptime_monitor.push import PushTracker
+from uptime_monitor.uplink import (
+    AGENT_HEADER,
+    DEFAULT_BUFFER_MAX_BYTES,
+    ResultBuffer,
+    encode_batch,
+)
+
+# Path of the collector endpoint agents upload their results to
+RESULTS_PATH = "/api/agents/results"
+
+# Settings under `agent`, besides the required name, collector and token
+DEFAULT_AGENT = {
+    "buffer_directory": "agent-buffer",
+    "buffer_max_bytes": DEFAULT_BUFFER_MAX_BYTES,
+    "upload_interval": 10,  # seconds between uploads
+    "batch_size": 500,  # results per upload, a full batch is sent right away
+    "timeout": 30,
+}
+
+
+class ProbeAgent(ServiceMonitor):
+    """Monitor running the checks assigned to it for a central collector.
+
+    Services name the agent that probes them under ``agent``. The agent
+    checks its services on their usual schedule and, instead of alerting,
+    queues every finished round. Queued rounds are uploaded every
+    ``upload_interval`` seconds as one gzip-compressed batch over a single
+    kept-alive connection. While the collector is unreachable, batches go
+    to a buffer on disk and are replayed in order once it answers again.
+
+    The collector owns service state: it applies dependencies, sends
+    alerts and records rollups and history for results it merges.
+    """
+
+    def __init__(self, config_path: str, clock: Clock = None):
+        super().__init__(config_path, clock)
+        settings = dict(DEFAULT_AGENT, **(self.config.get("agent") or {}))
+        for key in ("name", "collector", "token"):
+            if not settings.get(key):
+                raise ValueError(f"Agent configuration has no {key}")
+        self.agent_config = settings
+        self.name = settings["name"]
+        self.assigned: List[str] = [
+            name
+            for name, service in self.config["services"].items()
+            if service.get("agent") == self.name
+            and not self.dependencies.is_composite(name)
+            and name not in self.push.timeouts
+        ]
+        # Parents, push services and alerts are handled by the collector
+        self.dependencies = DependencyGraph({})
+        self.push = PushTracker({})
+        self.webhooks = None
+        self.router = None
+        self.buffer = ResultBuffer(
+            settings["buffer_directory"], settings["buffer_max_bytes"]
+        )
+        self.run_id = uuid.uuid4().hex  # sequence numbers restart with each run
+        self._sequence = count(1)
+        self._pending: List[Dict] = []
+        self._upload_now = asyncio.Event()
+        self.session = None
+
+    def _runs_locally(self, service_name: str, service: Dict) -> bool:
+        return service_name in self.assigned
+
+    async def _report_round(
+        self,
+        service_name: str,
+        service: Dict,
+        is_up: bool,
+        duration: float,
+        error_reason: str = None,
+        finished: float = None,
+    ):
+        # Local state only drives the scheduler, the collector alerts
+        self.service_states[service_name] = is_up
+        self._round_done(service_name)
+        if finished is None:
+            finished = self.clock.now(timezone.utc).timestamp()
+        self._pending.append(
+            {
+                "seq": next(self._sequence),
+                "service": service_name,
+                "timestamp": finished,
+                "up": is_up,
+                "latency": duration,
+                "reason": error_reason,
+            }
+        )
+        if len(self._pending) >= self.agent_config["batch_size"]:
+            self._upload_now.set()
+
+    async def start_monitoring(self):
+        """Check the assigned services and upload their results."""
+        logging.info(
+            f"Agent {self.name} probing {len(self.assigned)} services for "
+            f"{self.agent_config['collector']}"
+        )
+        if len(self.buffer):
+            logging.info(f"Replaying {len(self.buffer)} buffered result batches")
+        uploader = asyncio.create_task(self._upload_periodically())
+        try:
+            await super().start_monitoring()
+        finally:
+            uploader.cancel()
+            await asyncio.gather(uploader, return_exceptions=True)
+
+    async def _upload_periodically(self):
+        # One connection, kept alive between uploads
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=1),
+            headers={
+                "Authorization": f"Bearer {self.agent_config['token']}",
+                AGENT_HEADER: self.name,
+                "Content-Type": "application/gzip",
+            },
+            timeout=aiohttp.ClientTimeout(total=self.agent_config["timeout"]),
+        )
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(
+                        self._upload_now.wait(), self.agent_config["upload_interval"]
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                self._upload_now.clear()
+                await self.upload()
+        finally:
+            # Keep what was not sent for the next run
+            self._spill()
+            await self.session.close()
+            self.session = None
+
+    def _batches(self):
+        size = self.agent_config["batch_size"]
+        while self._pending:
+            results, self._pending = self._pending[:size], self._pending[size:]
+            yield encode_batch(self.name, self.run_id, results)
+
+    def _spill(self):
+        for batch in self._batches():
+            self.buffer.append(batch)
+        self.metrics.agent_buffered_batches.set(len(self.buffer))
+
+    async def upload(self) -> bool:
+        """Send buffered batches oldest first, then the queued results.
+
+        Returns False when the collector could not be reached; results not
+        sent are kept on disk.
+        """
+        reachable = True
+        while len(self.buffer) and reachable:
+            reachable = await self._send(self.buffer.peek())
+            if reachable:
+                self.buffer.pop()
+        for batch in self._batches():
+            # Behind older batches still buffered, to keep the order
+            if not reachable or len(self.buffer):
+                self.buffer.append(batch)
+                continue
+            reachable = await self._send(batch)
+            if not reachable:
+                self.buffer.append(batch)
+        self.metrics.agent_buffered_batches.set(len(self.buffer))
+        return reachable
+
+    async def _send(self, batch: bytes) -> bool:
+        url = self.agent_config["collector"].rstrip("/") + RESULTS_PATH
+        try:
+            async with self.session.post(url, data=batch) as response:
+                if response.status < 300:
+                    self.metrics.agent_uploads.inc(outcome="sent")
+                    return True
+                if response.status == 400:
+                    # Replaying a malformed batch won't help
+                    self.metrics.agent_uploads.inc(outcome="rejected")
+                    logging.error(f"Collector rejected batch: {await response.text()}")
+                    return True
+                error = f"HTTP status {response.status}"
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            error = f"{type(e).__name__}: {e}"
+        self.metrics.agent_uploads.inc(outcome="failed")
+        logging.warning(f"Could not upload results to collector: {error}")
+        return False
+
+
+async def agent_main(
+    config_path: str = "config.yaml",
+    profile: float = None,
+    profile_output: str = DEFAULT_PROFILE_OUTPUT,
+):
+    agent = ProbeAgent(config_path)
+    if profile:
+        profiler = asyncio.create_task(agent.write_profile(profile, profile_output))
+    await agent.start_monitoring()
+    if profile:
+        profiler.cancel()
@@ -0,0 +1,234 @@
+import os
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from uptime_monitor.history import COLUMNS, day_partitions, read_names
+
+try:
+    import numpy as np
+except ImportError:  # optional: pip install uptime-monitor[analytics]
+    np = None
+
+PERCENTILES = (50, 95, 99)
+
+# A p99 this much higher than in the previous period counts as a regression
+DEFAULT_REGRESSION = 0.2
+
+
+def require_numpy():
+    if np is None:
+        raise RuntimeError(
+            "analytics need numpy: pip install 'uptime-monitor[analytics]'"
+        )
+
+
+def load_history(directory: str, start: float, end: float) -> Dict:
+    """Columns of the rows in ``[start, end)`` as NumPy arrays.
+
+    Day partitions are memory-mapped, so only the pages actually touched by
+    the range filter are read from disk.
+    """
+    require_numpy()
+    parts = {name: [] for name in COLUMNS}
+    for day in day_partitions(start, end):
+        partition = os.path.join(directory, day)
+        if not os.path.isdir(partition):
+            continue
+        mapped = {}
+        for name, code in COLUMNS.items():
+            path = os.path.join(partition, f"{name}.col")
+            dtype = np.dtype(code)
+            size = (
+                os.path.getsize(path) // dtype.itemsize if os.path.exists(path) else 0
+            )
+            mapped[name] = (
+                np.memmap(path, dtype=dtype, mode="r", shape=(size,))
+                if size
+                else np.empty(0, dtype)
+            )
+        # Columns may differ in length after a crash mid-flush
+        rows = min(len(column) for column in mapped.values())
+        timestamps = mapped["timestamp"][:rows]
+        mask = (timestamps >= start) & (timestamps < end)
+        for name in COLUMNS:
+            parts[name].append(mapped[name][:rows][mask])
+    columns = {
+        name: np.concatenate(chunks) if chunks else np.empty(0, np.dtype(COLUMNS[name]))
+        for name, chunks in parts.items()
+    }
+    columns["services"] = read_names(directory, "services")
+    columns["reasons"] = read_names(directory, "reasons")
+    return columns
+
+
+def group_percentiles(
+    groups, values, group_count: int, percentiles: Iterable[float] = PERCENTILES
+):
+    """Percentiles of ``values`` per group id, with linear interpolation.
+
+    Rows are sorted once by (group, value); each percentile is then one
+    fancy-indexing step over all groups. Groups without values get NaN.
+    """
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order]
+    counts = np.bincount(groups, minlength=group_count)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    present = counts > 0
+    result = np.full((len(tuple(percentiles)), group_count), np.nan)
+    for row, percentile in enumerate(percentiles):
+        position = percentile / 100 * (counts[present] - 1)
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        fraction = position - low
+        base = starts[present]
+        result[row, present] = (
+            values[base + low] * (1 - fraction) + values[base + high] * fraction
+        )
+    return result
+
+
+def summarize(columns: Dict, percentiles: Iterable[float] = PERCENTILES) -> Dict:
+    """Availability, latency percentiles and failure reasons per service."""
+    percentiles = tuple(percentiles)
+    services = columns["services"]
+    reasons = columns["reasons"]
+    count = len(services)
+    sid = columns["service"].astype(np.int64)
+    up = columns["up"].astype(bool)
+
+    checks = np.bincount(sid, minlength=count)
+    up_checks = np.bincount(sid, weights=up, minlength=count)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        availability = 100 * up_checks / checks
+    latency = columns["latency"].astype(np.float64)
+    measured = up & ~np.isnan(latency)
+    latencies = group_percentiles(sid[measured], latency[measured], count, percentiles)
+
+    # Failure reasons: count (service, reason) pairs in one pass
+    down = ~up
+    pairs = sid[down] * len(reasons) + columns["reason"][down].astype(np.int64)
+    keys, pair_counts = np.unique(pairs, return_counts=True)
+    errors = {}
+    for key, pair_count in zip(keys.tolist(), pair_counts.tolist()):
+        service, reason = divmod(key, len(reasons))
+        errors.setdefault(service, {})[reasons[reason] or "unknown"] = pair_count
+
+    summary = {}
+    for index in np.flatnonzero(checks).tolist():
+        summary[services[index]] = {
+            "checks": int(checks[index]),
+            "availability": round(float(availability[index]), 4),
+            **{
+                f"p{percentile:g}": _number(latencies[row, index])
+                for row, percentile in enumerate(percentiles)
+            },
+            "errors": errors.get(index, {}),
+        }
+    return summary
+
+
+def _number(value) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), 6)
+
+
+def _delta(current: Optional[float], previous: Optional[float]) -> Optional[float]:
+    if current is None or previous is None:
+        return None
+    return round(current - previous, 6)
+
+
+def period_report(
+    directory: str,
+    days: float = 7,
+    now: Optional[float] = None,
+    regression: float = DEFAULT_REGRESSION,
+) -> Dict[str, Dict]:
+    """Stats for the last ``days`` per service, compared to the period before.
+
+    A service is flagged as a p99 regression when its p99 latency grew by
+    more than ``regression`` (a fraction) over the previous period.
+    """
+    require_numpy()
+    now = time.time() if now is None else now
+    span = days * 86400
+    current = summarize(load_history(directory, now - span, now))
+    previous = summarize(load_history(directory, now - 2 * span, now - span))
+    report = {}
+    for service, stats in current.items():
+        before = previous.get(service)
+        entry = dict(stats)
+        if before is not None:
+            entry["previous"] = {
+                key: before[key] for key in ("checks", "availability", "p99")
+            }
+            entry["delta"] = {
+                "availability": _delta(stats["availability"], before["availability"]),
+                "p99": _delta(stats["p99"], before["p99"]),
+            }
+            entry["p99_regression"] = bool(
+                stats["p99"] is not None
+                and before["p99"]
+                and stats["p99"] > before["p99"] * (1 + regression)
+            )
+        report[service] = entry
+    return report
+
+
+def _format_ms(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value * 1000:.1f}"
+
+
+def analytics_main(args) -> int:
+    """`analytics` command: print the check history report per service."""
+    import json
+    import sys
+
+    import yaml
+
+    with open(args.config) as file:
+        config = yaml.safe_load(file)
+    directory = (config.get("history") or {}).get("directory")
+    if not directory:
+        print("No history directory configured", file=sys.stderr)
+        return 1
+    try:
+        report = period_report(directory, args.days)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+    if args.regressions:
+        report = {
+            name: stats for name, stats in report.items() if stats.get("p99_regression")
+        }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+    header: Tuple[str, ...] = (
+        "Service",
+        "Checks",
+        "Avail %",
+        "p50 ms",
+        "p95 ms",
+        "p99 ms",
+        "p99 change ms",
+    )
+    rows = [
+        (
+            name,
+            str(stats["checks"]),
+            f"{stats['availability']:.3f}",
+            _format_ms(stats["p50"]),
+            _format_ms(stats["p95"]),
+            _format_ms(stats["p99"]),
+            _format_ms(stats.get("delta", {}).get("p99")),
+        )
+        for name, stats in sorted(report.items())
+    ]
+    widths = [max(len(row[i]) for row in [header, *rows]) for i in range(len(header))]
+    for row in [header, *rows]:
+        print(
+            row[0].ljust(widths[0]),
+            *(cell.rjust(w) for cell, w in zip(row[1:], widths[1:])),
+        )
+    return 0
@@ -0,0 +1,79 @@
+import re
+from typing import Dict, Optional
+
+# Stop reading a response body after this many bytes unless configured
+DEFAULT_MAX_BYTES = 1024 * 1024
+
+# Bytes kept from the previous chunk so regex matches can span chunk borders
+DEFAULT_REGEX_WINDOW = 4096
+
+CHUNK_SIZE = 16 * 1024
+
+
+class ContentAssertion:
+    """Keyword and regex expectations evaluated over a streamed body.
+
+    The body is read chunk by chunk and reading stops as soon as every
+    expectation matched or ``max_bytes`` have been read, so large pages are
+    never buffered as a whole.
+    """
+
+    def __init__(
+        self,
+        keyword: Optional[str] = None,
+        regex: Optional[str] = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        regex_window: int = DEFAULT_REGEX_WINDOW,
+    ):
+        self.keyword = keyword.encode() if keyword else None
+        self.regex = re.compile(regex.encode()) if regex else None
+        self.max_bytes = max_bytes
+        self.regex_window = regex_window
+
+    @classmethod
+    def from_config(cls, expect: Optional[Dict]) -> Optional["ContentAssertion"]:
+        if not expect or not (expect.get("keyword") or expect.get("regex")):
+            return None
+        return cls(
+            keyword=expect.get("keyword"),
+            regex=expect.get("regex"),
+            max_bytes=expect.get("max_bytes", DEFAULT_MAX_BYTES),
+            regex_window=expect.get("regex_window", DEFAULT_REGEX_WINDOW),
+        )
+
+    def describe(self) -> str:
+        parts = []
+        if self.keyword:
+            parts.append(f"keyword {self.keyword.decode()!r}")
+        if self.regex:
+            parts.append(f"regex {self.regex.pattern.decode()!r}")
+        return " and ".join(parts)
+
+    async def matches(self, content) -> tuple:
+        """Read ``content`` (an aiohttp StreamReader) until matched or capped.
+
+        Returns whether all expectations matched and the number of bytes read.
+        """
+        keyword_found = self.keyword is None
+        regex_found = self.regex is None
+        keyword_tail = b""
+        regex_tail = b""
+        read = 0
+
+        async for chunk in content.iter_chunked(CHUNK_SIZE):
+            chunk = chunk[: self.max_bytes - read]
+            read += len(chunk)
+            if not keyword_found:
+                data = keyword_tail + chunk
+                keyword_found = self.keyword in data
+                keyword_tail = (
+                    data[-(len(self.keyword) - 1) :] if len(self.keyword) > 1 else b""
+                )
+            if not regex_found:
+                data = regex_tail + chunk
+                regex_found = self.regex.search(data) is not None
+                regex_tail = data[-self.regex_window :]
+            if (keyword_found and regex_found) or read >= self.max_bytes:
+                break
+
+        return keyword_found and regex_found, read
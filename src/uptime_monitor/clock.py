@@ -0,0 +1,89 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+
+class Clock:
+    """Source of timestamps and sleeps for the monitor.
+
+    All scheduling in ServiceMonitor goes through a clock so that tests can
+    swap in a VirtualClock and simulate long periods without waiting.
+    """
+
+    def now(self, tz=None) -> datetime:
+        return datetime.now(tz)
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    async def sleep(self, delay: float):
+        await asyncio.sleep(delay)
+
+
+class VirtualTimeEventLoop(asyncio.SelectorEventLoop):
+    """Event loop that jumps straight to the next timer instead of waiting.
+
+    Whenever the loop would block in select() until the next scheduled
+    callback, virtual time is advanced by the timeout and select() is polled
+    instead. asyncio.sleep, asyncio.wait_for and aiohttp timeouts therefore
+    all run on virtual time.
+    """
+
+    def __init__(self, clock: "VirtualClock"):
+        super().__init__()
+        self._virtual_clock = clock
+        select = self._selector.select
+
+        def virtual_select(timeout=None):
+            if timeout is not None and timeout > 0:
+                clock.advance(timeout)
+                timeout = 0
+            return select(timeout)
+
+        self._selector.select = virtual_select
+
+    def time(self) -> float:
+        return self._virtual_clock.monotonic()
+
+
+class VirtualClock(Clock):
+    """Deterministic clock for simulating the monitor in virtual time.
+
+    Run coroutines with ``clock.run(coro)``; only work driven by the event
+    loop is virtualised, so blocking checks run in executor threads should be
+    replaced by coroutines that sleep on the clock.
+    """
+
+    def __init__(self, start: Optional[datetime] = None):
+        if start is None:
+            start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        elif start.tzinfo is None:
+            start = start.replace(tzinfo=timezone.utc)
+        self.start = start
+        self._elapsed = 0.0
+
+    def advance(self, seconds: float):
+        self._elapsed += seconds
+
+    def monotonic(self) -> float:
+        return self._elapsed
+
+    def now(self, tz=None) -> datetime:
+        current = self.start + timedelta(seconds=self._elapsed)
+        if tz is None:
+            # Naive local time, like datetime.now() on the real clock
+            return current.astimezone().replace(tzinfo=None)
+        return current.astimezone(tz)
+
+    def new_event_loop(self) -> VirtualTimeEventLoop:
+        return VirtualTimeEventLoop(self)
+
+    def run(self, coro):
+        """Run a coroutine to completion on a virtual time event loop."""
+        loop = self.new_event_loop()
+        try:
+            return loop.run_until_complete(coro)
+        finally:
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
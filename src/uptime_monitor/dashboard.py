@@ -1,20 +1,54 @@
 import asyncio
+import concurrent.futures
 import os
 import secrets
+import signal
 import threading
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Optional
+from urllib.parse import urlparse
 
-from flask import Flask, redirect, render_template, request, url_for
+from flask import Flask, jsonify, redirect, render_template, request, url_for
 from flask_login import (
     LoginManager,
     UserMixin,
+    current_user,
     login_required,
     login_user,
     logout_user,
 )
 
 from uptime_monitor import ServiceMonitor
+from uptime_monitor.analytics import period_report
+from uptime_monitor.clock import Clock
+from uptime_monitor.metrics import CONTENT_TYPE
+from uptime_monitor.probes import target_key
+from uptime_monitor.rollups import sla_report
+from uptime_monitor.status_index import SORT_KEYS
+from uptime_monitor.uplink import AGENT_HEADER, MAX_BATCH_BYTES
+
+# Upper bound for rows returned by one dashboard or API page
+MAX_PER_PAGE = 500
+
+# Seconds a request thread waits for the monitor loop to answer, e.g. to
+# merge an agent upload, beyond the duration of the work asked for
+LOOP_CALL_TIMEOUT = 30
+
+# Longest stack sampling run the dashboard starts
+MAX_PROFILE_SECONDS = 300
+
+
+def _isoformat(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+def _names(value):
+    """Names given in a JSON request as a string or a list of strings."""
+    if value is None or isinstance(value, str):
+        return [value] if value else None
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        raise ValueError("services and tags must be strings or lists of strings")
+    return value
 
 
 class User(UserMixin):
@@ -25,8 +59,14 @@ class User(UserMixin):
 
 
 class WebServiceMonitor(ServiceMonitor):
-    def __init__(self, config_path: str, host: str = "0.0.0.0", port: int = 8080):
-        super().__init__(config_path)
+    def __init__(
+        self,
+        config_path: str,
+        host: str = "0.0.0.0",
+        port: int = 8080,
+        clock: Clock = None,
+    ):
+        super().__init__(config_path, clock=clock)
         self.host = host
         self.port = port
         self.app = Flask(__name__)
@@ -106,53 +146,314 @@ class WebServiceMonitor(ServiceMonitor):
 
             return response
 
+        @self.app.route("/metrics")
+        def metrics():
+            # Left unauthenticated so Prometheus can scrape it
+            return self.metrics.render(), 200, {"Content-Type": CONTENT_TYPE}
+
+        @self.app.route("/ping/<token>", methods=["GET", "POST"])
+        @self.app.route("/ping/<token>/fail", methods=["GET", "POST"])
+        def ping(token):
+            # Authenticated by the token, so jobs and hosts can reach it
+            if self.push.service(token) is None:
+                return "Unknown token", 404
+            if self.loop is None or not self.loop.is_running():
+                return "Monitor not running", 503
+            failed = request.path.endswith("/fail")
+            self.loop.call_soon_threadsafe(self.record_ping, token, failed)
+            return "OK"
+
+        @self.app.route("/api/agents/results", methods=["POST"])
+        def agent_results():
+            # Authenticated by the agent's token in receive_agent_batch
+            if self.loop is None or not self.loop.is_running():
+                return jsonify({"error": "Monitor not running"}), 503
+            future = asyncio.run_coroutine_threadsafe(
+                self.receive_agent_batch(
+                    request.headers.get("Authorization"),
+                    request.headers.get(AGENT_HEADER),
+                    # One byte over the limit is enough to reject the batch
+                    request.stream.read(MAX_BATCH_BYTES + 1),
+                ),
+                self.loop,
+            )
+            try:
+                status, body = future.result(timeout=LOOP_CALL_TIMEOUT)
+            except concurrent.futures.TimeoutError:
+                future.cancel()
+                return jsonify({"error": "Monitor busy, try again"}), 504
+            return jsonify(body), status
+
+        @self.app.route("/api/control", methods=["GET", "POST"])
+        def control():
+            # Dashboard login or the control token, for scripts
+            if not self._control_authorized():
+                return jsonify({"error": "Login or control token required"}), 401
+            if request.method == "GET":
+                return jsonify(
+                    {"paused": sorted(self.paused), "muted": sorted(self.muted)}
+                )
+            if not self._change_authorized():
+                return jsonify({"error": "Cross-site request refused"}), 403
+            body = request.get_json(silent=True) or {}
+            try:
+                names, tags = _names(body.get("services")), _names(body.get("tags"))
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            if self.loop is None or not self.loop.is_running():
+                return jsonify({"error": "Monitor not running"}), 503
+            future = asyncio.run_coroutine_threadsafe(
+                self.control(body.get("action"), names, tags), self.loop
+            )
+            try:
+                results = future.result(timeout=LOOP_CALL_TIMEOUT)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            except concurrent.futures.TimeoutError:
+                future.cancel()
+                return jsonify({"error": "Monitor busy, try again"}), 504
+            return jsonify({"action": body["action"], "services": results})
+
         @self.app.route("/")
         @login_required
         def home():
             # Get theme preference from cookie, default to dark
             theme = request.cookies.get("theme", "dark")
+            result = self._query_services(request.args)
 
             return render_template(
                 "index.html",
-                services=self._get_services_status(),
+                services=result["services"],
+                result=result,
                 theme=theme,
             )
 
-    def _get_services_status(self):
-        services_status = {}
-        current_time = datetime.now(self.tz)
+        @self.app.route("/api/services")
+        @login_required
+        def api_services():
+            return jsonify(self._query_services(request.args))
 
-        for name, service in self.config["services"].items():
-            # Check if service is in maintenance window
-            is_in_maintenance = self._is_in_maintenance(service)
+        @self.app.route("/api/sla")
+        @login_required
+        def api_sla():
+            if self.rollups is None:
+                return jsonify({"error": "rollups are not configured"}), 404
+            try:
+                periods = [
+                    int(days)
+                    for days in request.args.get("days", "30,90,365").split(",")
+                ]
+            except ValueError:
+                return jsonify({"error": "days must be integers"}), 400
+            services = request.args.get("service")
+            names = services.split(",") if services else list(self.config["services"])
+            return jsonify(sla_report(self.rollups, names, periods))
+
+        @self.app.route("/api/analytics")
+        @login_required
+        def api_analytics():
+            if self.history is None:
+                return jsonify({"error": "check history is not configured"}), 404
+            try:
+                days = float(request.args.get("days", 7))
+            except ValueError:
+                return jsonify({"error": "days must be a number"}), 400
+            try:
+                report = period_report(self.history.path, days)
+            except RuntimeError as e:
+                return jsonify({"error": str(e)}), 501
+            if request.args.get("regressions"):
+                report = {
+                    name: stats
+                    for name, stats in report.items()
+                    if stats.get("p99_regression")
+                }
+            return jsonify(report)
+
+        @self.app.route("/api/load")
+        @login_required
+        def api_load():
+            # Rounds delayed or shed by priority when the monitor is overloaded
+            return jsonify(self.dispatcher.report())
 
-            # Get the state of the service
-            state = self.service_states.get(name, None)
+        @self.app.route("/api/costs")
+        @login_required
+        def api_costs():
+            # Most expensive checks by CPU, wall or executor time, or bytes
+            try:
+                limit = max(1, int(request.args.get("limit", 20)))
+                top = self.costs.top(limit, request.args.get("sort", "cpu"))
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            return jsonify(top)
+
+        @self.app.route("/api/profile", methods=["POST"])
+        def api_profile():
+            if not self._change_authorized():
+                if current_user.is_authenticated:
+                    return jsonify({"error": "Cross-site request refused"}), 403
+                return jsonify({"error": "Login or control token required"}), 401
+            try:
+                seconds = float(request.args.get("seconds", 10))
+            except ValueError:
+                return jsonify({"error": "seconds must be a number"}), 400
+            if not 0 < seconds <= MAX_PROFILE_SECONDS:
+                return jsonify(
+                    {"error": f"seconds must be between 0 and {MAX_PROFILE_SECONDS}"}
+                ), 400
+            if self.loop is None or not self.loop.is_running():
+                return jsonify({"error": "Monitor not running"}), 503
+            future = asyncio.run_coroutine_threadsafe(self.profile(seconds), self.loop)
+            try:
+                folded = future.result(timeout=seconds + LOOP_CALL_TIMEOUT)
+            except RuntimeError as e:
+                return jsonify({"error": str(e)}), 409
+            except concurrent.futures.TimeoutError:
+                future.cancel()
+                return jsonify({"error": "Monitor busy, try again"}), 504
+            return (
+                folded,
+                200,
+                {
+                    "Content-Type": "text/plain; charset=utf-8",
+                    "Content-Disposition": "attachment; filename=profile.folded",
+                },
+            )
+
+        @self.app.route("/api/services/<name>/incidents")
+        @login_required
+        def api_incidents(name):
+            if self.transitions is None:
+                return jsonify({"error": "transition log is not configured"}), 404
+            if name not in self.config["services"]:
+                return jsonify({"error": f"unknown service {name}"}), 404
+            try:
+                days = float(request.args.get("days", 365))
+            except ValueError:
+                return jsonify({"error": "days must be a number"}), 400
+            end = self.clock.now(timezone.utc).timestamp()
+            start = end - days * 86400
+            incidents = [
+                {
+                    "start": _isoformat(run.start),
+                    "end": _isoformat(run.end),
+                    "duration": run.duration,
+                    "reason": run.reason,
+                }
+                for run in self.transitions.incidents(name, start, end)
+            ]
+            return jsonify(
+                {
+                    "service": name,
+                    "days": days,
+                    **self.transitions.stats(name, start, end),
+                    "incidents": incidents,
+                }
+            )
 
-            # Convert state to string
-            if is_in_maintenance:
-                state = "MAINTENANCE"
-            elif state is True:
-                state = "UP"
-            elif state is False:
-                state = "DOWN"
-            else:
-                state = "UNKNOWN"
+        @self.app.route("/api/services/<name>/maintenance")
+        @login_required
+        def api_maintenance(name):
+            if name not in self.config["services"]:
+                return jsonify({"error": f"unknown service {name}"}), 404
+            try:
+                limit = max(1, int(request.args.get("limit", 10)))
+            except ValueError:
+                return jsonify({"error": "limit must be an integer"}), 400
+            now = self.clock.now(timezone.utc).timestamp()
+            service = self.config["services"][name]
+            timeline = self.maintenance.timeline(service, now, name)
+            windows = timeline.upcoming(now, limit) if timeline is not None else []
+            return jsonify(
+                {
+                    "service": name,
+                    "active": timeline is not None and timeline.active(now),
+                    "windows": [
+                        {"start": _isoformat(start), "end": _isoformat(end)}
+                        for start, end in windows
+                    ],
+                }
+            )
+
+    def _change_authorized(self) -> bool:
+        """Whether a state-changing request may proceed.
+
+        Browsers also send the session cookie with requests other sites
+        make, so a login only counts from the dashboard's own pages; scripts
+        use the control token instead.
+        """
+        token = self.config.get("control", {}).get("token")
+        if token and secrets.compare_digest(
+            request.headers.get("Authorization", ""), f"Bearer {token}"
+        ):
+            return True
+        origin = request.headers.get("Origin") or request.headers.get("Referer")
+        return (
+            current_user.is_authenticated
+            and origin is not None
+            and urlparse(origin).netloc == request.host
+        )
+
+    def _control_authorized(self) -> bool:
+        if current_user.is_authenticated:
+            return True
+        token = self.config.get("control", {}).get("token")
+        return bool(token) and secrets.compare_digest(
+            request.headers.get("Authorization", ""), f"Bearer {token}"
+        )
+
+    def _get_services_status(self, names=None):
+        services_status = {}
+        services = self.config["services"]
+        if names is None:
+            names = services
+
+        for name in names:
+            service = services[name]
+            state = self._status(name, service)
 
             # Additional information for display
+            last_check = self.last_check.get(name)
             display_info = {
                 "status": state,
                 "type": service["type"],
-                "last_check": current_time.strftime("%Y-%m-%d %H:%M:%S %Z"),
+                "last_check": (
+                    last_check.astimezone(self.tz).strftime("%Y-%m-%d %H:%M:%S %Z")
+                    if last_check
+                    else None
+                ),
             }
+            interval = self.scheduler.effective_interval(name) or service.get(
+                "interval"
+            )
+            if interval:
+                display_info["interval"] = round(interval, 1)
 
             # Add specific service details
             if "host" in service:
                 display_info["host"] = service["host"]
             if "url" in service:
                 display_info["url"] = service["url"]
+                timings = self.http_timings.get(target_key(service))
+                if timings:
+                    display_info["timings"] = {
+                        phase: round(duration * 1000, 1)
+                        for phase, duration in timings.items()
+                    }
             if "port" in service:
                 display_info["port"] = service["port"]
+            if name in self.push.timeouts:
+                display_info["period"] = service["period"]
+                if name in self.last_check:
+                    display_info["last_ping"] = self.last_check[name].strftime(
+                        "%Y-%m-%d %H:%M:%S"
+                    )
+            if name in self.unreachable:
+                display_info["unreachable_behind"] = self.unreachable[name]
+            if name in self.muted:
+                display_info["muted"] = True
+            if name in self.dependencies.members:
+                display_info["members"] = self.dependencies.describe(name)
 
             # Add downtime information if the service is down
             if state == "DOWN" and name in self.down_since:
@@ -164,6 +465,46 @@ class WebServiceMonitor(ServiceMonitor):
 
         return services_status
 
+    def _query_services(self, args):
+        """Answer a filtered, sorted and paginated query from the status index."""
+        sort = args.get("sort", "name")
+        if sort not in SORT_KEYS:
+            sort = "name"
+        try:
+            page = max(int(args.get("page", 1)), 1)
+            per_page = min(max(int(args.get("per_page", 50)), 1), MAX_PER_PAGE)
+        except ValueError:
+            page, per_page = 1, 50
+
+        # Each filter accepts repeated parameters and comma separated values
+        filters = {
+            key: [
+                value.strip()
+                for raw in args.getlist(key)
+                for value in raw.split(",")
+                if value.strip()
+            ]
+            for key in ("status", "type", "host", "tag")
+        }
+        total, names = self.status_index.query(
+            search=args.get("q", "").strip(),
+            sort=sort,
+            page=page,
+            per_page=per_page,
+            **filters,
+        )
+        return {
+            "total": total,
+            "page": page,
+            "per_page": per_page,
+            "pages": max((total + per_page - 1) // per_page, 1),
+            "sort": sort,
+            "filters": filters,
+            "search": args.get("q", ""),
+            "counts": self.status_index.counts(),
+            "services": self._get_services_status(names),
+        }
+
     def _run_async_monitoring(self):
         """Run the async monitoring in a separate thread with its own event loop."""
         # Create a new event loop for this thread
@@ -176,12 +517,20 @@ class WebServiceMonitor(ServiceMonitor):
         # Run the event loop until complete
         self.loop.run_until_complete(self.monitoring_task)
 
+    def _request_maintenance_reload(self, signum, frame):
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.reload_maintenance)
+
     def start(self):
         # Start the monitoring in a separate thread with its own event loop
         monitoring_thread = threading.Thread(target=self._run_async_monitoring)
         monitoring_thread.daemon = True
         monitoring_thread.start()
 
+        # Signals arrive on this thread; the schedules belong to the loop's
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, self._request_maintenance_reload)
+
         # Start the web server
         self.app.run(host=self.host, port=self.port, debug=False)
 
@@ -0,0 +1,116 @@
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Set
+
+from uptime_monitor.routing import name_list
+
+
+class DependencyGraph:
+    """Parent and composite relations between services.
+
+    A service lists the services it sits behind under ``depends_on``; while
+    one of them is not reachable the service itself is UNREACHABLE. A
+    service of type ``composite`` has no probe of its own: it is UP while at
+    least ``min_up`` of its ``members`` are UP. Both relations form one DAG,
+    and member changes update a per-composite count of UP members, so a
+    composite is re-evaluated in O(1) per member transition.
+    """
+
+    def __init__(self, services: Dict[str, Dict]):
+        self.parents: Dict[str, List[str]] = {}
+        self.members: Dict[str, List[str]] = {}
+        self.min_up: Dict[str, int] = {}
+        # Reverse edges: who to look at when a service changes
+        self.children: Dict[str, List[str]] = defaultdict(list)
+        self.composites_of: Dict[str, List[str]] = defaultdict(list)
+        self.up_count: Dict[str, int] = {}
+
+        for name, service in services.items():
+            parents = name_list(service.get("depends_on"))
+            if parents:
+                self.parents[name] = parents
+                for parent in parents:
+                    self.children[parent].append(name)
+            if service.get("type") == "composite":
+                members = name_list(service.get("members"))
+                if not members:
+                    raise ValueError(f"Composite service {name} has no members")
+                duplicates = sorted({m for m in members if members.count(m) > 1})
+                if duplicates:
+                    raise ValueError(
+                        f"Composite service {name} lists {', '.join(duplicates)} "
+                        "more than once"
+                    )
+                min_up = service.get("min_up", len(members))
+                if (
+                    not isinstance(min_up, int)
+                    or isinstance(min_up, bool)
+                    or not 1 <= min_up <= len(members)
+                ):
+                    raise ValueError(
+                        f"Composite service {name} needs min_up between 1 and "
+                        f"{len(members)}, got {min_up!r}"
+                    )
+                self.members[name] = members
+                self.min_up[name] = min_up
+                self.up_count[name] = 0
+                for member in members:
+                    self.composites_of[member].append(name)
+
+        for name, related in list(self.parents.items()) + list(self.members.items()):
+            for other in related:
+                if other not in services:
+                    raise ValueError(
+                        f"Service {name} refers to unknown service {other}"
+                    )
+        self._check_acyclic(services)
+
+    def _check_acyclic(self, services: Dict[str, Dict]):
+        # Iterative DFS over parent and member edges
+        done: Set[str] = set()
+        for start in services:
+            if start in done:
+                continue
+            path = [start]
+            on_path = {start}
+            stack = [iter(self._upstream(start))]
+            while stack:
+                upstream = next(stack[-1], None)
+                if upstream is None:
+                    stack.pop()
+                    done.add(path[-1])
+                    on_path.discard(path.pop())
+                elif upstream in on_path:
+                    cycle = path[path.index(upstream) :] + [upstream]
+                    raise ValueError(f"Dependency cycle: {' -> '.join(cycle)}")
+                elif upstream not in done:
+                    path.append(upstream)
+                    on_path.add(upstream)
+                    stack.append(iter(self._upstream(upstream)))
+
+    def _upstream(self, name: str) -> List[str]:
+        return self.parents.get(name, []) + self.members.get(name, [])
+
+    def is_composite(self, name: str) -> bool:
+        return name in self.members
+
+    def blocking_parent(
+        self, name: str, is_down: Callable[[str], bool]
+    ) -> Optional[str]:
+        """First parent of ``name`` that is currently down, if any."""
+        for parent in self.parents.get(name, ()):
+            if is_down(parent):
+                return parent
+        return None
+
+    def member_changed(self, member: str, is_up: bool) -> List[str]:
+        """Record a member going UP or not UP; return the affected composites."""
+        delta = 1 if is_up else -1
+        for composite in self.composites_of.get(member, ()):
+            self.up_count[composite] += delta
+        return self.composites_of.get(member, [])
+
+    def composite_is_up(self, name: str) -> bool:
+        return self.up_count[name] >= self.min_up[name]
+
+    def describe(self, name: str) -> str:
+        return f"{self.up_count[name]}/{len(self.members[name])} members UP, {self.min_up[name]} required"
@@ -0,0 +1,147 @@
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from uptime_monitor.metrics import MonitorMetrics
+from uptime_monitor.profiling import charge
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Thread pools by kind of blocking work, overridable under `executors`.
+# A kind of work that hangs (e.g. an unresponsive SMTP server) only fills
+# its own pool and queue.
+DEFAULT_EXECUTORS = {
+    "port": {"workers": 32, "queue_size": 1000},
+    "ping": {"workers": 32, "queue_size": 1000},
+    "email": {"workers": 2, "queue_size": 100},
+    "storage": {"workers": 2, "queue_size": 10},  # state snapshots, flushes
+}
+
+
+def open_file_limit() -> Optional[int]:
+    """Soft limit of open files of this process, None if unlimited or unknown."""
+    if resource is None:
+        return None
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    return None if soft == resource.RLIM_INFINITY else soft
+
+
+class ExecutorFull(RuntimeError):
+    """A job was rejected because its pool's queue is at its limit."""
+
+
+class BlockingPool:
+    """Thread pool for one kind of blocking work with a bounded queue.
+
+    Jobs beyond ``queue_size`` waiting for a thread are rejected right away
+    with ``ExecutorFull`` instead of piling up behind a saturated pool. Queue
+    depth, running jobs, wait and run times and rejections are recorded per
+    pool. Threads are started on first use.
+
+    Wait and run times are measured on the worker threads with the wall
+    clock, which doesn't follow a virtual clock.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        workers: int,
+        queue_size: int,
+        metrics: Optional[MonitorMetrics] = None,
+    ):
+        self.name = name
+        self.workers = workers
+        self.queue_size = queue_size
+        self.metrics = metrics or MonitorMetrics()
+        self.queued = 0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def resize(self, workers: int):
+        """Change the number of threads; only before the first job."""
+        if self._executor is not None:
+            raise RuntimeError(f"Executor {self.name} is already running")
+        self.workers = workers
+        self.queue_size = max(self.queue_size, workers)
+
+    def _dequeue(self, job: Dict):
+        """Take ``job`` off the queue once, from whichever side comes first."""
+        with self._lock:
+            if not job["queued"]:
+                return
+            job["queued"] = False
+            self.queued -= 1
+        self.metrics.executor_queue_depth.dec(pool=self.name)
+
+    async def run(self, func, *args):
+        """Run ``func(*args)`` on a pool thread and return its result."""
+        with self._lock:
+            if self.queued >= self.queue_size:
+                full = True
+            else:
+                full = False
+                self.queued += 1
+        if full:
+            self.metrics.executor_rejections.inc(pool=self.name)
+            raise ExecutorFull(
+                f"Executor {self.name} queue full ({self.queue_size} jobs waiting)"
+            )
+        self.metrics.executor_queue_depth.inc(pool=self.name)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                self.workers, thread_name_prefix=f"uptime-{self.name}"
+            )
+        submitted = time.perf_counter()
+        job = {"queued": True}
+
+        def call():
+            begun = time.perf_counter()
+            self._dequeue(job)
+            self.metrics.executor_wait.observe(begun - submitted, pool=self.name)
+            self.metrics.executor_running.inc(pool=self.name)
+            try:
+                return func(*args)
+            finally:
+                ran = time.perf_counter() - begun
+                self.metrics.executor_running.dec(pool=self.name)
+                self.metrics.executor_run.observe(ran, pool=self.name)
+                charge("executor", ran)
+
+        loop = asyncio.get_running_loop()
+        # In the caller's context, so the run time is charged to its service
+        context = contextvars.copy_context()
+        try:
+            return await loop.run_in_executor(self._executor, context.run, call)
+        finally:
+            # Cancelled before a worker thread picked the job up
+            self._dequeue(job)
+
+    def close(self):
+        """Stop the threads without waiting for running jobs."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def create_pools(
+    config: Dict, metrics: Optional[MonitorMetrics] = None
+) -> Dict[str, BlockingPool]:
+    """One pool per kind of blocking work, sized by ``config``."""
+    unknown = set(config) - set(DEFAULT_EXECUTORS)
+    if unknown:
+        raise ValueError(f"Unknown executor {', '.join(sorted(unknown))}")
+    pools = {}
+    for name, defaults in DEFAULT_EXECUTORS.items():
+        settings = dict(defaults, **(config.get(name) or {}))
+        if settings["workers"] < 1:
+            raise ValueError(f"Executor {name} needs at least one worker")
+        pools[name] = BlockingPool(
+            name, settings["workers"], settings["queue_size"], metrics
+        )
+    return pools
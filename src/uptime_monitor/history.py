@@ -0,0 +1,131 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from array import array
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+# Column files per day partition and their array typecodes. The files are
+# raw native-endian arrays, readable with numpy.memmap without parsing.
+COLUMNS = {
+    "timestamp": "d",  # epoch seconds
+    "service": "I",  # id into services.json
+    "up": "B",
+    "latency": "f",  # seconds, NaN for failed rounds
+    "reason": "I",  # id into reasons.json, 0 for none
+}
+
+DAY_FORMAT = "%Y-%m-%d"
+
+
+def day_partition(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime(DAY_FORMAT)
+
+
+def day_partitions(start: float, end: float) -> List[str]:
+    """Names of the UTC day partitions overlapping ``[start, end)``."""
+    day = datetime.fromtimestamp(start, timezone.utc).date()
+    last = datetime.fromtimestamp(max(start, end - 1e-6), timezone.utc).date()
+    days = []
+    while day <= last:
+        days.append(day.strftime(DAY_FORMAT))
+        day += timedelta(days=1)
+    return days
+
+
+def _write_json(path: str, value):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w") as file:
+        json.dump(value, file)
+    os.replace(tmp_path, path)
+
+
+def read_names(directory: str, kind: str) -> List[str]:
+    try:
+        with open(os.path.join(directory, f"{kind}.json")) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return [""] if kind == "reasons" else []
+
+
+class CheckHistory:
+    """Columnar, append-only history of check rounds.
+
+    Rows are buffered in typed arrays and appended to one file per column in
+    a directory per UTC day. Service names and failure reasons are
+    dictionary-encoded, so a row takes 21 bytes. A crash between column
+    writes leaves columns of different lengths; readers use the shortest.
+    """
+
+    def __init__(self, directory: str, retention_days: Optional[float] = None):
+        self.path = directory
+        self.retention_days = retention_days
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._names = {
+            kind: read_names(directory, kind) for kind in ("services", "reasons")
+        }
+        self._ids = {
+            kind: {name: index for index, name in enumerate(names)}
+            for kind, names in self._names.items()
+        }
+        self._dirty = set()
+        self._pending: Dict[str, Dict[str, array]] = {}
+
+    def _id(self, kind: str, name: str) -> int:
+        ids = self._ids[kind]
+        if name not in ids:
+            ids[name] = len(self._names[kind])
+            self._names[kind].append(name)
+            self._dirty.add(kind)
+        return ids[name]
+
+    def record(
+        self,
+        service: str,
+        timestamp: float,
+        is_up: bool,
+        latency: Optional[float] = None,
+        reason: Optional[str] = None,
+    ):
+        with self._lock:
+            day = day_partition(timestamp)
+            columns = self._pending.get(day)
+            if columns is None:
+                columns = self._pending[day] = {
+                    name: array(code) for name, code in COLUMNS.items()
+                }
+            columns["timestamp"].append(timestamp)
+            columns["service"].append(self._id("services", service))
+            columns["up"].append(1 if is_up else 0)
+            columns["latency"].append(
+                latency if is_up and latency is not None else float("nan")
+            )
+            columns["reason"].append(
+                0 if is_up or not reason else self._id("reasons", reason)
+            )
+
+    def flush(self, now: Optional[float] = None):
+        """Append buffered rows to disk and drop partitions past retention."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            names = {kind: list(self._names[kind]) for kind in self._dirty}
+            self._dirty = set()
+        # Dictionaries first, so every id on disk can be resolved
+        for kind, values in names.items():
+            _write_json(os.path.join(self.path, f"{kind}.json"), values)
+        for day, columns in pending.items():
+            directory = os.path.join(self.path, day)
+            os.makedirs(directory, exist_ok=True)
+            for name, values in columns.items():
+                with open(os.path.join(directory, f"{name}.col"), "ab") as file:
+                    values.tofile(file)
+        if self.retention_days:
+            now = time.time() if now is None else now
+            oldest = day_partition(now - self.retention_days * 86400)
+            for entry in os.listdir(self.path):
+                if os.path.isdir(os.path.join(self.path, entry)) and entry < oldest:
+                    shutil.rmtree(os.path.join(self.path, entry))
@@ -0,0 +1,261 @@
+import bisect
+import fnmatch
+import re
+from datetime import date, datetime, time, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import pytz
+
+from uptime_monitor.routing import DAYS, name_list
+
+# Days of recurring windows expanded ahead, overridable under `maintenance`
+DEFAULT_HORIZON_DAYS = 14
+
+# Windows are expanded again once lookups get this close to the horizon
+REFRESH_MARGIN = 86400
+
+
+def _time(value: str) -> time:
+    return datetime.strptime(value, "%H:%M").time()
+
+
+def _datetime(value) -> datetime:
+    """A one-off window bound: "YYYY-MM-DD HH:MM" or a YAML timestamp."""
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    return datetime.strptime(str(value), "%Y-%m-%d %H:%M")
+
+
+class _Rule:
+    """One window of a maintenance schedule.
+
+    Either a one-off window (``from``/``to``) or a recurring ``start``/``end``
+    on every day, optionally limited to ``days`` of the week, ``monthdays``
+    (negative counts from the end of the month) and ``weeks`` of the month
+    (``weeks: [2], days: [tue]`` is the second Tuesday). A window whose end
+    is before its start ends the next day.
+    """
+
+    def __init__(self, window: Dict, where: str):
+        self.once = None
+        if "from" in window or "to" in window:
+            self.once = (_datetime(window["from"]), _datetime(window["to"]))
+            if self.once[1] < self.once[0]:
+                raise ValueError(f"Maintenance window of {where} ends before it starts")
+            return
+        self.start = _time(window["start"])
+        self.end = _time(window["end"])
+        self.days = frozenset(name_list(window.get("days")))
+        unknown = self.days - set(DAYS)
+        if unknown:
+            raise ValueError(
+                f"Maintenance window of {where} has unknown day "
+                f"{', '.join(sorted(unknown))}"
+            )
+        self.monthdays = frozenset(window.get("monthdays") or ())
+        self.weeks = frozenset(window.get("weeks") or ())
+
+    def matches(self, day: date) -> bool:
+        if self.days and DAYS[day.weekday()] not in self.days:
+            return False
+        if not (self.monthdays or self.weeks):
+            return True
+        next_month = (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+        last = (next_month - timedelta(days=1)).day
+        if self.monthdays and not (
+            day.day in self.monthdays or day.day - last - 1 in self.monthdays
+        ):
+            return False
+        if self.weeks and not (
+            (day.day - 1) // 7 + 1 in self.weeks
+            or -((last - day.day) // 7 + 1) in self.weeks
+        ):
+            return False
+        return True
+
+    def expand(self, tz, first: date, last: date) -> Iterable[Tuple[float, float]]:
+        """Windows as (start, end) timestamps for the days ``first``..``last``."""
+        if self.once is not None:
+            start, end = self.once
+            yield tz.localize(start).timestamp(), tz.localize(end).timestamp()
+            return
+        day = first
+        while day <= last:
+            if self.matches(day):
+                start = tz.localize(datetime.combine(day, self.start))
+                end = tz.localize(datetime.combine(day, self.end))
+                if end < start:  # crosses midnight
+                    end = tz.localize(
+                        datetime.combine(day + timedelta(days=1), self.end)
+                    )
+                yield start.timestamp(), end.timestamp()
+            day += timedelta(days=1)
+
+
+class Timeline:
+    """Disjoint maintenance windows sorted by start, for bisecting.
+
+    Windows include their end time, like the daily ``maintenance_window``;
+    overlapping and touching windows are merged.
+    """
+
+    __slots__ = ("starts", "ends")
+
+    def __init__(self, windows: Iterable[Tuple[float, float]]):
+        self.starts: List[float] = []
+        self.ends: List[float] = []
+        for start, end in sorted(windows):
+            if self.ends and start <= self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def active(self, now: float) -> bool:
+        i = bisect.bisect_right(self.starts, now) - 1
+        return i >= 0 and now <= self.ends[i]
+
+    def next_change(self, now: float) -> Optional[float]:
+        """End of the current window, or start of the next one if outside.
+
+        None if nothing changes within the expanded horizon.
+        """
+        i = bisect.bisect_right(self.starts, now) - 1
+        if i >= 0 and now <= self.ends[i]:
+            return self.ends[i]
+        return self.starts[i + 1] if i + 1 < len(self.starts) else None
+
+    def upcoming(self, now: float, limit: int = 10) -> List[Tuple[float, float]]:
+        """The current window, if any, and the next ones."""
+        i = bisect.bisect_left(self.ends, now)
+        return list(zip(self.starts[i : i + limit], self.ends[i : i + limit]))
+
+
+class MaintenanceCalendar:
+    """Maintenance schedules of all services, expanded into timelines.
+
+    A service's schedule is its legacy daily ``maintenance_window``, the
+    windows and group names listed under its ``maintenance`` key, and the
+    groups under the top-level ``maintenance.groups`` whose ``services``
+    globs or ``tags`` match it. Recurring rules are expanded for
+    ``horizon_days`` ahead; services with the same schedule share one
+    timeline, so "in maintenance now" and "next change" are a bisect over
+    a sorted list however many windows and services there are.
+    """
+
+    def __init__(self, config: Dict, tz, timezone_of: Callable[[Dict], object]):
+        self.tz = tz
+        self._timezone_of = timezone_of  # timezone of a service's own windows
+        self.reload(config)
+
+    def reload(self, config: Dict):
+        """Read the schedules again and forget everything expanded so far.
+
+        Raises ValueError for an invalid schedule and keeps the old one.
+        """
+        settings = config.get("maintenance") or {}
+        horizon = settings.get("horizon_days", DEFAULT_HORIZON_DAYS) * 86400
+        groups: Dict[str, Tuple] = {}
+        for name, group in (settings.get("groups") or {}).items():
+            try:
+                group_tz = (
+                    pytz.timezone(group["timezone"])
+                    if group.get("timezone")
+                    else self.tz
+                )
+            except pytz.exceptions.UnknownTimeZoneError:
+                raise ValueError(
+                    f"Maintenance group {name} has unknown timezone {group['timezone']}"
+                ) from None
+            rules = [
+                _Rule(window, f"group {name}") for window in group.get("windows") or ()
+            ]
+            patterns = [
+                re.compile(fnmatch.translate(pattern))
+                for pattern in name_list(group.get("services"))
+            ]
+            groups[name] = (
+                group_tz,
+                rules,
+                patterns,
+                set(name_list(group.get("tags"))),
+            )
+        for name, service in (config.get("services") or {}).items():
+            for entry in service.get("maintenance") or ():
+                if isinstance(entry, str):
+                    if entry not in groups:
+                        raise ValueError(
+                            f"Service {name} refers to unknown maintenance group {entry}"
+                        )
+                else:
+                    _Rule(entry, f"service {name}")
+        self.horizon = horizon
+        self.groups = groups
+        self._sources: Dict[Tuple, Tuple] = {
+            ("group", name): (group_tz, rules)
+            for name, (group_tz, rules, _, _) in groups.items()
+        }
+        self._keys: Dict[str, Tuple] = {}  # service name -> its schedule sources
+        self._timelines: Dict[Tuple, Timeline] = {}
+        self._from = self._until = None
+
+    def _schedule(self, service: Dict, service_name: Optional[str]) -> Tuple:
+        """Keys of the sources of windows making up a service's schedule."""
+        entries = list(service.get("maintenance") or ())
+        groups = {entry for entry in entries if isinstance(entry, str)}
+        tags = set(service.get("tags", []))
+        for name, (_, _, patterns, group_tags) in self.groups.items():
+            if tags & group_tags or (
+                service_name is not None
+                and any(pattern.match(service_name) for pattern in patterns)
+            ):
+                groups.add(name)
+        keys = [("group", name) for name in sorted(groups)]
+        windows = [entry for entry in entries if not isinstance(entry, str)]
+        if "maintenance_window" in service:
+            windows.append(service["maintenance_window"])
+        if windows:
+            # Services with identical windows (e.g. from a YAML anchor) share them
+            tz = self._timezone_of(service)
+            key = ("windows", str(tz), repr(windows))
+            if key not in self._sources:
+                self._sources[key] = (
+                    tz,
+                    [_Rule(window, "service") for window in windows],
+                )
+            keys.append(key)
+        return tuple(keys)
+
+    def _expand(self, now: float):
+        """Forget expanded windows and expand again around ``now``."""
+        self._from = now - REFRESH_MARGIN
+        self._until = now + self.horizon
+        self._timelines = {}
+
+    def timeline(
+        self, service: Dict, now: float, service_name: Optional[str] = None
+    ) -> Optional[Timeline]:
+        """Maintenance windows of a service around ``now``; None if it has none."""
+        keys = self._keys.get(service_name) if service_name is not None else None
+        if keys is None:
+            keys = self._schedule(service, service_name)
+            if service_name is not None:
+                self._keys[service_name] = keys
+        if not keys:
+            return None
+        if self._from is None or not self._from <= now < self._until - REFRESH_MARGIN:
+            self._expand(now)
+        timeline = self._timelines.get(keys)
+        if timeline is None:
+            windows = []
+            for key in keys:
+                tz, rules = self._sources[key]
+                # A day before, for windows crossing midnight into the range
+                first = datetime.fromtimestamp(self._from, tz).date() - timedelta(
+                    days=1
+                )
+                last = datetime.fromtimestamp(self._until, tz).date()
+                for rule in rules:
+                    windows.extend(rule.expand(tz, first, last))
+            timeline = self._timelines[keys] = Timeline(windows)
+        return timeline
@@ -0,0 +1,410 @@
+import bisect
+import math
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Content type of the Prometheus text exposition format (also accepted by
+# OpenMetrics scrapers)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Default histogram buckets in seconds, covering fast checks up to long timeouts
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """Base class for a metric family with an optional set of label names."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def remove(self, **labels):
+        with self._lock:
+            self._values.pop(self._key(labels), None)
+
+    def header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def get(self, **labels) -> Optional[float]:
+        return self._values.get(self._key(labels))
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "count", "sum")
+
+    def __init__(self, size: int):
+        self.buckets = [0] * size
+        self.count = 0
+        self.sum = 0.0
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple = (),
+        buckets: Tuple = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.bounds = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        # Buckets are stored non-cumulatively and summed up at scrape time
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = _HistogramValue(len(self.bounds) + 1)
+            entry.buckets[index] += 1
+            entry.count += 1
+            entry.sum += value
+
+    def get(self, **labels) -> Optional[_HistogramValue]:
+        return self._values.get(self._key(labels))
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        """Estimate a quantile by linear interpolation within the buckets."""
+        entry = self.get(**labels)
+        if entry is None or entry.count == 0:
+            return None
+        rank = q * entry.count
+        seen = 0
+        lower = 0.0
+        for index, upper in enumerate(self.bounds + (math.inf,)):
+            in_bucket = entry.buckets[index]
+            if seen + in_bucket >= rank and in_bucket:
+                if upper == math.inf:
+                    return lower
+                return lower + (upper - lower) * (rank - seen) / in_bucket
+            seen += in_bucket
+            lower = upper
+        return lower
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = [
+                (key, list(entry.buckets), entry.count, entry.sum)
+                for key, entry in self._values.items()
+            ]
+        lines = []
+        for key, buckets, count, total in items:
+            cumulative = 0
+            for bound, in_bucket in zip(self.bounds + (math.inf,), buckets):
+                cumulative += in_bucket
+                labels = _format_labels(
+                    self.labelnames + ("le",), key + (_format_value(bound),)
+                )
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metric families rendered in the Prometheus text format.
+
+    Metrics are updated as checks complete, so rendering only serialises the
+    values that are already there instead of walking the configured services.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple = ()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple = ()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple = (),
+        buckets: Tuple = DEFAULT_BUCKETS,
+    ):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+class MonitorMetrics(MetricsRegistry):
+    """The metric families exported by a ServiceMonitor."""
+
+    def __init__(self):
+        super().__init__()
+        self.service_up = self.gauge(
+            "uptime_service_up",
+            "Whether the service passed its last check round (1 = UP, 0 = DOWN)",
+            ("service", "type"),
+        )
+        self.check_duration = self.histogram(
+            "uptime_check_duration_seconds",
+            "Duration of individual check attempts",
+            ("type",),
+        )
+        self.check_attempts = self.counter(
+            "uptime_check_attempts_total",
+            "Number of check attempts",
+            ("service", "type"),
+        )
+        self.check_retries = self.counter(
+            "uptime_check_retries_total",
+            "Number of check attempts that were retries of a failed attempt",
+            ("service", "type"),
+        )
+        self.check_hedges = self.counter(
+            "uptime_check_hedges_total",
+            "Number of hedged attempts started because an attempt was slow",
+            ("service", "type"),
+        )
+        self.probes_deduplicated = self.counter(
+            "uptime_probes_deduplicated_total",
+            "Probes saved by sharing a running (inflight) or fresh (recent) result",
+            ("reason",),
+        )
+        self.probe_targets = self.gauge(
+            "uptime_probe_targets",
+            "Number of distinct probe targets across all services",
+        )
+        self.check_failures = self.counter(
+            "uptime_check_failures_total",
+            "Number of failed check attempts",
+            ("service", "type"),
+        )
+        self.http_phase_duration = self.histogram(
+            "uptime_http_phase_duration_seconds",
+            "Duration of HTTP check phases (dns, connect, ttfb, total)",
+            ("phase",),
+        )
+        self.notification_duration = self.histogram(
+            "uptime_notification_duration_seconds",
+            "Time taken to deliver a notification",
+            ("channel",),
+        )
+        self.notifications = self.counter(
+            "uptime_notifications_total",
+            "Number of notifications sent",
+            ("channel", "status"),
+        )
+        self.notification_failures = self.counter(
+            "uptime_notification_failures_total",
+            "Number of notifications that could not be delivered",
+            ("channel",),
+        )
+        self.push_pings = self.counter(
+            "uptime_push_pings_total",
+            "Number of pings received from push services",
+            ("service",),
+        )
+        self.route_matches = self.counter(
+            "uptime_route_matches_total",
+            "Number of status changes routed by an alert route",
+            ("route", "status"),
+        )
+        self.route_notifications = self.counter(
+            "uptime_route_notifications_total",
+            "Notifications per alert route and channel by outcome (sent, failed)",
+            ("route", "channel", "outcome"),
+        )
+        self.agent_results = self.counter(
+            "uptime_agent_results_total",
+            "Check rounds uploaded by probe agents by outcome (accepted, duplicate, rejected)",
+            ("agent", "outcome"),
+        )
+        self.agent_last_seen = self.gauge(
+            "uptime_agent_last_seen_timestamp_seconds",
+            "Time of the last authenticated upload from a probe agent",
+            ("agent",),
+        )
+        self.agent_uploads = self.counter(
+            "uptime_agent_uploads_total",
+            "Result batches an agent sent to its collector by outcome (sent, rejected, failed)",
+            ("outcome",),
+        )
+        self.agent_buffered_batches = self.gauge(
+            "uptime_agent_buffered_batches",
+            "Result batches an agent holds on disk until the collector is reachable",
+        )
+        self.webhook_queue_depth = self.gauge(
+            "uptime_webhook_queue_depth",
+            "Status changes waiting to be sent to a webhook",
+            ("webhook",),
+        )
+        self.webhook_retries = self.counter(
+            "uptime_webhook_retries_total",
+            "Number of retried webhook requests",
+            ("webhook",),
+        )
+        self.scheduler_lag = self.histogram(
+            "uptime_scheduler_lag_seconds",
+            "Delay between the scheduled and the actual start of a check round",
+        )
+        self.dispatch_lag = self.gauge(
+            "uptime_dispatch_lag_seconds",
+            "Smoothed delay between when check rounds are due and when they get a slot",
+        )
+        self.scheduler_overloaded = self.gauge(
+            "uptime_scheduler_overloaded",
+            "1 while lower priority check rounds are shed or stretched",
+        )
+        self.round_delay = self.counter(
+            "uptime_round_delay_seconds_total",
+            "Seconds check rounds started late or were pushed back under overload",
+            ("service", "priority"),
+        )
+        self.rounds_shed = self.counter(
+            "uptime_rounds_shed_total",
+            "Check rounds skipped to shed load",
+            ("service", "priority"),
+        )
+        self.effective_interval = self.gauge(
+            "uptime_service_effective_interval_seconds",
+            "Current wait between check rounds of a service",
+            ("service",),
+        )
+        self.probe_demand = self.gauge(
+            "uptime_probe_demand_per_second",
+            "Check rounds per second requested by all services before budgeting",
+        )
+        self.control_actions = self.counter(
+            "uptime_control_actions_total",
+            "Services changed by control API actions (pause, resume, mute, unmute, check)",
+            ("action",),
+        )
+        self.services_paused = self.gauge(
+            "uptime_services_paused", "Services whose checks are paused"
+        )
+        self.services_muted = self.gauge(
+            "uptime_services_muted", "Services whose alerts are muted"
+        )
+        self.notifications_muted = self.counter(
+            "uptime_notifications_muted_total",
+            "Status changes not alerted because the service is muted",
+            ("status",),
+        )
+        self.executor_queue_depth = self.gauge(
+            "uptime_executor_queue_depth",
+            "Blocking jobs waiting for an executor thread",
+            ("pool",),
+        )
+        self.executor_running = self.gauge(
+            "uptime_executor_running",
+            "Blocking jobs currently running in an executor thread",
+            ("pool",),
+        )
+        self.executor_wait = self.histogram(
+            "uptime_executor_wait_seconds",
+            "Time blocking jobs waited for an executor thread",
+            ("pool",),
+        )
+        self.executor_run = self.histogram(
+            "uptime_executor_run_seconds",
+            "Time blocking jobs ran on an executor thread",
+            ("pool",),
+        )
+        self.executor_rejections = self.counter(
+            "uptime_executor_rejections_total",
+            "Blocking jobs rejected because the executor queue was full",
+            ("pool",),
+        )
+        self.event_loop_lag = self.gauge(
+            "uptime_event_loop_lag_seconds",
+            "Most recently measured event loop scheduling delay",
+        )
+        self.event_loop_lag_histogram = self.histogram(
+            "uptime_event_loop_lag_histogram_seconds",
+            "Distribution of event loop scheduling delays",
+        )
@@ -0,0 +1,258 @@
+import asyncio
+import logging
+import random
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+
+from uptime_monitor.clock import Clock
+from uptime_monitor.metrics import MonitorMetrics
+from uptime_monitor.routing import DEFAULT_ROUTE
+
+WEBHOOK_FORMATS = ("json", "slack", "mattermost")
+
+# Settings per webhook, overridable under each entry of `webhooks`
+DEFAULT_WEBHOOK = {
+    "format": "json",
+    "timeout": 10,
+    "rate": 1.0,  # requests per second
+    "burst": 5,  # requests allowed at once after an idle period
+    "max_tries": 5,
+    "backoff": 1.0,  # delay before the first retry, doubled for each retry
+    "backoff_max": 60.0,
+    "batch": False,  # send several queued events in one request
+    "batch_size": 50,
+    "batch_delay": 0.0,  # seconds to wait for more events before sending
+    "queue_size": 1000,
+    "headers": {},
+}
+
+# Connections kept by the session shared by all webhooks
+POOL_LIMIT = 100
+
+
+class WebhookError(Exception):
+    """A webhook request failed; ``retry`` tells whether it may succeed later."""
+
+    def __init__(self, message: str, retry: bool = True, delay: float = None):
+        super().__init__(message)
+        self.retry = retry
+        self.delay = delay
+
+
+class RateLimiter:
+    """Token bucket allowing ``rate`` requests per second, ``burst`` at once."""
+
+    def __init__(self, clock: Clock, rate: float, burst: float):
+        self.clock = clock
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = self.burst
+        self.updated = clock.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = self.clock.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await self.clock.sleep((1 - self.tokens) / self.rate)
+
+
+def build_payload(webhook: Dict, events: List[Dict]):
+    """Request body for ``events`` in the webhook's format.
+
+    JSON webhooks get the event object, or an array of them when batching.
+    Slack and Mattermost get one message with a line per event.
+    """
+    if webhook["format"] == "json":
+        return events if webhook["batch"] else events[0]
+    payload = {"text": "\n".join(event["message"] for event in events)}
+    for key in ("channel", "username", "icon_emoji", "icon_url"):
+        if webhook.get(key):
+            payload[key] = webhook[key]
+    return payload
+
+
+class WebhookNotifier:
+    """Fan-out of status changes to webhooks over one pooled HTTP session.
+
+    Every webhook has its own queue and worker, so a slow or failing
+    endpoint never delays the others, and events reach each endpoint in the
+    order they happened. Workers respect the endpoint's rate limit, retry
+    with exponential backoff, and with ``batch`` enabled send everything
+    queued up to ``batch_size`` in one request.
+    """
+
+    def __init__(
+        self,
+        webhooks: Dict[str, Dict],
+        clock: Clock,
+        metrics: Optional[MonitorMetrics] = None,
+    ):
+        self.clock = clock
+        self.metrics = metrics or MonitorMetrics()
+        self.webhooks = {}
+        for name, webhook in webhooks.items():
+            settings = dict(DEFAULT_WEBHOOK, **webhook)
+            if not settings.get("url"):
+                raise ValueError(f"Webhook {name} has no url")
+            if settings["format"] not in WEBHOOK_FORMATS:
+                raise ValueError(
+                    f"Webhook {name} has unknown format {settings['format']}"
+                )
+            self.webhooks[name] = settings
+        self.session = None
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._workers: List[asyncio.Task] = []
+
+    async def start(self):
+        """Open the shared session and start one worker per webhook."""
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=POOL_LIMIT)
+        )
+        for name, webhook in self.webhooks.items():
+            self._queues[name] = asyncio.Queue(webhook["queue_size"])
+            self._workers.append(asyncio.create_task(self._worker(name, webhook)))
+
+    def notify(
+        self,
+        event: Dict,
+        routes: Iterable[str] = (DEFAULT_ROUTE,),
+        webhooks: Optional[Iterable[str]] = None,
+    ):
+        """Queue an event without waiting for delivery.
+
+        The event goes to ``webhooks`` (default: all of them); delivery
+        results are counted for each of the alert ``routes`` it came from.
+        """
+        item = (event, tuple(routes))
+        names = self._queues if webhooks is None else webhooks
+        for name in names:
+            queue = self._queues.get(name)
+            if queue is None:
+                # Not started yet, or already closed
+                self._count(name, [item], "failed")
+                logging.error(f"Webhook {name} is not running, dropping event")
+                continue
+            try:
+                queue.put_nowait(item)
+            except asyncio.QueueFull:
+                self._count(name, [item], "failed")
+                logging.error(f"Webhook {name} queue full, dropping event")
+                continue
+            self.metrics.webhook_queue_depth.set(queue.qsize(), webhook=name)
+
+    async def close(self, timeout: float = 5.0):
+        """Deliver what is queued within ``timeout``, then stop the workers."""
+        if self.session is None:
+            return
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(queue.join() for queue in self._queues.values())),
+                timeout,
+            )
+        except asyncio.TimeoutError:
+            logging.warning("Webhook events left undelivered at shutdown")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queues = {}
+        await self.session.close()
+        self.session = None
+
+    async def _worker(self, name: str, webhook: Dict):
+        queue = self._queues[name]
+        limiter = RateLimiter(self.clock, webhook["rate"], webhook["burst"])
+        while True:
+            items = [await queue.get()]
+            try:
+                if webhook["batch"] and webhook["batch_delay"]:
+                    await self.clock.sleep(webhook["batch_delay"])
+                await limiter.acquire()
+                # Events queued while waiting go out in the same request
+                while (
+                    webhook["batch"]
+                    and len(items) < webhook["batch_size"]
+                    and not queue.empty()
+                ):
+                    items.append(queue.get_nowait())
+                self.metrics.webhook_queue_depth.set(queue.qsize(), webhook=name)
+                await self._deliver(name, webhook, items, limiter)
+            finally:
+                for _ in items:
+                    queue.task_done()
+
+    def _count(self, name: str, items: List[Tuple], outcome: str):
+        for event, routes in items:
+            if outcome == "sent":
+                self.metrics.notifications.inc(
+                    channel="webhook", status=event["status"]
+                )
+            else:
+                self.metrics.notification_failures.inc(channel="webhook")
+            for route in routes:
+                self.metrics.route_notifications.inc(
+                    route=route, channel=name, outcome=outcome
+                )
+
+    async def _deliver(
+        self, name: str, webhook: Dict, items: List[Tuple], limiter: RateLimiter
+    ):
+        events = [event for event, _ in items]
+        payload = build_payload(webhook, events)
+        started = self.clock.monotonic()
+        try:
+            for attempt in range(webhook["max_tries"]):
+                if attempt > 0:
+                    await limiter.acquire()
+                try:
+                    await self._post(webhook, payload)
+                    self._count(name, items, "sent")
+                    logging.info(
+                        f"Webhook {name} notified of {len(events)} status change(s)"
+                    )
+                    return
+                except WebhookError as e:
+                    error = e
+                if not error.retry or attempt + 1 == webhook["max_tries"]:
+                    break
+                self.metrics.webhook_retries.inc(webhook=name)
+                delay = error.delay
+                if delay is None:
+                    delay = webhook["backoff"] * 2**attempt
+                    delay *= random.uniform(0.8, 1.2)
+                await self.clock.sleep(min(delay, webhook["backoff_max"]))
+            self._count(name, items, "failed")
+            logging.error(
+                f"Failed to notify webhook {name} of {len(events)} status change(s): {error}"
+            )
+        finally:
+            self.metrics.notification_duration.observe(
+                self.clock.monotonic() - started, channel="webhook"
+            )
+
+    async def _post(self, webhook: Dict, payload):
+        try:
+            async with self.session.post(
+                webhook["url"],
+                json=payload,
+                headers=webhook["headers"],
+                timeout=aiohttp.ClientTimeout(total=webhook["timeout"]),
+            ) as response:
+                if response.status < 300:
+                    return
+                # Rate limited or server trouble may pass, client errors won't
+                retry = response.status == 429 or response.status >= 500
+                delay = None
+                retry_after = response.headers.get("Retry-After", "")
+                if retry and retry_after.isdigit():
+                    delay = float(retry_after)
+                raise WebhookError(f"HTTP status {response.status}", retry, delay)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise WebhookError(f"{type(e).__name__}: {e}") from e
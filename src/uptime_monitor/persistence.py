@@ -0,0 +1,72 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+# Bumped when the snapshot layout changes; other versions are ignored
+SNAPSHOT_VERSION = 1
+
+
+def encode_time(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def decode_time(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+class StateStore:
+    """Snapshot of the monitor state in a JSON file.
+
+    Snapshots are written to a temporary file in the same directory, flushed
+    to disk and renamed over the previous one, so a crash mid-write never
+    leaves a truncated file behind. Saves may run in executor threads; a
+    snapshot with a lower ``sequence`` than the one on disk is dropped, so a
+    slow periodic save can't overwrite the final one taken at shutdown.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._sequence = -1
+
+    def save(self, snapshot: Dict) -> bool:
+        """Write a snapshot; returns False if a newer one was already written."""
+        with self._lock:
+            sequence = snapshot.get("sequence", 0)
+            if sequence < self._sequence:
+                return False
+            self._write({"version": SNAPSHOT_VERSION, **snapshot})
+            self._sequence = sequence
+            return True
+
+    def _write(self, snapshot: Dict):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".state-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as file:
+                json.dump(snapshot, file, separators=(",", ":"))
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def load(self) -> Optional[Dict]:
+        """Last snapshot, or None if there is no usable one."""
+        try:
+            with open(self.path) as file:
+                snapshot = json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable state file {self.path}: {e}")
+            return None
+        if snapshot.get("version") != SNAPSHOT_VERSION:
+            logging.warning(f"Ignoring state file {self.path} from another version")
+            return None
+        return snapshot
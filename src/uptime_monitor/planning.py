@@ -0,0 +1,366 @@
+import contextlib
+import json
+import logging
+import math
+import sys
+from typing import Dict, Iterable, List, Tuple
+
+from uptime_monitor import ServiceMonitor
+from uptime_monitor.executors import open_file_limit
+from uptime_monitor.notifications import POOL_LIMIT
+
+# Fractions of the services DOWN at the same time modelled by default
+DEFAULT_FAILURE_RATES = (0.0, 0.1, 0.5, 1.0)
+
+# Assumed duration of a successful attempt, in seconds
+DEFAULT_LATENCY = 0.25
+
+# Seconds an SMTP delivery holds an email thread
+EMAIL_SECONDS = 1.0
+
+# Peaks are the mean plus this many standard deviations; rounds of
+# independent services start at random phases, like Poisson arrivals
+PEAK_SIGMAS = 3
+
+# A round taking longer than this fraction of the interval moves the next
+# rounds further apart than configured
+SLIP_TOLERANCE = 0.5
+
+# Share of the open file limit the monitor may plan to use
+FD_HEADROOM = 0.8
+
+# Rough resident memory: interpreter and libraries, per configured service
+# (config, state, metrics series, latency samples), per probe in flight and
+# per executor thread
+BASE_MEMORY = 60 * 2**20
+SERVICE_MEMORY = 8 * 2**10
+PROBE_MEMORY = 64 * 2**10
+THREAD_MEMORY = 64 * 2**10
+
+# File descriptors open besides probe sockets: logs, state, listeners, loop
+BASE_FDS = 32
+
+
+def failing_round(service: Dict, policy: Dict) -> Tuple[float, float, int]:
+    """Duration, time in attempts and attempts of a round where all time out.
+
+    Follows the retry loop of ``ServiceMonitor._run_check_round`` without
+    jitter: attempts of ``timeout`` with backoff in between, cut off by the
+    round deadline.
+    """
+    deadline = policy["deadline"]
+    elapsed = busy = 0.0
+    attempts = 0
+    for attempt in range(service["max_tries"]):
+        remaining = deadline - elapsed
+        if attempt > 0 and remaining <= 0:
+            break
+        timeout = min(service["timeout"], max(remaining, 0.001))
+        elapsed += timeout
+        busy += timeout
+        attempts += 1
+        if attempt + 1 < service["max_tries"]:
+            delay = min(
+                policy["backoff"] * policy["multiplier"] ** attempt,
+                policy["backoff_max"],
+                deadline - elapsed,
+            )
+            if delay <= 0:
+                break
+            elapsed += delay
+    return elapsed, busy, attempts
+
+
+def service_models(monitor, latency: float = DEFAULT_LATENCY) -> List[Dict]:
+    """Round timings of every service the monitor probes itself."""
+    models = []
+    for name, service in monitor.config["services"].items():
+        if not monitor._runs_locally(name, service):
+            continue
+        settings = monitor.scheduler.settings(service)
+        duration, busy, attempts = failing_round(
+            service, monitor._retry_policy(service)
+        )
+        models.append(
+            {
+                "name": name,
+                "type": service["type"],
+                "interval": service["interval"],
+                # Adaptive services are probed at min_interval while DOWN
+                "down_interval": (
+                    settings["min_interval"]
+                    if settings["enabled"]
+                    else service["interval"]
+                ),
+                "success": min(latency, service["timeout"]),
+                "failed_round": duration,
+                "failed_busy": busy,
+                "failed_attempts": attempts,
+            }
+        )
+    return models
+
+
+def missed_intervals(models: List[Dict]) -> List[str]:
+    """Services whose failing rounds push the next rounds too far apart."""
+    problems = []
+    for m in models:
+        if m["failed_round"] > m["down_interval"] * SLIP_TOLERANCE:
+            # The interval is waited after the round, not from its start
+            problems.append(
+                f"{m['name']}: failing rounds take {m['failed_round']:.1f}s, "
+                f"checked every {m['down_interval'] + m['failed_round']:.1f}s "
+                f"instead of {m['down_interval']:.1f}s while DOWN"
+            )
+    return problems
+
+
+def _peak(mean: float, limit: float) -> int:
+    if mean <= 0:
+        return 0
+    return min(math.ceil(mean + PEAK_SIGMAS * math.sqrt(mean)), limit)
+
+
+def _scenario(monitor, models: List[Dict], failure_rate: float) -> Dict:
+    """Steady state with ``failure_rate`` of the services failing every round."""
+    f = failure_rate
+    problems = []
+    # The scheduler stretches all intervals alike to stay within the budget
+    demand = sum((1 - f) / m["interval"] + f / m["down_interval"] for m in models)
+    budget = monitor.scheduler.probe_budget
+    stretch = demand / budget if budget and demand > budget else 1.0
+    if stretch > 1:
+        problems.append(
+            f"probe_budget of {budget}/s is exceeded ({demand:.1f}/s), "
+            f"all intervals are stretched {stretch:.2f}x"
+        )
+
+    rounds = attempts = in_flight = probing = 0.0
+    by_type = {"http": 0.0, "port": 0.0, "ping": 0.0}
+    for m in models:
+        # The interval is waited after each round, so rounds start every
+        # interval plus round duration
+        up_period = m["interval"] * stretch + m["success"]
+        down_period = m["down_interval"] * stretch + m["failed_round"]
+        rounds += (1 - f) / up_period + f / down_period
+        attempts += (1 - f) / up_period + f * m["failed_attempts"] / down_period
+        in_flight += (1 - f) * m["success"] / up_period
+        in_flight += f * m["failed_round"] / down_period
+        busy = (1 - f) * m["success"] / up_period + f * m["failed_busy"] / down_period
+        probing += busy
+        by_type[m["type"]] += busy
+
+    limit = monitor.dispatcher.limit or len(models)
+    if in_flight > limit:
+        problems.append(
+            f"{in_flight:.1f} rounds in flight on average exceed "
+            f"max_concurrent_rounds of {limit}, rounds fall behind"
+        )
+    peak = _peak(probing, limit)
+
+    executors = {}
+    for pool in ("port", "ping"):
+        executor = monitor.executors[pool]
+        demand = by_type[pool]
+        executors[pool] = {
+            "workers": executor.workers,
+            "queue_size": executor.queue_size,
+            "demand": demand,
+            "utilization": demand / executor.workers,
+            "peak_queued": max(0, _peak(demand, limit) - executor.workers),
+        }
+        if demand > executor.workers:
+            problems.append(
+                f"{pool} executor needs {demand:.1f} threads, has "
+                f"{executor.workers}; checks wait in its queue and time out"
+            )
+        if executors[pool]["peak_queued"] > executor.queue_size:
+            problems.append(
+                f"{pool} executor queue of {executor.queue_size} overflows, "
+                "checks are rejected"
+            )
+
+    # Every probe in flight holds one socket: HTTP, TCP or raw ICMP
+    fds = peak + BASE_FDS
+    if monitor.webhooks is not None:
+        fds += POOL_LIMIT
+    threads = sum(
+        min(executor.workers, max(_peak(by_type.get(name, 0), limit), 1))
+        for name, executor in monitor.executors.items()
+    )
+    memory = (
+        BASE_MEMORY
+        + len(models) * SERVICE_MEMORY
+        + peak * PROBE_MEMORY
+        + threads * THREAD_MEMORY
+    )
+
+    notifications = _notifications(monitor, math.ceil(f * len(models)), problems)
+    return {
+        "failure_rate": f,
+        "stretch": stretch,
+        "rounds_per_second": rounds,
+        "probes_per_second": attempts,
+        "rounds_in_flight": in_flight,
+        "mean_concurrent_probes": probing,
+        "peak_concurrent_probes": peak,
+        "executors": executors,
+        "sockets": peak,
+        "file_descriptors": fds,
+        "threads": threads,
+        "memory_bytes": memory,
+        "notifications": notifications,
+        "problems": problems,
+    }
+
+
+def _notifications(monitor, alerts: int, problems: List[str]) -> Dict:
+    """Time to deliver the DOWN alerts of a shared outage on each channel."""
+    channels = {}
+    if monitor.smtp_server:
+        email = monitor.executors["email"]
+        channels["email"] = alerts * EMAIL_SECONDS / email.workers
+        if alerts > email.workers + email.queue_size:
+            problems.append(
+                f"{alerts} alerts overflow the email queue of {email.queue_size}"
+            )
+    if monitor.webhooks is not None:
+        for name, webhook in monitor.webhooks.webhooks.items():
+            requests = alerts
+            if webhook["batch"]:
+                requests = math.ceil(alerts / webhook["batch_size"])
+            channels[f"webhook {name}"] = (
+                max(0, requests - webhook["burst"]) / webhook["rate"]
+            )
+            if alerts > webhook["queue_size"]:
+                problems.append(
+                    f"{alerts} alerts overflow the queue of webhook {name} "
+                    f"({webhook['queue_size']})"
+                )
+    return {"alerts": alerts, "drain_seconds": channels}
+
+
+def plan_capacity(
+    monitor,
+    failure_rates: Iterable[float] = DEFAULT_FAILURE_RATES,
+    scale: float = 1.0,
+    latency: float = DEFAULT_LATENCY,
+) -> Dict:
+    """Predict the load of the monitor's schedule at each failure rate.
+
+    ``scale`` multiplies the number of services, replicating the configured
+    ones, to plan for growth. The model is analytic: every failing round
+    times out on all its attempts, successful attempts take ``latency``.
+    """
+    models = service_models(monitor, latency)
+    intervals = missed_intervals(models)
+    if models and scale != 1:
+        models = [models[i % len(models)] for i in range(round(len(models) * scale))]
+    limit = monitor.dispatcher.limit or len(models)
+    startup = {"rounds": min(len(models), limit), "problems": []}
+    # All services start their first round at once without a state snapshot
+    for pool in ("port", "ping"):
+        executor = monitor.executors[pool]
+        started = min(sum(1 for m in models if m["type"] == pool), limit)
+        if started > executor.workers + executor.queue_size:
+            startup["problems"].append(
+                f"{started} {pool} checks at startup overflow the {pool} executor "
+                f"({executor.workers} workers, queue of {executor.queue_size})"
+            )
+    fd_limit = open_file_limit()
+    scenarios = [_scenario(monitor, models, f) for f in failure_rates]
+    for scenario in scenarios:
+        if fd_limit and scenario["file_descriptors"] > fd_limit * FD_HEADROOM:
+            scenario["problems"].append(
+                f"{scenario['file_descriptors']} file descriptors are close to "
+                f"the limit of {fd_limit}"
+            )
+    return {
+        "services": len(models),
+        "latency": latency,
+        "open_file_limit": fd_limit,
+        "intervals": intervals,
+        "startup": startup,
+        "scenarios": scenarios,
+    }
+
+
+def format_plan(plan: Dict) -> str:
+    """The plan as a table of scenarios followed by the problems found."""
+    header = (
+        "Failing",
+        "Rounds/s",
+        "Probes/s",
+        "Concurrent",
+        "Peak",
+        "Port util",
+        "Ping util",
+        "FDs",
+        "Memory MB",
+        "Alerts",
+    )
+    rows = [
+        (
+            f"{s['failure_rate']:.0%}",
+            f"{s['rounds_per_second']:.2f}",
+            f"{s['probes_per_second']:.2f}",
+            f"{s['mean_concurrent_probes']:.1f}",
+            str(s["peak_concurrent_probes"]),
+            f"{s['executors']['port']['utilization']:.0%}",
+            f"{s['executors']['ping']['utilization']:.0%}",
+            str(s["file_descriptors"]),
+            f"{s['memory_bytes'] / 2**20:.0f}",
+            str(s["notifications"]["alerts"]),
+        )
+        for s in plan["scenarios"]
+    ]
+    widths = [max(len(row[i]) for row in [header, *rows]) for i in range(len(header))]
+    lines = [
+        f"{plan['services']} services probed locally, "
+        f"{plan['startup']['rounds']} rounds at startup"
+    ]
+    for row in [header, *rows]:
+        lines.append("  ".join(cell.rjust(width) for cell, width in zip(row, widths)))
+    for scenario in plan["scenarios"]:
+        for channel, seconds in scenario["notifications"]["drain_seconds"].items():
+            if seconds:
+                lines.append(
+                    f"{scenario['failure_rate']:.0%} failing: {channel} takes "
+                    f"{seconds:.0f}s to deliver the alerts"
+                )
+    problems = (
+        plan["intervals"]
+        + plan["startup"]["problems"]
+        + [
+            f"{scenario['failure_rate']:.0%} failing: {problem}"
+            for scenario in plan["scenarios"]
+            for problem in scenario["problems"]
+        ]
+    )
+    if problems:
+        lines.append("Problems:")
+        lines.extend(f"  {problem}" for problem in problems)
+    return "\n".join(lines)
+
+
+def plan_main(args) -> int:
+    """`plan` command: print the capacity plan, exit 1 if it has problems."""
+    with contextlib.redirect_stdout(sys.stderr):
+        monitor = ServiceMonitor(args.config, persist=False)
+        logging.getLogger().setLevel(logging.ERROR)
+    plan = plan_capacity(
+        monitor,
+        args.failure_rate or DEFAULT_FAILURE_RATES,
+        args.scale,
+        args.latency or DEFAULT_LATENCY,
+    )
+    if args.json:
+        print(json.dumps(plan, indent=2))
+    else:
+        print(format_plan(plan))
+    problems = (
+        plan["intervals"]
+        or plan["startup"]["problems"]
+        or any(scenario["problems"] for scenario in plan["scenarios"])
+    )
+    return 1 if problems else 0
@@ -0,0 +1,167 @@
+import asyncio
+import heapq
+import logging
+from collections import defaultdict
+from itertools import count
+from typing import Dict, List, Optional, Tuple
+
+from uptime_monitor.clock import Clock
+from uptime_monitor.metrics import MonitorMetrics
+
+# Priority classes, most important first
+PRIORITIES = ("critical", "high", "normal", "low")
+DEFAULT_PRIORITY = "normal"
+
+# Settings under `priorities`
+DEFAULT_PRIORITIES = {
+    "max_concurrent_rounds": None,  # default: no limit
+    "lag_threshold": 5.0,  # seconds of dispatch lag before shedding load
+    "stretch": [],  # tiers whose intervals are stretched while overloaded
+    "stretch_factor": 2.0,
+    "shed": ["low"],  # tiers whose rounds are skipped while overloaded
+}
+
+# Weight of the newest lag sample in the smoothed dispatch lag
+LAG_SMOOTHING = 0.2
+
+# Rounds starting later than this many seconds count as delayed
+DELAY_TOLERANCE = 1.0
+
+
+class RoundDispatcher:
+    """Hands out check round slots by priority and sheds load when late.
+
+    Every round asks for a slot before probing. With
+    ``max_concurrent_rounds`` set, rounds beyond the limit wait in one
+    queue ordered by priority class, then by when they were due, so a
+    saturated monitor runs critical rounds first and lets low ones slip.
+
+    The dispatcher keeps a smoothed lag between when rounds were due and
+    when they got their slot. While it exceeds ``lag_threshold`` the
+    monitor is overloaded: rounds of the ``shed`` tiers are skipped and
+    the intervals of the ``stretch`` tiers are multiplied by
+    ``stretch_factor``. It recovers below half the threshold. Late starts,
+    stretched intervals and shed rounds are counted per service.
+    """
+
+    def __init__(
+        self, config: Dict, clock: Clock, metrics: Optional[MonitorMetrics] = None
+    ):
+        self.clock = clock
+        self.metrics = metrics or MonitorMetrics()
+        settings = dict(DEFAULT_PRIORITIES, **(config.get("priorities") or {}))
+        for key in ("stretch", "shed"):
+            for tier in settings[key]:
+                if tier not in PRIORITIES:
+                    raise ValueError(f"Unknown priority {tier} under priorities.{key}")
+        self.limit = settings["max_concurrent_rounds"]
+        self.lag_threshold = settings["lag_threshold"]
+        self.stretch_factor = settings["stretch_factor"]
+        self.stretch_tiers = frozenset(settings["stretch"])
+        self.shed_tiers = frozenset(settings["shed"])
+        self.priorities: Dict[str, str] = {}
+        for name, service in (config.get("services") or {}).items():
+            priority = service.get("priority", DEFAULT_PRIORITY)
+            if priority not in PRIORITIES:
+                raise ValueError(f"Service {name} has unknown priority {priority}")
+            self.priorities[name] = priority
+        self.running = 0
+        self.lag = 0.0
+        self.overloaded = False
+        self._waiting: List[Tuple[int, float, int, asyncio.Future]] = []
+        self._order = count()
+        self.delayed_rounds: Dict[str, int] = defaultdict(int)
+        self.delay: Dict[str, float] = defaultdict(float)
+        self.shed: Dict[str, int] = defaultdict(int)
+
+    def priority(self, name: str) -> str:
+        return self.priorities.get(name, DEFAULT_PRIORITY)
+
+    async def acquire(self, name: str, due: float) -> bool:
+        """Wait for a round slot for ``name``, due at monotonic time ``due``.
+
+        Returns False when the round is shed; otherwise the caller runs the
+        round and calls ``release`` afterwards.
+        """
+        if self.limit and (self.running >= self.limit or self._waiting):
+            rank = PRIORITIES.index(self.priority(name))
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiting, (rank, due, next(self._order), future))
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    self.release()  # The slot was handed over already
+                raise
+        else:
+            self.running += 1
+
+        lag = max(0.0, self.clock.monotonic() - due)
+        self._observe(lag)
+        priority = self.priority(name)
+        if self.overloaded and priority in self.shed_tiers:
+            self.release()
+            self.shed[name] += 1
+            self.metrics.rounds_shed.inc(service=name, priority=priority)
+            return False
+        if lag > DELAY_TOLERANCE:
+            self._delayed(name, lag)
+        return True
+
+    def release(self):
+        """Pass the slot to the most important waiting round, or free it."""
+        while self._waiting:
+            *_, future = heapq.heappop(self._waiting)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.running -= 1
+
+    def interval(self, name: str, interval: float) -> float:
+        """Wait until the next round, stretched for some tiers when overloaded."""
+        if not self.overloaded or self.priority(name) not in self.stretch_tiers:
+            return interval
+        self._delayed(name, interval * (self.stretch_factor - 1))
+        return interval * self.stretch_factor
+
+    def _delayed(self, name: str, seconds: float):
+        self.delayed_rounds[name] += 1
+        self.delay[name] += seconds
+        self.metrics.round_delay.inc(
+            seconds, service=name, priority=self.priority(name)
+        )
+
+    def _observe(self, lag: float):
+        self.lag += LAG_SMOOTHING * (lag - self.lag)
+        self.metrics.dispatch_lag.set(self.lag)
+        if not self.overloaded and self.lag > self.lag_threshold:
+            self.overloaded = True
+            logging.warning(
+                f"Check rounds start {self.lag:.1f}s late: shedding "
+                f"{', '.join(sorted(self.shed_tiers)) or 'no'} and stretching "
+                f"{', '.join(sorted(self.stretch_tiers)) or 'no'} priority rounds"
+            )
+        elif self.overloaded and self.lag < self.lag_threshold / 2:
+            self.overloaded = False
+            logging.warning(
+                f"Check rounds back on schedule ({self.lag:.1f}s late), load shedding ended"
+            )
+        self.metrics.scheduler_overloaded.set(int(self.overloaded))
+
+    def report(self) -> Dict:
+        """Services that were delayed or shed, by how much and how often."""
+        services = {}
+        for name in sorted(set(self.delayed_rounds) | set(self.shed)):
+            services[name] = {
+                "priority": self.priority(name),
+                "delayed_rounds": self.delayed_rounds.get(name, 0),
+                "delay": round(self.delay.get(name, 0.0), 3),
+                "shed_rounds": self.shed.get(name, 0),
+            }
+        return {
+            "overloaded": self.overloaded,
+            "lag": round(self.lag, 3),
+            "running": self.running,
+            "waiting": sum(not item[3].done() for item in self._waiting),
+            "services": services,
+        }
@@ -0,0 +1,119 @@
+import asyncio
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+# Service settings that decide what a probe does, per service type. Services
+# whose values and timeout match run the same probe; the schedule is not part
+# of it.
+PROBE_FIELDS = {
+    "http": ("url", "method", "expect", "conditional"),
+    "port": ("host", "port"),
+    "ping": ("host",),
+}
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def target_key(service: Dict) -> Optional[Tuple]:
+    """Hashable description of what a service's probe checks.
+
+    Details of the last probe (failure reason, timings, validators) are kept
+    by this key, so services checking a URL differently never see each
+    other's.
+    """
+    fields = PROBE_FIELDS.get(service.get("type"))
+    if fields is None:
+        return None
+    values = [_freeze(service.get(field)) for field in fields]
+    if service["type"] == "http":
+        values[1] = (service.get("method") or "GET").upper()
+    return (service["type"], *values)
+
+
+def probe_key(service: Dict) -> Optional[Tuple]:
+    """Hashable description of the probe a service runs.
+
+    The timeout is part of it, so a service never inherits the failure of a
+    probe that gave up sooner than it would have.
+    """
+    key = target_key(service)
+    return None if key is None else (*key, service.get("timeout"))
+
+
+def group_by_probe(services: Dict[str, Dict]) -> Dict[Tuple, List[str]]:
+    """Group service names by identical probe specs."""
+    groups = defaultdict(list)
+    for name, service in services.items():
+        key = probe_key(service)
+        if key is not None:
+            groups[key].append(name)
+    return dict(groups)
+
+
+class ProbeCoalescer:
+    """Share probe results between services that probe the same target.
+
+    A probe that is already running for a key is joined instead of started
+    again (single-flight), and a result that finished less than ``window``
+    seconds ago is reused unless a ``fresh`` result is asked for.
+    """
+
+    def __init__(self, clock, window: float = 5.0):
+        self.clock = clock
+        self.window = window
+        self.saved = 0  # probes not run thanks to sharing
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._subscribers: Dict[asyncio.Future, int] = {}
+        self._recent: Dict[Hashable, Tuple[float, bool]] = {}
+
+    async def run(
+        self, key: Hashable, probe: Callable[[], Awaitable[bool]], fresh: bool = False
+    ) -> Tuple[bool, Optional[str]]:
+        """Run or join the probe for ``key``.
+
+        Returns the result and how it was obtained: None when the probe ran,
+        "inflight" when an already running probe was joined and "recent" when
+        a fresh result was reused. With ``fresh``, only a running probe is
+        joined: its result can't be older than the call.
+        """
+        recent = None if fresh else self._recent.get(key)
+        if recent is not None:
+            finished, result = recent
+            if self.clock.monotonic() - finished <= self.window:
+                self.saved += 1
+                return result, "recent"
+            del self._recent[key]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.saved += 1
+            return await self._join(task), "inflight"
+
+        task = asyncio.ensure_future(probe())
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._finished(key, done))
+        return await self._join(task), None
+
+    async def _join(self, task: asyncio.Future) -> bool:
+        self._subscribers[task] = self._subscribers.get(task, 0) + 1
+        try:
+            # Shielded so a subscriber timing out doesn't cancel the others
+            return await asyncio.shield(task)
+        finally:
+            self._subscribers[task] -= 1
+            if not self._subscribers[task]:
+                # Nobody waits for the result any more
+                del self._subscribers[task]
+                task.cancel()
+
+    def _finished(self, key: Hashable, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled() and task.exception() is None:
+            self._recent[key] = (self.clock.monotonic(), task.result())
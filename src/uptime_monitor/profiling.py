@@ -0,0 +1,182 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+# Seconds between stack samples; 20 samples per second
+DEFAULT_SAMPLE_INTERVAL = 0.05
+
+# Fields of the per-service cost counters, in seconds or bytes
+COST_FIELDS = ("cpu", "wall", "executor", "sent", "received")
+
+# Cost record of the service whose round the current task or thread runs
+_current: ContextVar[Optional["ServiceCost"]] = ContextVar(
+    "uptime_service_cost", default=None
+)
+_lock = threading.Lock()
+
+
+class ServiceCost:
+    """Resources used by the check rounds of one service."""
+
+    __slots__ = ("rounds",) + COST_FIELDS
+
+    def __init__(self):
+        self.rounds = 0
+        for field in COST_FIELDS:
+            setattr(self, field, 0.0)
+
+    def as_dict(self) -> Dict:
+        costs = {"rounds": self.rounds}
+        for field in COST_FIELDS:
+            costs[field] = getattr(self, field)
+            costs[f"{field}_per_round"] = (
+                costs[field] / self.rounds if self.rounds else 0
+            )
+        return costs
+
+
+def charge(field: str, amount: float):
+    """Add to the cost of the service being checked, if any.
+
+    Safe to call from executor threads running in a copied context.
+    """
+    cost = _current.get()
+    if cost is not None:
+        with _lock:
+            setattr(cost, field, getattr(cost, field) + amount)
+
+
+def charging() -> bool:
+    """Whether costs of the current task are charged to a service."""
+    return _current.get() is not None
+
+
+class CostTracker:
+    """Per-service CPU, wall, executor time and bytes of check rounds.
+
+    ``bind`` attributes everything the calling task (and the executor jobs
+    and probes it starts) does to a service. CPU time is the event loop
+    thread's CPU time while the round's coroutine was running; executor
+    time is the time its blocking jobs ran on pool threads.
+    """
+
+    def __init__(self):
+        self.services: Dict[str, ServiceCost] = {}
+
+    def record(self, service_name: str) -> ServiceCost:
+        return self.services.setdefault(service_name, ServiceCost())
+
+    def bind(self, service_name: str) -> ServiceCost:
+        """Charge the current task's costs to ``service_name``."""
+        cost = self.record(service_name)
+        _current.set(cost)
+        return cost
+
+    def top(self, limit: int = 10, sort: str = "cpu") -> List[Dict]:
+        """The most expensive services by total ``sort`` cost."""
+        if sort.removesuffix("_per_round") not in COST_FIELDS:
+            raise ValueError(f"Unknown cost {sort}")
+        rows = [
+            dict(service=name, **cost.as_dict())
+            for name, cost in list(self.services.items())
+            if cost.rounds
+        ]
+        rows.sort(key=lambda row: row[sort], reverse=True)
+        return rows[:limit]
+
+
+class CpuMeter:
+    """Awaitable running a coroutine and adding its CPU time to ``cost``.
+
+    The thread's CPU clock is read around every step of the coroutine, so
+    only time the coroutine itself spends on the event loop thread counts,
+    not other tasks running while it waits.
+    """
+
+    def __init__(self, coro, cost: ServiceCost):
+        self._coro = coro
+        self._cost = cost
+
+    def __await__(self):
+        send, error = None, None
+        while True:
+            started = time.thread_time()
+            try:
+                if error is None:
+                    future = self._coro.send(send)
+                else:
+                    future = self._coro.throw(error)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                self._cost.cpu += time.thread_time() - started
+            try:
+                send, error = (yield future), None
+            except BaseException as e:
+                send, error = None, e
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return (
+        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    )
+
+
+class StackSampler:
+    """Samples the stacks of all threads from a background thread.
+
+    Samples are aggregated into folded stacks ("thread;outer;...;inner
+    count" per line), the input format of flamegraph.pl, speedscope and
+    most flame graph viewers.
+
+    A sample walks the frames of every thread while holding the GIL, so all
+    Python threads, the event loop included, pause for it: tens of
+    microseconds per thread with deep stacks, a few milliseconds with
+    dozens of busy executor threads. The default of 20 samples per second
+    keeps that to a few percent of the loop's time; shorter intervals give
+    finer profiles at a proportionally higher cost.
+    """
+
+    def __init__(self, interval: float = DEFAULT_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=self._run, name="uptime-profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                labels.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(labels))] += 1
+            self.samples += 1
+
+    def folded(self) -> str:
+        return "".join(
+            f"{stack} {count}\n" for stack, count in self.stacks.most_common()
+        )
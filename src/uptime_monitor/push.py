@@ -0,0 +1,78 @@
+import heapq
+from typing import Dict, List, Optional, Tuple
+
+# Grace period after a missed ping, in seconds, unless set per service
+DEFAULT_GRACE = 60
+
+
+class PushTracker:
+    """Ping deadlines of push services, kept in one heap.
+
+    A push service is expected to ping at least every ``period`` seconds;
+    it is overdue ``grace`` seconds after that. Each service has at most one
+    heap entry. A ping only moves the service's deadline in a dictionary,
+    and an entry that comes due after its deadline moved is pushed back with
+    the new deadline, so pings cost O(1) and expiry O(log n) per period.
+    """
+
+    def __init__(self, services: Dict[str, Dict]):
+        self.tokens: Dict[str, str] = {}
+        self.timeouts: Dict[str, float] = {}
+        self.graces: Dict[str, float] = {}
+        self.deadlines: Dict[str, float] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._queued = set()
+        for name, service in services.items():
+            if service.get("type") != "push":
+                continue
+            token = str(service.get("token") or "")
+            if not token:
+                raise ValueError(f"Push service {name} has no token")
+            if token in self.tokens:
+                raise ValueError(
+                    f"Push services {self.tokens[token]} and {name} share a token"
+                )
+            if not service.get("period"):
+                raise ValueError(f"Push service {name} has no period")
+            self.tokens[token] = name
+            self.graces[name] = service.get("grace", DEFAULT_GRACE)
+            self.timeouts[name] = service["period"] + self.graces[name]
+
+    def __len__(self) -> int:
+        return len(self.timeouts)
+
+    def service(self, token: str) -> Optional[str]:
+        return self.tokens.get(token)
+
+    def arm(self, name: str, deadline: float) -> bool:
+        """Set the deadline of ``name``.
+
+        Returns True when a new heap entry was added, which may be due
+        earlier than the one the expiry loop is waiting for.
+        """
+        self.deadlines[name] = deadline
+        if name in self._queued:
+            return False
+        self._queued.add(name)
+        heapq.heappush(self._heap, (deadline, name))
+        return True
+
+    def ping(self, name: str, now: float) -> bool:
+        return self.arm(name, now + self.timeouts[name])
+
+    def next_deadline(self) -> Optional[float]:
+        return self._heap[0][0] if self._heap else None
+
+    def expired(self, now: float) -> List[str]:
+        """Pop the services whose deadline passed without a ping."""
+        expired = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, name = heapq.heappop(self._heap)
+            current = self.deadlines.get(name, deadline)
+            if current > deadline:
+                heapq.heappush(self._heap, (current, name))
+                continue
+            self._queued.discard(name)
+            del self.deadlines[name]
+            expired.append(name)
+        return expired
@@ -0,0 +1,259 @@
+import bisect
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Bucket sizes in seconds. Buckets are aligned to the UTC epoch, so a day
+# bucket covers one UTC day.
+RESOLUTIONS = {"minute": 60, "hour": 3600, "day": 86400}
+
+# Days each resolution is kept. Dropping old fine buckets loses no counts,
+# as every result is also in the coarser buckets.
+DEFAULT_RETENTION = {"minute": 2, "hour": 90, "day": 800}
+
+# Upper bounds of the latency histogram buckets, plus an overflow bucket
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_HISTOGRAM_COLUMNS = [f"h{index}" for index in range(len(LATENCY_BUCKETS) + 1)]
+_VALUE_COLUMNS = ["up", "total", "latency_sum", *_HISTOGRAM_COLUMNS]
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS rollups (
+    service TEXT NOT NULL,
+    resolution INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    {", ".join(f"{column} REAL NOT NULL DEFAULT 0" for column in _VALUE_COLUMNS)},
+    PRIMARY KEY (service, resolution, bucket)
+) WITHOUT ROWID
+"""
+
+_UPSERT = f"""
+INSERT INTO rollups (service, resolution, bucket, {", ".join(_VALUE_COLUMNS)})
+VALUES (?, ?, ?, {", ".join("?" for _ in _VALUE_COLUMNS)})
+ON CONFLICT (service, resolution, bucket) DO UPDATE SET
+{", ".join(f"{column} = {column} + excluded.{column}" for column in _VALUE_COLUMNS)}
+"""
+
+_SUM = f"""
+SELECT {", ".join(f"COALESCE(SUM({column}), 0)" for column in _VALUE_COLUMNS)}
+FROM rollups
+WHERE service = ? AND resolution = ? AND bucket >= ? AND bucket < ?
+"""
+
+Segment = Tuple[int, int, int]  # resolution, first bucket, end (exclusive)
+
+
+def cover(
+    start: float, end: float, now: float, retention: Dict[int, float]
+) -> List[Segment]:
+    """Split ``[start, end)`` into bucket ranges, using the coarsest that fit.
+
+    Whole days come from day buckets, the partial days at both ends from
+    hour buckets and the partial hours from minute buckets, so a year is
+    answered from a few hundred buckets at most. Where the finer buckets
+    were already dropped by retention, the edge is rounded out to the
+    coarser bucket instead.
+    """
+    sizes = sorted(retention, reverse=True)
+    segments: List[Segment] = []
+
+    def split(low: float, high: float, level: int):
+        size = sizes[level]
+        if level + 1 == len(sizes):
+            # Finest level: include the partial buckets at the edges
+            segments.append(
+                (size, int(low // size * size), int(-(-high // size) * size))
+            )
+            return
+        finer = sizes[level + 1]
+        first = int(-(-low // size) * size)
+        last = int(high // size * size)
+        if first < last:
+            segments.append((size, first, last))
+            edges = [(low, first), (last, high)]
+        else:
+            edges = [(low, high)]
+        for edge_low, edge_high in edges:
+            if edge_low >= edge_high:
+                continue
+            if edge_low < now - retention[finer]:
+                # Finer buckets were already dropped: round out to this level
+                segments.append(
+                    (
+                        size,
+                        int(edge_low // size * size),
+                        int(-(-edge_high // size) * size),
+                    )
+                )
+            else:
+                split(edge_low, edge_high, level + 1)
+
+    if start < end:
+        split(start, end, 0)
+    return segments
+
+
+def _new_entry() -> List[float]:
+    return [0.0] * len(_VALUE_COLUMNS)
+
+
+def _summarize(values: List[float]) -> Dict:
+    up, total, latency_sum = values[:3]
+    histogram = values[3:]
+    samples = sum(histogram)
+    summary = {
+        "up": int(up),
+        "total": int(total),
+        "uptime": round(100 * up / total, 4) if total else None,
+        "latency_avg": round(latency_sum / samples, 4) if samples else None,
+        "latency_p95": None,
+    }
+    if samples:
+        # Upper bound of the bucket holding the 95th percentile
+        running = 0
+        for bound, count in zip((*LATENCY_BUCKETS, None), histogram):
+            running += count
+            if running >= 0.95 * samples:
+                summary["latency_p95"] = bound
+                break
+    return summary
+
+
+class UptimeRollups:
+    """Minute, hour and day rollups of check results in a SQLite file.
+
+    Each result adds to one bucket per resolution: UP count, total count,
+    latency sum and a latency histogram. Results are aggregated in memory
+    and flushed in batches, so recording one is O(1) and never touches the
+    disk. All columns are additive, which lets a flush upsert by adding and
+    a range query combine buckets of different resolutions.
+    """
+
+    def __init__(self, path: str, retention: Optional[Dict[str, float]] = None):
+        self.path = path
+        days = dict(DEFAULT_RETENTION)
+        days.update(retention or {})
+        self.retention = {RESOLUTIONS[name]: days[name] * 86400 for name in RESOLUTIONS}
+        self._pending: Dict[Tuple[str, int, int], List[float]] = {}
+        self._lock = threading.Lock()
+        with closing(self._connect()) as db:
+            db.execute(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def record(
+        self,
+        service: str,
+        timestamp: float,
+        is_up: bool,
+        latency: Optional[float] = None,
+    ):
+        """Add one check result; latency is only counted for UP results."""
+        with self._lock:
+            for size in RESOLUTIONS.values():
+                key = (service, size, int(timestamp // size * size))
+                entry = self._pending.get(key)
+                if entry is None:
+                    entry = self._pending[key] = _new_entry()
+                entry[1] += 1
+                if is_up:
+                    entry[0] += 1
+                    if latency is not None:
+                        entry[2] += latency
+                        entry[3 + bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+
+    def flush(self, now: Optional[float] = None):
+        """Write pending results to disk and drop buckets past retention."""
+        now = time.time() if now is None else now
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        with closing(self._connect()) as db, db:
+            db.executemany(
+                _UPSERT,
+                ((*key, *values) for key, values in pending.items()),
+            )
+            for size, keep in self.retention.items():
+                db.execute(
+                    "DELETE FROM rollups WHERE resolution = ? AND bucket < ?",
+                    (size, now - keep),
+                )
+
+    def services(self) -> List[str]:
+        with closing(self._connect()) as db:
+            rows = db.execute("SELECT DISTINCT service FROM rollups").fetchall()
+        with self._lock:
+            pending = {service for service, _, _ in self._pending}
+        return sorted({row[0] for row in rows} | pending)
+
+    def summary(
+        self, service: str, start: float, end: float, now: Optional[float] = None
+    ) -> Dict:
+        """Uptime and latency of a service over ``[start, end)``."""
+        now = time.time() if now is None else now
+        segments = cover(start, end, now, self.retention)
+        totals = _new_entry()
+        with closing(self._connect()) as db:
+            for size, first, last in segments:
+                row = db.execute(_SUM, (service, size, first, last)).fetchone()
+                totals = [a + b for a, b in zip(totals, row)]
+        # Include results not flushed yet
+        with self._lock:
+            for (name, size, bucket), values in self._pending.items():
+                if name == service and any(
+                    size == s and first <= bucket < last for s, first, last in segments
+                ):
+                    totals = [a + b for a, b in zip(totals, values)]
+        summary = _summarize(totals)
+        summary["buckets_read"] = len(segments)
+        return summary
+
+
+def sla_report(
+    rollups: UptimeRollups,
+    services: Iterable[str],
+    periods: Iterable[int],
+    now: Optional[float] = None,
+) -> Dict[str, Dict[str, Dict]]:
+    """Per service, a summary for each period of the given number of days."""
+    now = time.time() if now is None else now
+    return {
+        service: {
+            f"{days}d": rollups.summary(service, now - days * 86400, now, now)
+            for days in periods
+        }
+        for service in services
+    }
+
+
+def sla_main(args) -> int:
+    """`sla` command: print uptime per service over the requested periods."""
+    import json
+    import sys
+
+    import yaml
+
+    with open(args.config) as file:
+        config = yaml.safe_load(file)
+    rollup_config = config.get("rollups") or {}
+    if not rollup_config.get("file"):
+        print("No rollups file configured", file=sys.stderr)
+        return 1
+    rollups = UptimeRollups(rollup_config["file"], rollup_config.get("retention"))
+    periods = args.days or [30, 90, 365]
+    report = sla_report(rollups, args.service or rollups.services(), periods)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+    width = max([len("Service"), *(len(name) for name in report)])
+    print("Service".ljust(width), *(f"{days}d".rjust(10) for days in periods))
+    for service, summaries in report.items():
+        cells = []
+        for days in periods:
+            uptime = summaries[f"{days}d"]["uptime"]
+            cells.append(("-" if uptime is None else f"{uptime:.3f}%").rjust(10))
+        print(service.ljust(width), *cells)
+    return 0
@@ -0,0 +1,219 @@
+import fnmatch
+import re
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+DAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+SEVERITIES = ("critical", "warning", "info")
+DEFAULT_SEVERITY = "critical"
+DEFAULT_ROUTE = "default"
+
+
+def name_list(value) -> List[str]:
+    """A config value given as one name or a list of names, as a list."""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return list(value)
+
+
+def _minutes(value: str) -> int:
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+class Delivery(NamedTuple):
+    """Where to send one alert; ``None`` channels mean the defaults."""
+
+    routes: Tuple[str, ...]
+    emails: Optional[Tuple[str, ...]]
+    webhooks: Optional[Tuple[str, ...]]
+
+
+class _Rule(NamedTuple):
+    name: str
+    emails: Tuple[str, ...]
+    webhooks: Tuple[str, ...]
+    proceed: bool  # keep looking at later rules after a match
+    hours: Optional[Tuple[int, int]]  # minutes since midnight, end exclusive
+    days: Optional[frozenset]
+
+    def active(self, now: datetime) -> bool:
+        if self.days is not None and DAYS[now.weekday()] not in self.days:
+            return False
+        if self.hours is None:
+            return True
+        start, end = self.hours
+        minute = now.hour * 60 + now.minute
+        if start <= end:
+            return start <= minute < end
+        return minute >= start or minute < end  # window crosses midnight
+
+
+class _Index:
+    """Bitmask of rules accepting each value of one match dimension.
+
+    Rules without a condition on the dimension accept every value.
+    """
+
+    def __init__(self):
+        self.masks: Dict[str, int] = defaultdict(int)
+        self.any = 0
+
+    def add(self, bit: int, values: Iterable[str]):
+        values = list(values)
+        if not values:
+            self.any |= bit
+        for value in values:
+            self.masks[value] |= bit
+
+    def lookup(self, values: Iterable[str]) -> int:
+        mask = self.any
+        for value in values:
+            mask |= self.masks.get(value, 0)
+        return mask
+
+
+class AlertRouter:
+    """Routes a status change to recipients by ordered, compiled rules.
+
+    Each rule matches on service tags, name globs, type, severity and the
+    new status, optionally limited to hours and days, and names the email
+    recipients and webhooks to alert. The first matching rule wins unless
+    it sets ``continue``; alerts no rule matches go to the default channels.
+
+    Rules are compiled into one bitmask index per dimension when the config
+    is loaded, and every service's candidate rules are precomputed from its
+    static attributes. Routing a transition is then a dictionary lookup and
+    a bitwise AND, plus a clock check for the few candidates with a time
+    window, however many services and rules there are.
+    """
+
+    def __init__(
+        self,
+        routes: List[Dict],
+        services: Dict[str, Dict],
+        webhooks: Iterable[str] = (),
+        default_emails: Iterable[str] = (),
+    ):
+        self.rules: List[_Rule] = []
+        # Channels of the default route, added when only `continue` rules match
+        self.default_emails = tuple(
+            email for email in name_list(default_emails) if email
+        )
+        self.default_webhooks = tuple(webhooks)
+        self._tags = _Index()
+        self._types = _Index()
+        self._severities = _Index()
+        self._statuses = _Index()
+        self._exact_names: Dict[str, int] = defaultdict(int)
+        self._globs: Dict[str, int] = defaultdict(int)
+        self._any_name = 0
+        self._timed = 0
+        webhooks = set(webhooks)
+
+        for position, route in enumerate(routes):
+            name = route.get("name", f"route-{position + 1}")
+            bit = 1 << position
+            match = route.get("match") or {}
+            unknown = set(name_list(route.get("webhooks"))) - webhooks
+            if unknown:
+                raise ValueError(
+                    f"Route {name} refers to unknown webhook {', '.join(sorted(unknown))}"
+                )
+            severities = name_list(match.get("severity"))
+            for severity in severities:
+                if severity not in SEVERITIES:
+                    raise ValueError(f"Route {name} has unknown severity {severity}")
+            days = name_list(match.get("days"))
+            for day in days:
+                if day not in DAYS:
+                    raise ValueError(f"Route {name} has unknown day {day}")
+            hours = None
+            if match.get("hours"):
+                start, end = match["hours"].split("-")
+                hours = (_minutes(start), _minutes(end))
+            if hours is not None or days:
+                self._timed |= bit
+
+            self._tags.add(bit, name_list(match.get("tags")))
+            self._types.add(bit, name_list(match.get("type")))
+            self._severities.add(bit, severities)
+            self._statuses.add(bit, name_list(match.get("status")))
+            patterns = name_list(match.get("services"))
+            if not patterns:
+                self._any_name |= bit
+            for pattern in patterns:
+                if any(char in pattern for char in "*?["):
+                    self._globs[pattern] |= bit
+                else:
+                    self._exact_names[pattern] |= bit
+
+            self.rules.append(
+                _Rule(
+                    name=name,
+                    emails=tuple(name_list(route.get("email"))),
+                    webhooks=tuple(name_list(route.get("webhooks"))),
+                    proceed=bool(route.get("continue", False)),
+                    hours=hours,
+                    days=frozenset(days) if days else None,
+                )
+            )
+
+        # Each distinct glob is compiled once and tested once per service
+        self._compiled_globs = [
+            (re.compile(fnmatch.translate(pattern)), mask)
+            for pattern, mask in self._globs.items()
+        ]
+        self._candidates = {
+            name: self._service_mask(name, service)
+            for name, service in services.items()
+        }
+
+    def _service_mask(self, name: str, service: Dict) -> int:
+        names = self._any_name | self._exact_names.get(name, 0)
+        for pattern, mask in self._compiled_globs:
+            if pattern.match(name):
+                names |= mask
+        return (
+            names
+            & self._tags.lookup(service.get("tags", []))
+            & self._types.lookup([service.get("type", "")])
+            & self._severities.lookup([service.get("severity", DEFAULT_SEVERITY)])
+        )
+
+    def route(
+        self, service_name: str, service: Dict, status: str, now: datetime
+    ) -> Delivery:
+        """Channels for a status change of ``service_name`` at ``now``."""
+        candidates = self._candidates.get(service_name)
+        if candidates is None:
+            candidates = self._candidates[service_name] = self._service_mask(
+                service_name, service
+            )
+        candidates &= self._statuses.lookup([status])
+
+        routes, emails, webhooks = [], [], []
+        final = False
+        while candidates:
+            low = candidates & -candidates
+            candidates ^= low
+            rule = self.rules[low.bit_length() - 1]
+            if low & self._timed and not rule.active(now):
+                continue
+            routes.append(rule.name)
+            emails.extend(email for email in rule.emails if email not in emails)
+            webhooks.extend(hook for hook in rule.webhooks if hook not in webhooks)
+            if not rule.proceed:
+                final = True
+                break
+        if not routes:
+            return Delivery((DEFAULT_ROUTE,), None, None)
+        if not final:
+            # Only `continue` rules matched, which add to the defaults
+            routes.append(DEFAULT_ROUTE)
+            emails.extend(e for e in self.default_emails if e not in emails)
+            webhooks.extend(h for h in self.default_webhooks if h not in webhooks)
+        return Delivery(tuple(routes), tuple(emails), tuple(webhooks))
@@ -0,0 +1,100 @@
+from typing import Dict, Optional
+
+# Adaptive interval settings, overridable globally and per service under
+# `adaptive`. Intervals default to a fraction/multiple of the service interval.
+DEFAULT_ADAPTIVE = {
+    "enabled": False,
+    "min_interval": None,  # default: interval / 5
+    "max_interval": None,  # default: interval * 4
+    "growth": 1.5,  # factor applied per stable round above the base interval
+    "recovery_rounds": 3,  # fast rounds after a service came back UP
+    "stable_rounds": 3,  # UP rounds at the base interval before backing off
+}
+
+
+class IntervalScheduler:
+    """Decide how long each service waits until its next check round.
+
+    Adaptive services are probed at ``min_interval`` while DOWN and for a few
+    rounds after recovering. Once ``stable_rounds`` consecutive rounds at the
+    base interval were UP, they back off by ``growth`` per further UP round up
+    to ``max_interval``. The summed probe rate of all services is tracked
+    incrementally; when it exceeds the global ``probe_budget`` (rounds per
+    second) every interval is stretched by the same factor.
+    """
+
+    def __init__(self, config: Dict):
+        self.defaults = dict(DEFAULT_ADAPTIVE)
+        self.defaults.update(config.get("adaptive") or {})
+        self.probe_budget = config.get("probe_budget")
+        self.demand = 0.0  # sum of 1 / desired interval over all services
+        self._desired: Dict[str, float] = {}
+        self._recovery_left: Dict[str, int] = {}
+        self._up_streak: Dict[str, int] = {}
+        self._settings: Dict[str, Dict] = {}
+        for name, service in (config.get("services") or {}).items():
+            if "interval" in service:  # composites have no rounds of their own
+                self.register(name, service)
+
+    def settings(self, service: Dict) -> Dict:
+        settings = dict(self.defaults)
+        settings.update(service.get("adaptive") or {})
+        if settings.get("min_interval") is None:
+            settings["min_interval"] = service["interval"] / 5
+        if settings.get("max_interval") is None:
+            settings["max_interval"] = service["interval"] * 4
+        return settings
+
+    def register(self, name: str, service: Dict):
+        self._settings[name] = self.settings(service)
+        self._set_desired(name, service["interval"])
+
+    def _set_desired(self, name: str, interval: float):
+        previous = self._desired.get(name)
+        if previous:
+            self.demand -= 1 / previous
+        self._desired[name] = interval
+        self.demand += 1 / interval
+
+    @property
+    def stretch(self) -> float:
+        """Factor applied to all intervals to stay within the probe budget."""
+        if not self.probe_budget or self.demand <= self.probe_budget:
+            return 1.0
+        return self.demand / self.probe_budget
+
+    def desired_interval(self, name: str) -> Optional[float]:
+        return self._desired.get(name)
+
+    def effective_interval(self, name: str) -> Optional[float]:
+        desired = self._desired.get(name)
+        return desired * self.stretch if desired else None
+
+    def next_interval(self, name: str, service: Dict, is_up: bool) -> float:
+        """Record the outcome of a round and return the wait until the next."""
+        if name not in self._desired:
+            self.register(name, service)
+        settings = self._settings[name]
+        base = service["interval"]
+        if not settings["enabled"]:
+            desired = base
+        elif not is_up:
+            # Probe quickly so recovery is noticed early
+            desired = settings["min_interval"]
+            self._recovery_left[name] = settings["recovery_rounds"]
+            self._up_streak[name] = 0
+        elif self._recovery_left.get(name):
+            # Confirm the recovery with a few fast rounds
+            self._recovery_left[name] -= 1
+            desired = settings["min_interval"]
+        else:
+            self._up_streak[name] = self._up_streak.get(name, 0) + 1
+            if self._up_streak[name] <= settings["stable_rounds"]:
+                # A single UP round says little about a flaky service
+                desired = base
+            else:
+                current = max(self._desired[name], base)
+                desired = min(current * settings["growth"], settings["max_interval"])
+                desired = max(desired, base)
+        self._set_desired(name, desired)
+        return self.effective_interval(name)
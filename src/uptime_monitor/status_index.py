@@ -0,0 +1,189 @@
+import threading
+from collections import defaultdict
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+# Order used when sorting by status: the states that need attention first
+STATUS_ORDER = ("DOWN", "UNREACHABLE", "UNKNOWN", "MAINTENANCE", "PAUSED", "UP")
+
+SORT_KEYS = ("name", "status", "type")
+
+# Length of the name substrings indexed for search
+GRAM = 3
+
+
+def service_host(service: Dict) -> Optional[str]:
+    """Host a service points at, taken from the URL for HTTP services."""
+    if "host" in service:
+        return service["host"]
+    if "url" in service:
+        return urlparse(service["url"]).hostname
+    return None
+
+
+class StatusIndex:
+    """Inverted indexes over the services for filtered, paginated queries.
+
+    Services are indexed by status, type, host and tag. Status changes move a
+    service between sets in O(1), and a query intersects the sets for its
+    filters starting with the smallest, so filtering never walks the full
+    service list. Lowercased name substrings of up to GRAM characters are
+    indexed too: a search intersects the sets of its grams and only checks
+    the remaining candidates for the whole search string.
+    """
+
+    def __init__(self, services: Dict[str, Dict]):
+        self._lock = threading.Lock()
+        self._status: Dict[str, str] = {}
+        self.by_status: Dict[str, Set[str]] = defaultdict(set)
+        self.by_type: Dict[str, Set[str]] = defaultdict(set)
+        self.by_host: Dict[str, Set[str]] = defaultdict(set)
+        self.by_tag: Dict[str, Set[str]] = defaultdict(set)
+        self._grams: Dict[str, Set[str]] = defaultdict(set)
+        for name, service in services.items():
+            self._status[name] = "UNKNOWN"
+            self.by_status["UNKNOWN"].add(name)
+            self.by_type[service.get("type", "")].add(name)
+            host = service_host(service)
+            if host:
+                self.by_host[host].add(name)
+            for tag in service.get("tags", []):
+                self.by_tag[str(tag)].add(name)
+            lowered = name.lower()
+            for size in range(1, GRAM + 1):
+                for i in range(len(lowered) - size + 1):
+                    self._grams[lowered[i : i + size]].add(name)
+        # Static orderings, so a page of a large result can be produced by
+        # walking them instead of sorting the whole result
+        self._by_name = sorted(services)
+        self._name_rank = {name: rank for rank, name in enumerate(self._by_name)}
+        self._by_type = sorted(
+            services, key=lambda name: (services[name].get("type", ""), name)
+        )
+        self._type_rank = {name: rank for rank, name in enumerate(self._by_type)}
+
+    def __len__(self) -> int:
+        return len(self._status)
+
+    def status(self, name: str) -> Optional[str]:
+        return self._status.get(name)
+
+    def set_status(self, name: str, status: str):
+        with self._lock:
+            previous = self._status.get(name)
+            if previous == status or previous is None:
+                return
+            self.by_status[previous].discard(name)
+            self.by_status[status].add(name)
+            self._status[name] = status
+
+    def counts(self) -> Dict[str, int]:
+        """Number of services per status."""
+        with self._lock:
+            return {
+                status: len(names) for status, names in self.by_status.items() if names
+            }
+
+    def _match(
+        self,
+        status: Iterable[str] = (),
+        type: Iterable[str] = (),
+        host: Iterable[str] = (),
+        tag: Iterable[str] = (),
+    ) -> Optional[Set[str]]:
+        """Names matching all filters, or None when nothing is filtered."""
+        # Values within one filter are OR-ed, different filters are AND-ed
+        candidates = []
+        for index, values in (
+            (self.by_status, status),
+            (self.by_type, type),
+            (self.by_host, host),
+            (self.by_tag, tag),
+        ):
+            values = [value for value in values if value]
+            if not values:
+                continue
+            if len(values) == 1:
+                candidates.append(index.get(values[0], set()))
+            else:
+                candidates.append(set().union(*(index.get(v, ()) for v in values)))
+        if not candidates:
+            return None
+        candidates.sort(key=len)
+        result = set(candidates[0])
+        for other in candidates[1:]:
+            result &= other
+            if not result:
+                break
+        return result
+
+    def _search(self, needle: str) -> Set[str]:
+        """Names containing ``needle``, ignoring case."""
+        needle = needle.lower()
+        if len(needle) <= GRAM:
+            return set(self._grams.get(needle, ()))
+        grams = sorted(
+            (
+                self._grams.get(needle[i : i + GRAM], set())
+                for i in range(len(needle) - GRAM + 1)
+            ),
+            key=len,
+        )
+        found = set(grams[0])
+        for other in grams[1:]:
+            found &= other
+            if not found:
+                return found
+        return {name for name in found if needle in name.lower()}
+
+    @staticmethod
+    def _ordered(
+        names: Optional[Set[str]], order: List[str], rank: Dict[str, int]
+    ) -> Iterator:
+        if names is None:
+            return iter(order)
+        # Sort small results directly; walk the presorted list for large ones
+        if len(names) * 8 < len(order):
+            return iter(sorted(names, key=rank.__getitem__))
+        return (name for name in order if name in names)
+
+    def query(
+        self,
+        status: Iterable[str] = (),
+        type: Iterable[str] = (),
+        host: Iterable[str] = (),
+        tag: Iterable[str] = (),
+        search: str = "",
+        sort: str = "name",
+        page: int = 1,
+        per_page: int = 50,
+    ) -> Tuple[int, List[str]]:
+        """Return the total number of matches and the names on one page."""
+        with self._lock:
+            names = self._match(status, type, host, tag)
+            if search:
+                found = self._search(search)
+                names = found if names is None else names & found
+            total = len(self._status) if names is None else len(names)
+            if sort == "type":
+                ordered = self._ordered(names, self._by_type, self._type_rank)
+            elif sort == "status":
+                states = STATUS_ORDER + tuple(
+                    state for state in self.by_status if state not in STATUS_ORDER
+                )
+                ordered = (
+                    name
+                    for state in states
+                    for name in self._ordered(
+                        self.by_status.get(state, set())
+                        if names is None
+                        else names & self.by_status.get(state, set()),
+                        self._by_name,
+                        self._name_rank,
+                    )
+                )
+            else:
+                ordered = self._ordered(names, self._by_name, self._name_rank)
+            start = (max(page, 1) - 1) * per_page
+            return total, list(islice(ordered, start, start + per_page))
@@ -0,0 +1,84 @@
+import asyncio
+from typing import Callable, Dict, Optional, Tuple
+
+import aiohttp
+
+# Phases reported for every HTTP check, in request order. aiohttp performs the
+# TLS handshake while creating the connection and has no separate hook for it,
+# so "connect" covers TCP connect plus TLS for https URLs.
+HTTP_PHASES = ("dns", "connect", "ttfb", "total")
+
+
+class HttpPhaseTimings:
+    """Per-request timing state filled in by the aiohttp trace hooks."""
+
+    def __init__(self):
+        self._marks: Dict[str, float] = {}
+        self.phases: Dict[str, float] = {}
+
+    def mark(self, name: str):
+        self._marks[name] = asyncio.get_running_loop().time()
+
+    def _span(self, start: str, end: str) -> Optional[float]:
+        if start in self._marks and end in self._marks:
+            return max(0.0, self._marks[end] - self._marks[start])
+        return None
+
+    def finish(self):
+        """Turn the recorded marks into phase durations."""
+        dns = self._span("dns_start", "dns_end")
+        create = self._span("connect_start", "connect_end")
+        if dns is not None:
+            self.phases["dns"] = dns
+        if create is not None:
+            # DNS resolution happens inside connection creation
+            self.phases["connect"] = max(0.0, create - (dns or 0.0))
+        ttfb = self._span("headers_sent", "response_start")
+        if ttfb is None:
+            ttfb = self._span("request_start", "response_start")
+        if ttfb is not None:
+            self.phases["ttfb"] = ttfb
+        total = self._span("request_start", "response_start")
+        if total is not None:
+            self.phases["total"] = total
+        return self.phases
+
+
+def transfer_sizes(response: aiohttp.ClientResponse) -> Tuple[int, int]:
+    """Approximate bytes sent and received for a request and its response.
+
+    Counts the request line and headers (checks send no body), and the
+    response headers plus the body bytes read so far.
+    """
+    request = response.request_info
+    sent = len(request.method) + len(request.url.raw_path_qs) + 12
+    sent += sum(len(key) + len(value) + 4 for key, value in request.headers.items())
+    received = sum(len(key) + len(value) + 4 for key, value in response.raw_headers)
+    received += response.content.total_bytes
+    return sent, received
+
+
+def _marker(name: str) -> Callable:
+    async def hook(session, context, params):
+        timings = context.trace_request_ctx
+        if isinstance(timings, HttpPhaseTimings):
+            timings.mark(name)
+
+    return hook
+
+
+def create_trace_config() -> aiohttp.TraceConfig:
+    """Build a TraceConfig that records phase marks into HttpPhaseTimings.
+
+    Pass an HttpPhaseTimings instance as ``trace_request_ctx`` to a request to
+    have its phases recorded.
+    """
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(_marker("request_start"))
+    trace_config.on_dns_resolvehost_start.append(_marker("dns_start"))
+    trace_config.on_dns_resolvehost_end.append(_marker("dns_end"))
+    trace_config.on_connection_create_start.append(_marker("connect_start"))
+    trace_config.on_connection_create_end.append(_marker("connect_end"))
+    trace_config.on_request_headers_sent.append(_marker("headers_sent"))
+    trace_config.on_request_end.append(_marker("response_start"))
+    return trace_config
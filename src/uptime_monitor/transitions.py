@@ -0,0 +1,247 @@
+import bisect
+import os
+import struct
+import threading
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+from urllib.parse import quote
+
+MAGIC = b"UTL\x01"
+
+STATES = ("DOWN", "UP", "UNREACHABLE", "MAINTENANCE")
+_STATE_CODES = {state: code for code, state in enumerate(STATES)}
+
+# One index entry (start in ms, file offset) per this many records
+INDEX_EVERY = 64
+_INDEX_ENTRY = struct.Struct("<qQ")
+
+
+class Run(NamedTuple):
+    start: float
+    end: Optional[float]  # None while the run is still going on
+    state: str
+    reason: Optional[str]
+
+    @property
+    def duration(self) -> Optional[float]:
+        return None if self.end is None else self.end - self.start
+
+
+def _write_varint(value: int) -> bytes:
+    out = bytearray()
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _decode(
+    data: bytes, pos: int, start_ms: Optional[int]
+) -> Iterator[Tuple[int, int, int, Optional[str]]]:
+    """Yield (end offset, start in ms, state code, reason) from ``pos`` on.
+
+    ``start_ms`` is the start of the record at ``pos`` as taken from the
+    index, or None at the start of the file, where the first delta is
+    absolute. A truncated record at the end, left by a crash mid-write,
+    ends the walk.
+    """
+    indexed = start_ms is not None
+    while pos < len(data):
+        try:
+            delta, pos = _read_varint(data, pos)
+            state = data[pos]
+            length, pos = _read_varint(data, pos + 1)
+        except IndexError:
+            return
+        if pos + length > len(data):
+            return
+        reason = data[pos : pos + length].decode() if length else None
+        pos += length
+        if start_ms is None:
+            start_ms = delta
+        elif indexed:
+            indexed = False  # its start is known from the index
+        else:
+            start_ms += delta
+        yield pos, start_ms, state, reason
+
+
+class _Tail(NamedTuple):
+    count: int
+    start_ms: int
+    state: Optional[int]
+    size: int  # offset after the last complete record
+
+
+class TransitionLog:
+    """Append-only log of state changes per service.
+
+    Only transitions are stored, so a service that is UP for weeks is a
+    single record: the log is a run-length encoding of its status. Each
+    record holds the start as a varint millisecond delta to the previous
+    record, the state and the reason, usually a few bytes. Every
+    ``INDEX_EVERY`` records the absolute start and file offset go to a
+    fixed-size index file, so reading a time range bisects the index and
+    decodes at most one index block before the range.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._tails: Dict[str, _Tail] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, service: str, suffix: str) -> str:
+        return os.path.join(self.directory, quote(service, safe="") + suffix)
+
+    def _read_index(self, service: str) -> List[Tuple[int, int]]:
+        try:
+            with open(self._path(service, ".idx"), "rb") as file:
+                data = file.read()
+        except FileNotFoundError:
+            return []
+        usable = len(data) - len(data) % _INDEX_ENTRY.size
+        return [entry for entry in _INDEX_ENTRY.iter_unpack(data[:usable])]
+
+    def _read_from(self, service: str, offset: int) -> bytes:
+        try:
+            with open(self._path(service, ".log"), "rb") as file:
+                if file.read(len(MAGIC)) != MAGIC:
+                    return b""
+                file.seek(offset)
+                return file.read()
+        except FileNotFoundError:
+            return b""
+
+    def _seek(self, index: List[Tuple[int, int]], position: int):
+        """Start in ms and offset to decode from for an index position."""
+        if position < 0:
+            return None, len(MAGIC)
+        return index[position]
+
+    def _load_tail(self, service: str) -> _Tail:
+        index = self._read_index(service)
+        start_ms, offset = self._seek(index, len(index) - 1)
+        count = max(0, len(index) - 1) * INDEX_EVERY
+        tail = _Tail(0, 0, None, 0)
+        for end, start_ms, state, _ in _decode(
+            self._read_from(service, offset), 0, start_ms
+        ):
+            tail = _Tail(count + 1, start_ms, state, offset + end)
+            count += 1
+        return tail
+
+    def _tail(self, service: str) -> _Tail:
+        tail = self._tails.get(service)
+        if tail is None:
+            tail = self._tails[service] = self._load_tail(service)
+        return tail
+
+    def append(
+        self, service: str, timestamp: float, state: str, reason: Optional[str] = None
+    ) -> bool:
+        """Record the state of a service; returns False if it didn't change."""
+        code = _STATE_CODES[state]
+        start_ms = int(timestamp * 1000)
+        with self._lock:
+            tail = self._tail(service)
+            if tail.state == code:
+                return False
+            first = tail.state is None
+            encoded = (reason or "").encode()
+            record = (
+                _write_varint(start_ms if first else max(0, start_ms - tail.start_ms))
+                + bytes([code])
+                + _write_varint(len(encoded))
+                + encoded
+            )
+            start_ms = start_ms if first else max(start_ms, tail.start_ms)
+            path = self._path(service, ".log")
+            if tail.size == 0:
+                # New log, or one without a single complete record
+                with open(path, "wb") as file:
+                    file.write(MAGIC)
+                open(self._path(service, ".idx"), "wb").close()
+                size = len(MAGIC)
+            else:
+                size = tail.size
+            with open(path, "r+b") as file:
+                # Drops a torn record left behind by a crash
+                file.truncate(size)
+                file.seek(size)
+                file.write(record)
+            if tail.count % INDEX_EVERY == 0:
+                with open(self._path(service, ".idx"), "ab") as file:
+                    file.write(_INDEX_ENTRY.pack(start_ms, size))
+            self._tails[service] = _Tail(
+                tail.count + 1, start_ms, code, size + len(record)
+            )
+            return True
+
+    def timeline(
+        self, service: str, start: float = 0, end: Optional[float] = None
+    ) -> List[Run]:
+        """Runs overlapping ``[start, end)``, clipped to the range."""
+        start_ms = int(start * 1000)
+        end_ms = None if end is None else int(end * 1000)
+        index = self._read_index(service)
+        position = bisect.bisect_right(index, (start_ms, float("inf"))) - 1
+        base_ms, offset = self._seek(index, position)
+        data = self._read_from(service, offset)
+
+        runs: List[Run] = []
+        previous = None
+        for _, record_ms, state, reason in _decode(data, 0, base_ms):
+            if end_ms is not None and record_ms >= end_ms:
+                break
+            if previous is not None and record_ms > start_ms:
+                runs.append(self._run(previous, record_ms, start_ms))
+            previous = (record_ms, state, reason)
+        if previous is not None:
+            runs.append(self._run(previous, end_ms, start_ms))
+        return runs
+
+    @staticmethod
+    def _run(record, end_ms: Optional[int], start_ms: int) -> Run:
+        record_ms, state, reason = record
+        return Run(
+            max(record_ms, start_ms) / 1000,
+            None if end_ms is None else end_ms / 1000,
+            STATES[state],
+            reason,
+        )
+
+    def incidents(
+        self, service: str, start: float = 0, end: Optional[float] = None
+    ) -> List[Run]:
+        """DOWN episodes overlapping the range."""
+        return [
+            run for run in self.timeline(service, start, end) if run.state == "DOWN"
+        ]
+
+    def stats(self, service: str, start: float, end: float) -> Dict:
+        """Downtime, MTTR and MTBF over ``[start, end)``.
+
+        MTTR is the mean duration of the DOWN episodes and MTBF the mean UP
+        time between them; runs still going on at ``end`` are cut there.
+        """
+        runs = self.timeline(service, start, end)
+        down = [run.duration for run in runs if run.state == "DOWN"]
+        up = sum(run.duration for run in runs if run.state == "UP")
+        return {
+            "incidents": len(down),
+            "downtime": sum(down),
+            "mttr": sum(down) / len(down) if down else None,
+            "mtbf": up / len(down) if down else None,
+        }
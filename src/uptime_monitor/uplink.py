@@ -0,0 +1,142 @@
+import gzip
+import json
+import os
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+# Keep at most this much of undelivered results on disk, unless configured
+DEFAULT_BUFFER_MAX_BYTES = 64 * 1024 * 1024
+
+# Largest compressed batch a collector accepts
+MAX_BATCH_BYTES = 16 * 1024 * 1024
+
+# Largest batch a collector decompresses, against gzip bombs
+MAX_DECODED_BYTES = 64 * 1024 * 1024
+
+# Names the uploading agent, so its token is checked before the body is read
+AGENT_HEADER = "X-Uptime-Agent"
+
+
+def encode_batch(agent: str, run: str, results: List[Dict]) -> bytes:
+    """Gzip-compressed JSON body of one result upload."""
+    body = json.dumps(
+        {"agent": agent, "run": run, "results": results}, separators=(",", ":")
+    )
+    return gzip.compress(body.encode(), compresslevel=6)
+
+
+def _check_result(result) -> Optional[str]:
+    """What is wrong with one uploaded result, None if nothing."""
+    if not isinstance(result, dict):
+        return "not an object"
+    for field, types in (
+        ("service", (str,)),
+        ("seq", (int,)),
+        ("up", (bool,)),
+        ("timestamp", (int, float)),
+    ):
+        value = result.get(field)
+        # bool is an int, but never a valid sequence number or timestamp
+        if not isinstance(value, types) or (
+            isinstance(value, bool) and bool not in types
+        ):
+            return f"invalid {field}"
+    if result.get("latency") is not None and not isinstance(
+        result["latency"], (int, float)
+    ):
+        return "invalid latency"
+    if result.get("reason") is not None and not isinstance(result["reason"], str):
+        return "invalid reason"
+    return None
+
+
+def decode_batch(body: bytes) -> Dict:
+    """Decompress and validate an uploaded batch; ValueError if it's invalid."""
+    if len(body) > MAX_BATCH_BYTES:
+        raise ValueError("Batch too large")
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)  # gzip framing
+    try:
+        data = decompressor.decompress(body, MAX_DECODED_BYTES)
+    except zlib.error as e:
+        raise ValueError(f"Not gzip: {e}") from None
+    if decompressor.unconsumed_tail:
+        raise ValueError("Batch too large once decompressed")
+    if not decompressor.eof:
+        raise ValueError("Batch truncated")
+    batch = json.loads(data)
+    if not isinstance(batch, dict) or not all(
+        isinstance(batch.get(field), str) for field in ("agent", "run")
+    ):
+        raise ValueError("Batch needs an agent and a run")
+    if not isinstance(batch.get("results"), list):
+        raise ValueError("Batch needs a list of results")
+    for position, result in enumerate(batch["results"]):
+        problem = _check_result(result)
+        if problem:
+            raise ValueError(f"Result {position}: {problem}")
+    return batch
+
+
+class ResultBuffer:
+    """Encoded batches an agent could not deliver, one file per batch.
+
+    File names are zero-padded sequence numbers, so batches are replayed in
+    the order they were produced, also after a restart. Files are written
+    to a temporary name and renamed, so a crash never leaves half a batch.
+    When the buffer outgrows ``max_bytes`` the oldest batches are dropped.
+    """
+
+    SUFFIX = ".batch"
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_BUFFER_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._files: List[Tuple[int, int]] = []  # (sequence, size), oldest first
+        for name in os.listdir(directory):
+            if name.endswith(self.SUFFIX):
+                path = os.path.join(directory, name)
+                self._files.append(
+                    (int(name[: -len(self.SUFFIX)]), os.path.getsize(path))
+                )
+            elif name.endswith(".tmp"):
+                os.unlink(os.path.join(directory, name))
+        self._files.sort()
+        self._next = self._files[-1][0] + 1 if self._files else 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    @property
+    def size(self) -> int:
+        return sum(size for _, size in self._files)
+
+    def _path(self, sequence: int) -> str:
+        return os.path.join(self.directory, f"{sequence:012d}{self.SUFFIX}")
+
+    def append(self, batch: bytes):
+        path = self._path(self._next)
+        with open(path + ".tmp", "wb") as f:
+            f.write(batch)
+        os.replace(path + ".tmp", path)
+        self._files.append((self._next, len(batch)))
+        self._next += 1
+        total = self.size
+        while total > self.max_bytes and len(self._files) > 1:
+            sequence, size = self._files.pop(0)
+            os.unlink(self._path(sequence))
+            total -= size
+            self.dropped += 1
+
+    def peek(self) -> Optional[bytes]:
+        """The oldest batch, or None when the buffer is empty."""
+        if not self._files:
+            return None
+        with open(self._path(self._files[0][0]), "rb") as f:
+            return f.read()
+
+    def pop(self):
+        """Remove the oldest batch after it was delivered."""
+        sequence, _ = self._files.pop(0)
+        os.unlink(self._path(sequence))
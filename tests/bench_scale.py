@@ -0,0 +1,305 @@
+"""Scale benchmark for ServiceMonitor against a local stub fleet.
+
+Starts stub targets on loopback in a separate process (HTTP servers that
+answer, HTTP servers that never answer, open TCP listeners, closed ports and
+black-hole listeners that never accept), then runs ServiceMonitor against
+fleets of increasing size, each in a fresh process, and stores the results as
+JSON.
+
+Usage (from the repository root):
+
+    python -m tests.bench_scale --sizes 1000 10000 50000 --output bench.json
+    python -m tests.bench_scale --sizes 1000 --compare bench.json
+
+Ping services are not part of the fleet since ICMP needs raw socket
+privileges.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import yaml
+from aiohttp import web
+
+# Share of the fleet per target kind
+FLEET_MIX = {
+    "http_ok": 0.5,
+    "http_hang": 0.1,
+    "port_open": 0.2,
+    "port_closed": 0.1,
+    "port_blackhole": 0.1,
+}
+
+# Metrics compared by --compare, and whether higher values are better
+COMPARED_METRICS = {
+    "checks_per_second": True,
+    "drift_p99_seconds": False,
+    "check_p99_seconds": False,
+    "rss_per_service_bytes": False,
+    "cpu_per_check_ms": False,
+}
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or soft < hard:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+        except (ValueError, OSError):
+            pass
+
+
+async def serve_stubs():
+    """Start the stub targets and print their ports as one JSON line."""
+    _raise_fd_limit()
+
+    async def ok(request):
+        return web.Response(text="ok")
+
+    app = web.Application()
+    app.router.add_get("/", ok)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    http_site = web.TCPSite(runner, "127.0.0.1", 0, backlog=4096)
+    await http_site.start()
+
+    async def hang(reader, writer):
+        # Accept the connection and never answer
+        await reader.read()
+        writer.close()
+
+    async def close(reader, writer):
+        writer.close()
+
+    hang_server = await asyncio.start_server(hang, "127.0.0.1", 0, backlog=4096)
+    open_server = await asyncio.start_server(close, "127.0.0.1", 0, backlog=4096)
+
+    # A port nothing listens on: bind, note the port and release it
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        closed_port = sock.getsockname()[1]
+
+    # A listener with a full backlog that never accepts: further SYNs are
+    # dropped, so connections time out like a black-holed address
+    blackhole = socket.socket()
+    blackhole.bind(("127.0.0.1", 0))
+    blackhole.listen(0)
+
+    ports = {
+        "http_ok": http_site._server.sockets[0].getsockname()[1],
+        "http_hang": hang_server.sockets[0].getsockname()[1],
+        "port_open": open_server.sockets[0].getsockname()[1],
+        "port_closed": closed_port,
+        "port_blackhole": blackhole.getsockname()[1],
+    }
+    print(json.dumps(ports), flush=True)
+    await asyncio.Event().wait()
+
+
+def build_services(size: int, ports: dict, interval: float, timeout: float) -> dict:
+    """Distribute ``size`` services over the stub targets by FLEET_MIX."""
+    services = {}
+    kinds = list(FLEET_MIX)
+    counts = {kind: int(size * share) for kind, share in FLEET_MIX.items()}
+    counts[kinds[0]] += size - sum(counts.values())
+    for kind in kinds:
+        for index in range(counts[kind]):
+            service = {"timeout": timeout, "interval": interval, "max_tries": 1}
+            if kind.startswith("http"):
+                service.update(type="http", url=f"http://127.0.0.1:{ports[kind]}/")
+            else:
+                service.update(type="port", host="127.0.0.1", port=ports[kind])
+            services[f"{kind}-{index}"] = service
+    return services
+
+
+async def _drive(monitor, duration: float):
+    task = asyncio.create_task(monitor.start_monitoring())
+    await asyncio.sleep(duration)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+def _p99(values: list) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[98]
+
+
+def run_single(size: int, ports: dict, args) -> dict:
+    """Run one fleet size in this process and return its measurements."""
+    _raise_fd_limit()
+    from uptime_monitor import ServiceMonitor
+
+    workdir = tempfile.mkdtemp(prefix="uptime-bench-")
+    os.chdir(workdir)
+    config = {
+        "timezone": "UTC",
+        "services": build_services(size, ports, args.interval, args.timeout),
+    }
+    with open("config.yaml", "w") as config_file:
+        yaml.dump(config, config_file)
+
+    rss_before = _rss_bytes()
+    monitor = ServiceMonitor("config.yaml")
+    logging.getLogger().setLevel(logging.CRITICAL)
+    # Raw attempt durations: quantiles interpolated within the histogram
+    # buckets are off by up to a bucket width, too coarse to compare with
+    # the timeout
+    durations = []
+    observe = monitor.metrics.check_duration.observe
+
+    def record(value, **labels):
+        durations.append(value)
+        observe(value, **labels)
+
+    monitor.metrics.check_duration.observe = record
+
+    cpu_before = time.process_time()
+    wall_before = time.monotonic()
+    asyncio.run(_drive(monitor, args.duration))
+    wall = time.monotonic() - wall_before
+    cpu = time.process_time() - cpu_before
+    rss_after = _rss_bytes()
+
+    metrics = monitor.metrics
+    checks = sum(value for _, value in metrics.check_attempts._values.items())
+    check_p99 = round(_p99(durations), 4)
+    return {
+        "services": size,
+        "duration_seconds": round(wall, 3),
+        "checks": checks,
+        "checks_per_second": round(checks / wall, 2),
+        "drift_p50_seconds": metrics.scheduler_lag.quantile(0.5),
+        "drift_p99_seconds": metrics.scheduler_lag.quantile(0.99),
+        "check_p99_seconds": check_p99,
+        "timeout_seconds": args.timeout,
+        "check_p99_over_timeout": round(check_p99 / args.timeout, 3),
+        "event_loop_lag_seconds": metrics.event_loop_lag.get(),
+        "rss_per_service_bytes": max(0, rss_after - rss_before) // max(size, 1),
+        "cpu_per_check_ms": round(cpu * 1000 / checks, 4) if checks else None,
+    }
+
+
+def compare(previous: dict, current: dict):
+    """Print relative changes of the compared metrics between two runs."""
+    before = {entry["services"]: entry for entry in previous["results"]}
+    for entry in current["results"]:
+        old = before.get(entry["services"])
+        if not old:
+            continue
+        print(f"{entry['services']} services:")
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            if not old.get(metric) or entry.get(metric) is None:
+                continue
+            change = (entry[metric] - old[metric]) / old[metric] * 100
+            worse = change < 0 if higher_is_better else change > 0
+            flag = "  REGRESSION" if worse and abs(change) > 10 else ""
+            print(
+                f"  {metric}: {old[metric]} -> {entry[metric]} ({change:+.1f}%){flag}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--interval", type=float, default=10.0)
+    parser.add_argument("--timeout", type=float, default=2.0)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Previous results JSON to compare with")
+    parser.add_argument("--serve-stubs", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--ports", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_stubs:
+        asyncio.run(serve_stubs())
+        return
+    if args.single:
+        print(json.dumps(run_single(args.single, json.loads(args.ports), args)))
+        return
+
+    stubs = subprocess.Popen(
+        [sys.executable, "-m", "tests.bench_scale", "--serve-stubs"],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        ports = stubs.stdout.readline().strip()
+        results = []
+        for size in args.sizes:
+            child = subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "tests.bench_scale",
+                    "--single",
+                    str(size),
+                    "--ports",
+                    ports,
+                    "--duration",
+                    str(args.duration),
+                    "--interval",
+                    str(args.interval),
+                    "--timeout",
+                    str(args.timeout),
+                ],
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            result = json.loads(child.stdout.strip().splitlines()[-1])
+            print(json.dumps(result))
+            results.append(result)
+    finally:
+        stubs.terminate()
+        stubs.wait()
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "parameters": {
+            "duration": args.duration,
+            "interval": args.interval,
+            "timeout": args.timeout,
+            "mix": FLEET_MIX,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    if args.compare:
+        with open(args.compare) as previous:
+            compare(json.load(previous), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Virtual time benchmark: wall time needed to simulate a fleet.
+
+Runs ServiceMonitor on a VirtualClock against fleets of increasing size,
+with checks replaced by coroutines that sleep on the clock, and reports the
+wall time per check round and the wall time a simulated day would take.
+
+Usage (from the repository root):
+
+    python -m tests.bench_virtual --sizes 1000 10000 100000 --hours 1
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import yaml
+
+
+def run_single(size: int, args) -> dict:
+    """Simulate ``size`` services for ``args.hours`` of virtual time."""
+    from uptime_monitor import ServiceMonitor
+    from uptime_monitor.clock import VirtualClock
+
+    services = {
+        f"svc-{index}": {
+            "type": "ping",
+            "host": f"host-{index}",
+            "timeout": 2,
+            "interval": args.interval,
+            "max_tries": 1,
+        }
+        for index in range(size)
+    }
+    config = {
+        "timezone": "UTC",
+        "metrics": {"event_loop_interval": 3600},
+        "services": services,
+    }
+    with tempfile.NamedTemporaryFile(mode="w", suffix=".yaml", delete=False) as f:
+        yaml.dump(config, f)
+    clock = VirtualClock()
+    try:
+        monitor = ServiceMonitor(f.name, clock=clock)
+    finally:
+        os.unlink(f.name)
+    logging.getLogger().setLevel(logging.CRITICAL)
+
+    async def check(service):
+        await clock.sleep(0.05)
+        return True
+
+    monitor._check_ping = check
+
+    async def drive():
+        task = asyncio.create_task(monitor.start_monitoring())
+        await clock.sleep(args.hours * 3600)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    wall_before = time.monotonic()
+    clock.run(drive())
+    wall = time.monotonic() - wall_before
+
+    metrics = monitor.metrics
+    rounds = sum(value for _, value in metrics.check_attempts._values.items())
+    per_round = wall / rounds if rounds else 0.0
+    return {
+        "services": size,
+        "virtual_hours": args.hours,
+        "wall_seconds": round(wall, 2),
+        "check_rounds": rounds,
+        "wall_us_per_round": round(per_round * 1e6, 1),
+        "wall_seconds_per_day": round(wall * 24 / args.hours, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--hours", type=float, default=1.0)
+    parser.add_argument("--interval", type=float, default=600.0)
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        result = run_single(size, args)
+        print(json.dumps(result), flush=True)
+        results.append(result)
+
+    if args.output:
+        report = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "parameters": {"hours": args.hours, "interval": args.interval},
+            "results": results,
+        }
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,6 @@
+import asyncio
+import logging
+import os
 import pytest
 import tempfile
 import yaml
@@ -5,6 +8,9 @@ from unittest.mock import patch
 from datetime import datetime
 import pytz
 
+from uptime_monitor import ServiceMonitor
+from uptime_monitor.clock import VirtualClock
+
 
 @pytest.fixture
 def mock_config():
@@ -59,7 +65,7 @@ def config_file(mock_config):
 @pytest.fixture
 def mock_datetime():
     """Mock datetime for consistent testing."""
-    with patch("uptime_monitor.datetime") as mock_dt:
+    with patch("uptime_monitor.clock.datetime") as mock_dt:
         # Set a fixed datetime for testing
         mock_dt.now.return_value = datetime(2024, 1, 15, 12, 0, 0, tzinfo=pytz.UTC)
         mock_dt.combine = datetime.combine
@@ -71,3 +77,88 @@ def mock_datetime():
 def mock_timezone():
     """Mock timezone for testing."""
     return pytz.UTC
+
+
+@pytest.fixture
+def ping():
+    """Factory for ping service configs, keyword arguments override defaults."""
+
+    def make(host, **extra):
+        service = {
+            "type": "ping",
+            "host": host,
+            "timeout": 5,
+            "interval": 60,
+            "max_tries": 1,
+        }
+        service.update(extra)
+        return service
+
+    return make
+
+
+@pytest.fixture
+def write_config():
+    """Factory writing a minimal config around some services to a file.
+
+    Top-level sections are passed as keyword arguments. The files are
+    removed after the test.
+    """
+    paths = []
+
+    def write(services, **extra):
+        config = {
+            "email": {},
+            "timezone": "UTC",
+            "dashboard": {"password": "testpass"},
+            "metrics": {"event_loop_interval": 3600},
+            "services": services,
+        }
+        config.update(extra)
+        with tempfile.NamedTemporaryFile(mode="w", suffix=".yaml", delete=False) as f:
+            yaml.dump(config, f)
+        paths.append(f.name)
+        return f.name
+
+    yield write
+    for path in paths:
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+@pytest.fixture
+def create_monitor(write_config):
+    """Factory for a monitor over some services, on virtual time by default."""
+
+    def create(services, clock=None, **extra):
+        monitor = ServiceMonitor(
+            write_config(services, **extra), clock=clock or VirtualClock()
+        )
+        logging.getLogger().setLevel(logging.ERROR)
+        return monitor
+
+    return create
+
+
+@pytest.fixture
+def run_monitor():
+    """Run a monitor on its virtual clock, then stop it.
+
+    Takes a number of seconds to monitor for, or a coroutine function called
+    with the monitor while it runs, whose result is returned.
+    """
+
+    def run(monitor, steps):
+        async def main():
+            task = asyncio.create_task(monitor.start_monitoring())
+            try:
+                if callable(steps):
+                    return await steps(monitor)
+                await monitor.clock.sleep(steps)
+            finally:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+        return monitor.clock.run(main())
+
+    return run
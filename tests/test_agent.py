@@ -0,0 +1,298 @@
+import asyncio
+import gzip
+import logging
+import os
+import shutil
+import socket
+import tempfile
+
+import pytest
+
+from uptime_monitor import ServiceMonitor
+from uptime_monitor.agent import ProbeAgent
+from uptime_monitor.uplink import (
+    MAX_DECODED_BYTES,
+    ResultBuffer,
+    decode_batch,
+    encode_batch,
+)
+
+SERVICES = {
+    "router": {"type": "ping", "host": "10.0.0.1"},
+    "web": {
+        "type": "http",
+        "url": "http://10.0.0.2",
+        "agent": "eu",
+        "depends_on": ["router"],
+    },
+    "db": {"type": "port", "host": "10.0.0.3", "port": 5432, "agent": "eu"},
+    "cache": {"type": "port", "host": "10.0.0.4", "port": 6379, "agent": "us"},
+}
+AGENTS = {"eu": {"token": "eu-secret"}, "us": {"token": "us-secret"}}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def result(seq, service, up=True, reason=None, timestamp=1700000000.0):
+    return {
+        "seq": seq,
+        "service": service,
+        "timestamp": timestamp + seq,
+        "up": up,
+        "latency": 0.05,
+        "reason": reason,
+    }
+
+
+async def idle(service_name, service):
+    await asyncio.Event().wait()
+
+
+@pytest.fixture
+def buffer_directory():
+    directory = tempfile.mkdtemp()
+    yield directory
+    shutil.rmtree(directory)
+
+
+class TestResultBuffer:
+    """Test the on-disk buffer of undelivered batches."""
+
+    def test_order_survives_restart(self, buffer_directory):
+        """Test batches are replayed oldest first, also after a restart."""
+        buffer = ResultBuffer(buffer_directory)
+        for i in range(3):
+            buffer.append(encode_batch("eu", "run-1", [result(i, "web")]))
+        with open(os.path.join(buffer_directory, "000000000009.batch.tmp"), "w"):
+            pass  # interrupted write
+
+        buffer = ResultBuffer(buffer_directory)
+        seen = []
+        while len(buffer):
+            seen.append(decode_batch(buffer.peek())["results"][0]["seq"])
+            buffer.pop()
+
+        assert seen == [0, 1, 2]
+        assert buffer.peek() is None
+        assert os.listdir(buffer_directory) == []
+
+    def test_oldest_dropped_over_limit(self, buffer_directory):
+        """Test the buffer stays under its size limit by dropping old batches."""
+        buffer = ResultBuffer(buffer_directory, max_bytes=1000)
+        for i in range(20):
+            buffer.append(os.urandom(300))
+
+        assert len(buffer) == 3
+        assert buffer.size <= 1000
+        assert buffer.dropped == 17
+        assert sorted(os.listdir(buffer_directory))[0] == "000000000017.batch"
+
+
+class TestCollector:
+    """Test merging agent results into the central state."""
+
+    @pytest.fixture
+    def collector(self, write_config):
+        monitor = ServiceMonitor(write_config(SERVICES, agents=AGENTS))
+        monitor.alerts = []
+
+        async def notify(service_name, status, reason=None):
+            monitor.alerts.append((service_name, status, reason))
+
+        monitor._send_email_notification = notify
+        return monitor
+
+    async def test_merge_in_order(self, collector):
+        """Test results alert like local rounds and replays are ignored."""
+        batch = [
+            result(1, "db", up=False, reason="Connection refused"),
+            result(2, "db"),
+            result(3, "cache"),  # probed by another agent
+        ]
+
+        counts = await collector.merge_agent_results("eu", "run-1", batch)
+        replayed = await collector.merge_agent_results("eu", "run-1", batch[:2])
+
+        assert counts == {"accepted": 2, "duplicate": 0, "rejected": 1}
+        assert replayed == {"accepted": 0, "duplicate": 2, "rejected": 0}
+        assert collector.alerts == [
+            ("db", "DOWN", "Connection refused"),
+            ("db", "UP", None),
+        ]
+        assert collector.service_states["db"] is True
+        assert collector.metrics.agent_results.get(agent="eu", outcome="duplicate") == 2
+
+    async def test_unreachable_behind_central_parent(self, collector):
+        """Test a failed agent result behind a DOWN parent doesn't alert."""
+        collector.service_states["router"] = False
+
+        await collector.merge_agent_results(
+            "eu", "run-1", [result(1, "web", up=False, reason="Timeout")]
+        )
+
+        assert collector.unreachable["web"] == "router"
+        assert collector.alerts == []
+
+    async def test_authentication(self, collector):
+        """Test uploads need the agent's own token and a valid body."""
+        body = encode_batch("eu", "run-1", [result(1, "db")])
+        receive = collector.receive_agent_batch
+
+        assert (await receive("Bearer us-secret", "eu", body))[0] == 401
+        assert (await receive(None, "eu", body))[0] == 401
+        assert (await receive("Bearer eu-secret", None, body))[0] == 401
+        # Not decompressed before the agent is authenticated
+        assert (await receive("Bearer us-secret", "us", b"{}"))[0] == 400
+        assert (await receive("Bearer us-secret", "us", body))[0] == 400
+        status, counts = await receive("Bearer eu-secret", "eu", body)
+        assert status == 200
+        assert counts["accepted"] == 1
+
+    async def test_invalid_batches(self, collector):
+        """Test oversized and malformed batches are rejected before merging."""
+        bomb = gzip.compress(b" " * (MAX_DECODED_BYTES + 1))
+        malformed = [
+            {"seq": 1, "service": "db"},
+            {**result(1, "db"), "seq": "1"},
+            result(1, "db", up="yes"),
+            {**result(1, "db"), "timestamp": True},
+        ]
+
+        status, body = await collector.receive_agent_batch(
+            "Bearer eu-secret", "eu", bomb
+        )
+        assert status == 400
+        assert "too large" in body["error"]
+        for bad in malformed:
+            batch = encode_batch("eu", "run-1", [result(1, "db"), bad])
+            status, _ = await collector.receive_agent_batch(
+                "Bearer eu-secret", "eu", batch
+            )
+            assert status == 400
+        assert "db" not in collector.service_states
+
+    def test_agent_services_not_probed_centrally(self, collector):
+        """Test the collector only schedules services without an agent."""
+        local = [
+            name
+            for name, service in SERVICES.items()
+            if collector._runs_locally(name, service)
+        ]
+
+        assert local == ["router"]
+
+
+class TestProbeAgent:
+    """Test agents uploading results to a collector."""
+
+    @pytest.fixture
+    def create_agent(self, write_config, buffer_directory):
+        def create(port):
+            agent = ProbeAgent(
+                write_config(
+                    SERVICES,
+                    agents=AGENTS,
+                    agent={
+                        "name": "eu",
+                        "collector": f"http://127.0.0.1:{port}",
+                        "token": "eu-secret",
+                        "buffer_directory": buffer_directory,
+                        "upload_interval": 0.05,
+                    },
+                )
+            )
+            logging.getLogger().setLevel(logging.ERROR)
+
+            agent._check_service = idle  # rounds are reported by the test
+            return agent
+
+        return create
+
+    async def test_buffer_and_replay(self, create_agent, write_config):
+        """Test results buffered while the collector is down arrive in order."""
+        port = free_port()
+        agent = create_agent(port)
+        assert agent.assigned == ["db", "web"]
+        task = asyncio.create_task(agent.start_monitoring())
+        await agent._report_round("db", SERVICES["db"], False, 3.0, "Timeout")
+        await asyncio.sleep(0.2)  # upload fails, the batch is kept on disk
+        await agent._report_round("db", SERVICES["db"], True, 0.1)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        assert len(agent.buffer) == 2
+        assert agent.metrics.agent_uploads.get(outcome="failed") >= 1
+
+        collector = ServiceMonitor(
+            write_config(
+                SERVICES,
+                agents=AGENTS,
+                metrics={
+                    "host": "127.0.0.1",
+                    "port": port,
+                    "event_loop_interval": 3600,
+                },
+            )
+        )
+        alerts = []
+
+        async def notify(service_name, status, reason=None):
+            alerts.append((service_name, status, reason))
+
+        collector._send_email_notification = notify
+        collector._check_service = idle
+        collector_task = asyncio.create_task(collector.start_monitoring())
+        agent = create_agent(port)  # a new run
+        task = asyncio.create_task(agent.start_monitoring())
+        try:
+            for _ in range(100):
+                if len(alerts) == 2:
+                    break
+                await asyncio.sleep(0.05)
+            await agent._report_round("web", SERVICES["web"], True, 0.2)
+            for _ in range(100):
+                if "web" in collector.service_states:
+                    break
+                await asyncio.sleep(0.05)
+        finally:
+            task.cancel()
+            collector_task.cancel()
+            await asyncio.gather(task, collector_task, return_exceptions=True)
+
+        assert alerts == [("db", "DOWN", "Timeout"), ("db", "UP", None)]
+        assert collector.service_states["web"] is True
+        assert len(agent.buffer) == 0
+        assert collector.metrics.agent_results.get(agent="eu", outcome="accepted") == 3
+
+    async def test_full_batch_sent_early(self, create_agent):
+        """Test a full batch is uploaded without waiting for the interval."""
+        agent = create_agent(free_port())
+        agent.agent_config["batch_size"] = 2
+        agent.agent_config["upload_interval"] = 3600
+        sent = []
+
+        async def send(batch):
+            sent.append(len(decode_batch(batch)["results"]))
+            return True
+
+        agent._send = send
+        task = asyncio.create_task(agent.start_monitoring())
+        for _ in range(2):
+            await agent._report_round("db", SERVICES["db"], True, 0.1)
+        await asyncio.sleep(0.05)
+        await agent._report_round("db", SERVICES["db"], True, 0.1)
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+        assert sent == [2]
+        assert len(agent.buffer) == 1  # the rest is kept for the next run
+
+    def test_invalid_config(self, write_config):
+        """Test agents need a name, a collector and a token."""
+        config_file = write_config(SERVICES, agents=AGENTS, agent={"name": "eu"})
+        with pytest.raises(ValueError, match="no collector"):
+            ProbeAgent(config_file)
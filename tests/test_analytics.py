@@ -0,0 +1,151 @@
+import argparse
+import os
+import tempfile
+from datetime import datetime, timezone
+
+import pytest
+import yaml
+
+from uptime_monitor.analytics import (
+    analytics_main,
+    group_percentiles,
+    load_history,
+    period_report,
+    summarize,
+)
+from uptime_monitor.dashboard import WebServiceMonitor
+from uptime_monitor.history import CheckHistory
+
+np = pytest.importorskip("numpy")
+
+DAY = 86400
+NOW = datetime(2024, 3, 15, tzinfo=timezone.utc).timestamp()
+
+
+@pytest.fixture
+def directory():
+    with tempfile.TemporaryDirectory() as directory:
+        yield directory
+
+
+def fill(directory, now=NOW):
+    """Two weeks of rounds every 10 minutes; api got slower this week."""
+    history = CheckHistory(directory)
+    rng = np.random.default_rng(1)
+    for step in range(14 * 144):
+        at = now - 14 * DAY + step * 600
+        this_week = at >= now - 7 * DAY
+        history.record("web", at, True, float(rng.uniform(0.1, 0.2)))
+        api_latency = float(rng.uniform(0.3, 0.6 if this_week else 0.4))
+        if step % 50 == 0:
+            history.record("api", at, False, None, "HTTP status 502")
+        else:
+            history.record("api", at, True, api_latency)
+    history.flush(now)
+    return history
+
+
+class TestGroupPercentiles:
+    """Test per-group percentiles."""
+
+    def test_matches_numpy_percentile(self):
+        """Test each group matches np.percentile on its own values."""
+        rng = np.random.default_rng(0)
+        groups = rng.integers(0, 5, 1000)
+        values = rng.exponential(1.0, 1000)
+
+        result = group_percentiles(groups, values, 6, (50, 99))
+
+        for group in range(5):
+            expected = np.percentile(values[groups == group], [50, 99])
+            assert result[:, group] == pytest.approx(expected)
+        assert np.isnan(result[:, 5]).all()
+
+
+class TestAnalytics:
+    """Test vectorized history analytics."""
+
+    def test_summary(self, directory):
+        """Test availability, percentiles and error breakdown per service."""
+        fill(directory)
+
+        summary = summarize(load_history(directory, NOW - 7 * DAY, NOW))
+
+        assert summary["web"]["checks"] == 1008
+        assert summary["web"]["availability"] == 100.0
+        assert 0.1 <= summary["web"]["p50"] <= summary["web"]["p99"] <= 0.2
+        api = summary["api"]
+        assert api["availability"] == pytest.approx(100 * (1 - 20 / 1008), abs=1e-3)
+        assert api["errors"] == {"HTTP status 502": 20}
+
+    def test_range_filter(self, directory):
+        """Test rows outside the range are excluded."""
+        fill(directory)
+
+        columns = load_history(directory, NOW - DAY, NOW - DAY + 3600)
+
+        assert len(columns["timestamp"]) == 12
+        assert (columns["timestamp"] < NOW - DAY + 3600).all()
+
+    def test_week_over_week_regression(self, directory):
+        """Test the slower service is flagged with its p99 delta."""
+        fill(directory)
+
+        report = period_report(directory, 7, NOW)
+
+        assert report["api"]["p99_regression"] is True
+        assert report["api"]["delta"]["p99"] > 0.1
+        assert report["web"]["p99_regression"] is False
+        assert report["web"]["previous"]["checks"] == 1008
+
+    def test_torn_columns(self, directory):
+        """Test columns of different lengths are cut to the shortest."""
+        fill(directory)
+        day = datetime.fromtimestamp(NOW - DAY, timezone.utc).strftime("%Y-%m-%d")
+        with open(os.path.join(directory, day, "timestamp.col"), "ab") as f:
+            f.write(np.array([NOW - DAY + 1], dtype="d").tobytes())
+
+        columns = load_history(directory, NOW - DAY, NOW)
+
+        assert len(columns["timestamp"]) == len(columns["reason"]) == 288
+
+    def test_cli(self, directory, capsys):
+        """Test the CLI lists regressed services."""
+        now = datetime.now(timezone.utc).timestamp()
+        fill(directory, now)
+        with tempfile.NamedTemporaryFile(mode="w", suffix=".yaml", delete=False) as f:
+            yaml.dump({"history": {"directory": directory}}, f)
+
+        args = argparse.Namespace(config=f.name, days=7, regressions=True, json=False)
+        try:
+            assert analytics_main(args) == 0
+        finally:
+            os.unlink(f.name)
+
+        lines = capsys.readouterr().out.splitlines()
+        assert lines[0].split()[:3] == ["Service", "Checks", "Avail"]
+        assert [line.split()[0] for line in lines[1:]] == ["api"]
+
+    def test_api(self, directory):
+        """Test the dashboard serves the analytics report."""
+        fill(directory, datetime.now(timezone.utc).timestamp())
+        config = {
+            "email": {},
+            "timezone": "UTC",
+            "dashboard": {"password": "testpass"},
+            "history": {"directory": directory},
+            "services": {},
+        }
+        with tempfile.NamedTemporaryFile(mode="w", suffix=".yaml", delete=False) as f:
+            yaml.dump(config, f)
+        monitor = WebServiceMonitor(f.name)
+        os.unlink(f.name)
+        client = monitor.app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = "1"
+            session["_fresh"] = True
+
+        data = client.get("/api/analytics?days=7&regressions=1").get_json()
+
+        assert list(data) == ["api"]
+        assert data["api"]["errors"] == {"HTTP status 502": 20}
@@ -0,0 +1,194 @@
+import json
+import os
+import socket
+import sys
+from unittest.mock import patch
+
+import pytest
+import yaml
+
+from uptime_monitor import run
+
+
+@pytest.fixture
+def probed_monitor(create_monitor):
+    """Factory for monitors whose pings take most of their timeout."""
+
+    def create(services, down=()):
+        monitor = create_monitor(services)
+
+        async def check_ping(service):
+            await monitor.clock.sleep(service["timeout"] * 0.9)
+            return service["host"] not in down
+
+        monitor._check_ping = check_ping
+        return monitor
+
+    return create
+
+
+class TestCheckOnce:
+    """Test one-shot check rounds."""
+
+    def test_bounded_concurrency(self, ping, probed_monitor):
+        """Test all rounds overlap by default, or up to the concurrency limit."""
+        services = {f"host-{i}": ping(f"host-{i}") for i in range(1000)}
+        monitor = probed_monitor(services)
+
+        async def check(concurrency):
+            started = monitor.clock.monotonic()
+            results = await monitor.check_once(list(services), concurrency)
+            return results, monitor.clock.monotonic() - started
+
+        results, elapsed = monitor.clock.run(check(None))
+        assert elapsed == pytest.approx(4.5)
+        assert {result["status"] for result in results.values()} == {"UP"}
+
+        monitor = probed_monitor(services)
+        _, elapsed = monitor.clock.run(check(250))
+        assert elapsed == pytest.approx(4 * 4.5)
+
+    def test_failures_with_reasons(self, ping, probed_monitor):
+        """Test DOWN results carry the reason of the last attempt."""
+        monitor = probed_monitor(
+            {"web": ping("web"), "db": ping("db", timeout=0.5)}, down={"db"}
+        )
+
+        results = monitor.clock.run(monitor.check_once(["web", "db"]))
+
+        assert results["web"] == {
+            "type": "ping",
+            "status": "UP",
+            "latency": pytest.approx(4.5),
+            "reason": None,
+        }
+        assert results["db"]["status"] == "DOWN"
+        assert results["db"]["reason"] == "No ping response"
+        assert monitor.service_states == {}
+
+    def test_dependencies_and_composites(self, ping, probed_monitor):
+        """Test failures behind a failed parent and composite evaluation."""
+        services = {
+            "router": ping("router"),
+            "web": ping("web", depends_on="router"),
+            "db": ping("db"),
+            "cache": ping("cache"),
+            "storage": {"type": "composite", "members": ["db", "cache"], "min_up": 2},
+        }
+        monitor = probed_monitor(services, down={"router", "web", "cache"})
+
+        results = monitor.clock.run(monitor.check_once(list(services)))
+
+        assert {name: result["status"] for name, result in results.items()} == {
+            "router": "DOWN",
+            "web": "UNREACHABLE",
+            "db": "UP",
+            "cache": "DOWN",
+            "storage": "DOWN",
+        }
+        assert results["web"]["reason"] == "behind router"
+        assert results["storage"]["reason"] == "1/2 members UP, 2 required"
+
+    def test_select_services(self, ping, probed_monitor):
+        """Test selection by name and tag, with composite members added."""
+        services = {
+            "web": ping("web", tags=["prod"]),
+            "db": ping("db"),
+            "cache": ping("cache", tags=["staging"]),
+            "storage": {"type": "composite", "members": ["db", "cache"]},
+        }
+        monitor = probed_monitor(services)
+
+        assert monitor.select_services() == ["cache", "db", "storage", "web"]
+        assert monitor.select_services(tags=["prod"]) == ["web"]
+        assert monitor.select_services(["storage"], ["prod"]) == [
+            "storage",
+            "web",
+            "db",
+            "cache",
+        ]
+        with pytest.raises(ValueError, match="Unknown service: api"):
+            monitor.select_services(["api"])
+
+
+class TestCheckCommand:
+    """Test the `uptime-monitor check` command line."""
+
+    def run_check(self, config_file, *args):
+        argv = ["uptime-monitor", "check", "-c", config_file, *args]
+        with patch.object(sys, "argv", argv), pytest.raises(SystemExit) as exit:
+            run()
+        return exit.value.code
+
+    @pytest.fixture
+    def config_file(self, write_config):
+        listener = socket.create_server(("127.0.0.1", 0))
+        closed = socket.create_server(("127.0.0.1", 0))
+        closed_port = closed.getsockname()[1]
+        closed.close()
+
+        def port(number, tags):
+            return {
+                "type": "port",
+                "host": "127.0.0.1",
+                "port": number,
+                "timeout": 2,
+                "interval": 60,
+                "max_tries": 1,
+                "tags": tags,
+            }
+
+        config_file = write_config(
+            {
+                "open": port(listener.getsockname()[1], ["prod"]),
+                "closed": port(closed_port, ["staging"]),
+            }
+        )
+        yield config_file
+        listener.close()
+
+    def test_exit_code_and_json(self, config_file, capsys):
+        """Test JSON output and a non-zero exit code when a service is DOWN."""
+        code = self.run_check(config_file, "--json")
+
+        results = json.loads(capsys.readouterr().out)
+        assert code == 1
+        assert results["open"]["status"] == "UP"
+        assert results["closed"]["status"] == "DOWN"
+        assert results["closed"]["reason"].startswith("Could not connect to port")
+
+    def test_selection_and_table(self, config_file, capsys):
+        """Test a tag selection that is all UP exits zero."""
+        code = self.run_check(config_file, "--tag", "prod")
+
+        lines = capsys.readouterr().out.splitlines()
+        assert code == 0
+        assert lines[0].split() == [
+            "Service",
+            "Type",
+            "Status",
+            "Latency",
+            "ms",
+            "Reason",
+        ]
+        assert lines[1].split()[:3] == ["open", "port", "UP"]
+        assert len(lines) == 2
+
+    def test_nothing_written(self, config_file, tmp_path, monkeypatch, capsys):
+        """Test the command writes no log, snapshot, history or rollups."""
+        with open(config_file) as f:
+            config = yaml.safe_load(f)
+        config["state"] = {"file": "state.json"}
+        config["history"] = {"directory": "history"}
+        config["transitions"] = {"directory": "transitions"}
+        config["rollups"] = {"file": "rollups.sqlite"}
+        with open(config_file, "w") as f:
+            yaml.dump(config, f)
+        monkeypatch.chdir(tmp_path)
+
+        assert self.run_check(config_file, "--tag", "prod") == 0
+        assert os.listdir(tmp_path) == []
+
+    def test_unknown_service(self, config_file, capsys):
+        """Test an unknown service name is a usage error."""
+        assert self.run_check(config_file, "-s", "missing") == 2
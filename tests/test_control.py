@@ -0,0 +1,215 @@
+import asyncio
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from uptime_monitor import ServiceMonitor
+from uptime_monitor.dashboard import WebServiceMonitor
+
+
+@pytest.fixture
+def services(ping):
+    return {
+        "db-1": ping("db-1", tags=["rack-a"]),
+        "db-2": ping("db-2", tags=["rack-a"]),
+        "web": ping("web", interval=3600),
+    }
+
+
+@pytest.fixture
+def monitor(create_monitor, services):
+    """Monitor on virtual time whose pings take a second and are recorded."""
+    monitor = create_monitor(services)
+    monitor.probes = []
+
+    async def check_ping(service):
+        monitor.probes.append((service["host"], monitor.clock.monotonic()))
+        await monitor.clock.sleep(1)
+        return True
+
+    monitor._check_ping = check_ping
+    return monitor
+
+
+def probes_of(monitor, host):
+    return [at for probed, at in monitor.probes if probed == host]
+
+
+class TestControl:
+    """Test pause, resume, mute and check-now on the running monitor."""
+
+    def test_pause_and_resume(self, monitor, run_monitor):
+        """Test paused services skip rounds and resume right away."""
+
+        async def steps(monitor):
+            await monitor.clock.sleep(10)
+            paused = await monitor.control("pause", names=["db-*"])
+            await monitor.clock.sleep(600)
+            assert monitor.status_index.status("db-1") == "PAUSED"
+            assert monitor._snapshot()["services"]["db-2"]["paused"] is True
+            resumed = await monitor.control("resume", tags=["rack-a"])
+            await monitor.clock.sleep(5)
+            return paused, resumed
+
+        paused, resumed = run_monitor(monitor, steps)
+
+        assert paused == {"db-1": "paused", "db-2": "paused"}
+        assert resumed == {"db-1": "resumed", "db-2": "resumed"}
+        # One round at startup, none while paused, one right after resuming
+        assert len(probes_of(monitor, "db-1")) == 2
+        assert probes_of(monitor, "db-1")[1] == pytest.approx(610, abs=0.1)
+        assert len(probes_of(monitor, "web")) == 1
+        assert monitor.status_index.status("db-1") == "UP"
+        assert monitor.metrics.control_actions.get(action="pause") == 2
+
+    def test_check_now_is_single_flight(self, monitor, run_monitor):
+        """Test concurrent check requests share one forced round."""
+
+        async def steps(monitor):
+            await monitor.clock.sleep(10)
+            results = await asyncio.gather(
+                *(monitor.control("check", names=["web"]) for _ in range(5))
+            )
+            # Within the probe dedup window, but a forced round never
+            # answers with the result of the previous one
+            await monitor.clock.sleep(2)
+            again = await monitor.control("check", names=["web"])
+            await monitor.clock.sleep(5)
+            return results, again
+
+        results, again = run_monitor(monitor, steps)
+
+        outcomes = sorted(result["web"] for result in results)
+        assert outcomes == ["already running"] * 4 + ["started"]
+        assert again == {"web": "started"}
+        # Startup round, one shared forced round, then the next request
+        assert len(probes_of(monitor, "web")) == 3
+
+    def test_check_during_round_probes_again(self, monitor, run_monitor):
+        """Test a check requested mid-round runs its own round afterwards."""
+
+        async def steps(monitor):
+            while not probes_of(monitor, "web"):
+                await monitor.clock.sleep(0.1)
+            (started,) = probes_of(monitor, "web")
+            await monitor.clock.sleep(0.5)
+            result = await monitor.control("check", names=["web"])
+            await monitor.clock.sleep(5)
+            return started, result
+
+        started, result = run_monitor(monitor, steps)
+
+        assert result == {"web": "started"}
+        # The startup round was already probing when the check came in
+        assert probes_of(monitor, "web") == [
+            started,
+            pytest.approx(started + 1, abs=0.1),
+        ]
+
+    async def test_mute(self, services, write_config):
+        """Test muted services change state without alerting."""
+        monitor = ServiceMonitor(write_config(services))
+        alerts = []
+
+        async def send(service_name, status, reason=None, recipients=None):
+            alerts.append((service_name, status))
+
+        monitor._send_email_notification = send
+        service = monitor.config["services"]["db-1"]
+
+        assert await monitor.control("mute", names=["db-1"]) == {"db-1": "muted"}
+        await monitor._set_state("db-1", service, True)
+        await monitor._set_state("db-1", service, False, "No ping response")
+        await monitor._set_state("db-1", service, True)
+        assert monitor.down_since == {}
+        await monitor._set_state("db-1", service, False, "No ping response")
+        assert alerts == []
+        assert "db-1" in monitor.down_since
+        assert monitor.metrics.notifications_muted.get(status="DOWN") == 2
+
+        await monitor.control("unmute", names=["db-1"])
+        await monitor._set_state("db-1", service, True)
+        assert alerts == [("db-1", "UP")]
+        assert monitor.down_since == {}
+
+    async def test_invalid_requests(self, services, write_config):
+        """Test unknown actions and empty or unknown selections."""
+        monitor = ServiceMonitor(write_config(services))
+
+        with pytest.raises(ValueError, match="Unknown action reboot"):
+            await monitor.control("reboot", names=["web"])
+        with pytest.raises(ValueError, match="Select services"):
+            await monitor.control("pause")
+        with pytest.raises(ValueError, match="Unknown service: cache-\\*"):
+            await monitor.control("pause", names=["cache-*"])
+
+
+class TestControlApi:
+    """Test authentication and validation of the control endpoint."""
+
+    def test_authentication(self, services, write_config):
+        """Test the endpoint takes a dashboard login or the control token."""
+        monitor = WebServiceMonitor(write_config(services, control={"token": "s3cret"}))
+        monitor.muted.add("web")
+        client = monitor.app.test_client()
+        body = {"action": "pause", "services": "db-1"}
+
+        assert client.get("/api/control").status_code == 401
+        response = client.post(
+            "/api/control", json=body, headers={"Authorization": "Bearer wrong"}
+        )
+        assert response.status_code == 401
+
+        token = {"Authorization": "Bearer s3cret"}
+        assert client.get("/api/control", headers=token).get_json() == {
+            "paused": [],
+            "muted": ["web"],
+        }
+        bad = {"action": "pause", "services": [1, 2]}
+        assert client.post("/api/control", json=bad, headers=token).status_code == 400
+        assert client.post("/api/control", json=body, headers=token).status_code == 503
+
+        with client.session_transaction() as session:
+            session["_user_id"] = "1"
+            session["_fresh"] = True
+        assert client.get("/api/control").status_code == 200
+        # The session cookie alone could come from another site
+        assert client.post("/api/control", json=body).status_code == 403
+        other_site = {"Origin": "https://evil.example"}
+        assert (
+            client.post("/api/control", json=body, headers=other_site).status_code
+            == 403
+        )
+        own_page = {"Origin": "http://localhost"}
+        assert (
+            client.post("/api/control", json=body, headers=own_page).status_code == 503
+        )
+
+    def test_busy_loop(self, services, write_config):
+        """Test a loop that doesn't answer in time gives a 504, not a 500."""
+        monitor = WebServiceMonitor(write_config(services, control={"token": "s3cret"}))
+        client = monitor.app.test_client()
+        body = {"action": "check", "services": "web"}
+
+        async def stuck(action, names, tags):
+            await asyncio.sleep(60)
+
+        monitor.control = stuck
+        monitor.loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=monitor.loop.run_forever, daemon=True)
+        thread.start()
+        try:
+            with patch("uptime_monitor.dashboard.LOOP_CALL_TIMEOUT", 0.05):
+                response = client.post(
+                    "/api/control",
+                    json=body,
+                    headers={"Authorization": "Bearer s3cret"},
+                )
+        finally:
+            monitor.loop.call_soon_threadsafe(monitor.loop.stop)
+            thread.join()
+            monitor.loop.close()
+
+        assert response.status_code == 504
+        assert response.get_json() == {"error": "Monitor busy, try again"}
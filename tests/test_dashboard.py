@@ -5,6 +5,7 @@ from datetime import datetime, timedelta
 import pytz
 
 from uptime_monitor.dashboard import WebServiceMonitor, User
+from uptime_monitor.probes import target_key
 
 
 class TestUser:
@@ -95,6 +96,9 @@ class TestWebServiceMonitor:
         # Set up some service states
         monitor.service_states = {"test-http": True, "test-port": False}
         monitor.down_since = {"test-port": datetime.now() - timedelta(minutes=30)}
+        checked = datetime(2024, 1, 15, 11, 58, 0, tzinfo=pytz.UTC)
+        # Recorded as naive local time, like the monitor's clock
+        monitor.last_check = {"test-http": checked.astimezone().replace(tzinfo=None)}
 
         with patch("uptime_monitor.dashboard.datetime") as mock_dt:
             mock_dt.now.return_value = datetime(2024, 1, 15, 12, 0, 0, tzinfo=pytz.UTC)
@@ -112,6 +116,24 @@ class TestWebServiceMonitor:
             assert services_status["test-port"]["host"] == "example.com"
             assert services_status["test-port"]["port"] == 80
             assert "down_since" in services_status["test-port"]
+            assert "timings" not in services_status["test-http"]
+            assert services_status["test-http"]["interval"] == 300
+            assert (
+                services_status["test-http"]["last_check"] == "2024-01-15 11:58:00 UTC"
+            )
+            assert services_status["test-port"]["last_check"] is None
+
+        os.unlink(config_file)
+
+    def test_get_services_status_http_timings(self):
+        """Test the last HTTP phase breakdown is included in milliseconds."""
+        monitor, config_file = self.create_web_monitor()
+        service = monitor.config["services"]["test-http"]
+        monitor.http_timings[target_key(service)] = {"dns": 0.0123, "total": 0.25}
+
+        services_status = monitor._get_services_status()
+
+        assert services_status["test-http"]["timings"] == {"dns": 12.3, "total": 250.0}
 
         os.unlink(config_file)
 
@@ -276,3 +298,105 @@ class TestWebServiceMonitorRoutes:
             assert b"test-http" in response.data
 
         os.unlink(config_file)
+
+    def test_metrics_endpoint(self):
+        """Test the metrics endpoint is served without login."""
+        client, config_file = self.create_test_client()
+
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.content_type.startswith("text/plain")
+        assert b"uptime_scheduler_lag_seconds" in response.data
+
+        os.unlink(config_file)
+
+    def test_api_services_requires_login(self):
+        """Test the services API requires login."""
+        client, config_file = self.create_test_client()
+
+        response = client.get("/api/services")
+        assert response.status_code == 302
+
+        os.unlink(config_file)
+
+
+class TestServiceQueries:
+    """Test server-side filtering and pagination."""
+
+    def create_test_client(self, count=120):
+        services = {
+            f"svc-{index:03d}": {
+                "type": "http" if index % 2 else "port",
+                "url": "https://example.com",
+                "host": "example.com",
+                "port": 80,
+                "tags": ["prod"] if index % 3 == 0 else ["dev"],
+                "timeout": 5,
+                "interval": 300,
+                "max_tries": 3,
+            }
+            for index in range(count)
+        }
+        config = {
+            "email": {},
+            "timezone": "UTC",
+            "dashboard": {"password": "testpass"},
+            "services": services,
+        }
+
+        with tempfile.NamedTemporaryFile(mode="w", suffix=".yaml", delete=False) as f:
+            import yaml
+
+            yaml.dump(config, f)
+            monitor = WebServiceMonitor(f.name)
+            monitor.app.config["TESTING"] = True
+            client = monitor.app.test_client()
+            with client.session_transaction() as session:
+                session["_user_id"] = "1"
+                session["_fresh"] = True
+            return monitor, client, f.name
+
+    def test_api_filters_and_paginates(self):
+        """Test the API answers a filtered query one page at a time."""
+        monitor, client, config_file = self.create_test_client()
+        for name in ("svc-003", "svc-009", "svc-010", "svc-015"):
+            monitor.service_states[name] = False
+            monitor.status_index.set_status(name, "DOWN")
+
+        response = client.get("/api/services?status=DOWN&type=http&tag=prod")
+        data = response.get_json()
+
+        assert response.status_code == 200
+        assert data["total"] == 3
+        assert list(data["services"]) == ["svc-003", "svc-009", "svc-015"]
+        assert data["services"]["svc-003"]["status"] == "DOWN"
+        assert data["counts"]["DOWN"] == 4
+
+        os.unlink(config_file)
+
+    def test_api_invalid_paging_falls_back(self):
+        """Test invalid paging parameters fall back to defaults."""
+        monitor, client, config_file = self.create_test_client()
+
+        data = client.get("/api/services?page=abc&sort=bogus").get_json()
+
+        assert data["page"] == 1
+        assert data["per_page"] == 50
+        assert data["sort"] == "name"
+        assert data["pages"] == 3
+
+        os.unlink(config_file)
+
+    def test_home_renders_one_page(self):
+        """Test the dashboard only renders the requested page of rows."""
+        monitor, client, config_file = self.create_test_client()
+
+        response = client.get("/?per_page=25&page=2&tag=dev,prod")
+
+        assert response.status_code == 200
+        assert response.data.count(b'class="service-card"') == 25
+        assert b"svc-025" in response.data
+        assert b"svc-024" not in response.data
+        assert b"Page 2 of 5" in response.data
+
+        os.unlink(config_file)
@@ -0,0 +1,213 @@
+import pytest
+
+from uptime_monitor.dependencies import DependencyGraph
+
+
+class TestDependencyGraph:
+    """Test building and validating the dependency DAG."""
+
+    def test_reverse_edges(self, ping):
+        """Test children and composite memberships are indexed."""
+        graph = DependencyGraph(
+            {
+                "router": ping("router"),
+                "web": ping("web", depends_on="router"),
+                "db": ping("db", depends_on=["router"]),
+                "cluster": {"type": "composite", "members": ["web", "db"], "min_up": 1},
+            }
+        )
+
+        assert graph.children["router"] == ["web", "db"]
+        assert graph.composites_of["web"] == ["cluster"]
+        assert graph.is_composite("cluster")
+        assert not graph.is_composite("web")
+
+    def test_cycle_rejected(self, ping):
+        """Test a dependency cycle is a configuration error."""
+        services = {
+            "a": ping("a", depends_on="c"),
+            "b": ping("b", depends_on="a"),
+            "c": ping("c", depends_on="b"),
+        }
+
+        with pytest.raises(ValueError, match="Dependency cycle"):
+            DependencyGraph(services)
+
+    def test_unknown_parent_rejected(self, ping):
+        """Test references to unknown services are rejected."""
+        with pytest.raises(ValueError, match="unknown service"):
+            DependencyGraph({"web": ping("web", depends_on="router")})
+
+    @pytest.mark.parametrize("min_up", [0, -1, 3, "2"])
+    def test_invalid_min_up_rejected(self, ping, min_up):
+        """Test min_up must be between one and the number of members."""
+        services = {
+            "web": ping("web"),
+            "db": ping("db"),
+            "cluster": {
+                "type": "composite",
+                "members": ["web", "db"],
+                "min_up": min_up,
+            },
+        }
+
+        with pytest.raises(ValueError, match="needs min_up between 1 and 2"):
+            DependencyGraph(services)
+
+    def test_duplicate_member_rejected(self, ping):
+        """Test a member listed twice can't count twice toward min_up."""
+        services = {
+            "web": ping("web"),
+            "db": ping("db"),
+            "cluster": {
+                "type": "composite",
+                "members": ["web", "web", "db"],
+                "min_up": 2,
+            },
+        }
+
+        with pytest.raises(ValueError, match="lists web more than once"):
+            DependencyGraph(services)
+
+    def test_member_counts(self, ping):
+        """Test composite counts follow member transitions."""
+        graph = DependencyGraph(
+            {
+                "a": ping("a"),
+                "b": ping("b"),
+                "c": ping("c"),
+                "cluster": {
+                    "type": "composite",
+                    "members": ["a", "b", "c"],
+                    "min_up": 2,
+                },
+            }
+        )
+
+        assert graph.member_changed("a", True) == ["cluster"]
+        assert not graph.composite_is_up("cluster")
+        graph.member_changed("b", True)
+        assert graph.composite_is_up("cluster")
+        graph.member_changed("a", False)
+        assert graph.describe("cluster") == "1/3 members UP, 2 required"
+
+
+class TestDownstreamSuppression:
+    """Test children of a failed parent on virtual time."""
+
+    def test_children_unreachable_behind_down_parent(
+        self, ping, create_monitor, run_monitor
+    ):
+        """Test children are not probed or alerted while the parent is DOWN."""
+        services = {
+            "router": ping("router"),
+            "web": ping("web", depends_on="router"),
+            "db": ping("db", depends_on="router"),
+        }
+        monitor = create_monitor(services)
+        down = {"router": (100, 400), "web": (0, 1000), "db": (0, 1000)}
+        probes = []
+        alerts = []
+
+        async def check_ping(service):
+            now = monitor.clock.monotonic()
+            probes.append((service["host"], now))
+            start, end = down[service["host"]]
+            # Children only fail because the router is down
+            if service["host"] != "router":
+                start, end = down["router"]
+            return not start <= now < end
+
+        async def notify(service_name, status, reason=None):
+            alerts.append((service_name, status))
+
+        monitor._check_ping = check_ping
+        monitor._send_email_notification = notify
+        run_monitor(monitor, 599)
+
+        assert alerts == [("router", "DOWN"), ("router", "UP")]
+        assert monitor.service_states == {"router": True, "web": True, "db": True}
+        assert not monitor.unreachable
+        # Nothing probed the children while the router was down
+        child_probes = [at for host, at in probes if host != "router"]
+        assert not [at for at in child_probes if 120 < at < 420]
+        # Children are probed right away once the router is back
+        assert 420 in child_probes
+
+    def test_unreachable_status_reported(self, ping, create_monitor, run_monitor):
+        """Test children show as UNREACHABLE in the status index."""
+        services = {
+            "router": ping("router"),
+            "web": ping("web", depends_on="router"),
+        }
+        monitor = create_monitor(services)
+
+        async def check_ping(service):
+            return False
+
+        async def notify(service_name, status, reason=None):
+            pass
+
+        monitor._check_ping = check_ping
+        monitor._send_email_notification = notify
+        run_monitor(monitor, 10)
+
+        assert monitor.unreachable == {"web": "router"}
+        assert monitor.status_index.status("web") == "UNREACHABLE"
+        assert "web" not in monitor.service_states
+
+    def test_remote_parents_not_awaited(self, ping, create_monitor):
+        """Test push and agent-probed parents are taken as last reported."""
+        services = {
+            "router": ping("router", agent="eu-west"),
+            "backup": {"type": "push", "token": "t", "period": 3600},
+            "web": ping("web", depends_on=["router", "backup"]),
+        }
+        monitor = create_monitor(services)
+        monitor.service_states.update(router=True, backup=True)
+
+        async def confirm():
+            started = monitor.clock.monotonic()
+            parent = await monitor._confirm_parents("web")
+            return parent, monitor.clock.monotonic() - started
+
+        assert monitor.clock.run(confirm()) == (None, 0)
+        monitor.service_states["router"] = False
+        assert monitor.clock.run(confirm()) == ("router", 0)
+
+    def test_composite_quorum(self, ping, create_monitor, run_monitor):
+        """Test a composite is UP while min_up members are UP."""
+        services = {
+            "node-1": ping("node-1"),
+            "node-2": ping("node-2"),
+            "node-3": ping("node-3"),
+            "cluster": {
+                "type": "composite",
+                "members": ["node-1", "node-2", "node-3"],
+                "min_up": 2,
+            },
+            "app": ping("app", depends_on="cluster"),
+        }
+        monitor = create_monitor(services)
+        down = {"node-1": (100, 1000), "node-2": (200, 300), "app": (200, 300)}
+        alerts = []
+
+        async def check_ping(service):
+            start, end = down.get(service["host"], (0, 0))
+            return not start <= monitor.clock.monotonic() < end
+
+        async def notify(service_name, status, reason=None):
+            alerts.append((service_name, status, reason))
+
+        monitor._check_ping = check_ping
+        monitor._send_email_notification = notify
+        run_monitor(monitor, 599)
+
+        cluster_alerts = [alert for alert in alerts if alert[0] == "cluster"]
+        assert cluster_alerts == [
+            ("cluster", "DOWN", "1/3 members UP, 2 required"),
+            ("cluster", "UP", None),
+        ]
+        assert monitor.service_states["cluster"] is True
+        # The app behind the cluster failed with it but never alerted
+        assert not [alert for alert in alerts if alert[0] == "app"]
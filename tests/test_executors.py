@@ -0,0 +1,149 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from uptime_monitor import ServiceMonitor
+from uptime_monitor.executors import BlockingPool, ExecutorFull, create_pools
+from uptime_monitor.metrics import MonitorMetrics
+
+
+@pytest.fixture
+def executor_monitor(write_config):
+    """Factory for a monitor with some executor pools and one port check."""
+
+    def create(executors):
+        services = {
+            "db": {
+                "type": "port",
+                "host": "db",
+                "port": 5432,
+                "timeout": 5,
+                "interval": 60,
+                "max_tries": 1,
+            }
+        }
+        email = {
+            "smtp_server": "smtp.test.com",
+            "smtp_port": 587,
+            "username": "monitor@test.com",
+            "password": "secret",
+            "notification_email": "ops@test.com",
+        }
+        return ServiceMonitor(write_config(services, email=email, executors=executors))
+
+    return create
+
+
+class TestBlockingPool:
+    """Test bounded thread pools for blocking work."""
+
+    async def test_rejects_beyond_queue_size(self):
+        """Test jobs beyond the queue limit fail fast and are counted."""
+        metrics = MonitorMetrics()
+        pool = BlockingPool("port", workers=1, queue_size=1, metrics=metrics)
+        release = threading.Event()
+        try:
+            running = asyncio.create_task(pool.run(release.wait, 5))
+            while metrics.executor_running.get(pool="port") != 1:
+                await asyncio.sleep(0.01)
+            queued = asyncio.create_task(pool.run(lambda: "done"))
+            await asyncio.sleep(0.01)
+            assert metrics.executor_queue_depth.get(pool="port") == 1
+
+            with pytest.raises(ExecutorFull, match="port queue full"):
+                await pool.run(lambda: None)
+
+            release.set()
+            assert await queued == "done"
+            assert await running is True
+        finally:
+            release.set()
+            pool.close()
+
+        assert metrics.executor_rejections.get(pool="port") == 1
+        assert metrics.executor_queue_depth.get(pool="port") == 0
+        assert metrics.executor_running.get(pool="port") == 0
+        assert metrics.executor_wait.get(pool="port").count == 2
+        assert metrics.executor_run.get(pool="port").count == 2
+
+    async def test_cancelled_while_queued(self):
+        """Test a job cancelled before it started leaves the queue."""
+        metrics = MonitorMetrics()
+        pool = BlockingPool("ping", workers=1, queue_size=5, metrics=metrics)
+        release = threading.Event()
+        try:
+            running = asyncio.create_task(pool.run(release.wait, 5))
+            while metrics.executor_running.get(pool="ping") != 1:
+                await asyncio.sleep(0.01)
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(pool.run(time.sleep, 0), 0.05)
+
+            assert pool.queued == 0
+            release.set()
+            await running
+        finally:
+            release.set()
+            pool.close()
+
+    def test_invalid_config(self):
+        """Test unknown pools and pools without workers fail at load time."""
+        with pytest.raises(ValueError, match="Unknown executor smtp"):
+            create_pools({"smtp": {"workers": 1}})
+        with pytest.raises(ValueError, match="at least one worker"):
+            create_pools({"email": {"workers": 0}})
+
+
+class TestMonitorExecutors:
+    """Test blocking work of one kind can't starve the others."""
+
+    async def test_hung_smtp_does_not_block_checks(self, executor_monitor):
+        """Test port checks run while every email thread hangs."""
+        monitor = executor_monitor({"email": {"workers": 1, "queue_size": 1}})
+        release = threading.Event()
+        monitor._send_email_sync = lambda message: release.wait(5)
+        monitor._check_port_sync = lambda service: True
+        try:
+            sends = [
+                asyncio.create_task(monitor._send_email_notification("db", "DOWN"))
+                for _ in range(3)
+            ]
+            await asyncio.sleep(0.05)
+            service = monitor.config["services"]["db"]
+            is_up, _ = await asyncio.wait_for(
+                monitor._run_check_round("db", service, monitor._check_port), 1
+            )
+
+            assert is_up
+            release.set()
+            await asyncio.gather(*sends)
+        finally:
+            release.set()
+            monitor.close_executors()
+
+        # The third email found the queue full and failed right away
+        assert monitor.metrics.executor_rejections.get(pool="email") == 1
+        assert monitor.metrics.notification_failures.get(channel="email") == 1
+
+    async def test_rejection_is_the_failure_reason(self, executor_monitor):
+        """Test a check rejected by a full pool reports why."""
+        monitor = executor_monitor({"port": {"workers": 1, "queue_size": 1}})
+        release = threading.Event()
+        monitor._check_port_sync = lambda service: release.wait(5)
+        service = monitor.config["services"]["db"]
+        try:
+            busy = [asyncio.create_task(monitor._check_port(service)) for _ in range(2)]
+            await asyncio.sleep(0.05)
+
+            is_up, reason = await monitor._run_check_round(
+                "db", service, monitor._check_port
+            )
+
+            assert not is_up
+            assert reason == "Executor port queue full (1 jobs waiting)"
+            release.set()
+            assert await asyncio.gather(*busy) == [True, True]
+        finally:
+            release.set()
+            monitor.close_executors()
@@ -0,0 +1,78 @@
+import json
+import os
+import tempfile
+from array import array
+from datetime import datetime, timezone
+
+import pytest
+
+from uptime_monitor.history import CheckHistory, day_partitions
+
+T0 = datetime(2024, 3, 1, 23, 0, tzinfo=timezone.utc).timestamp()
+
+
+@pytest.fixture
+def directory():
+    with tempfile.TemporaryDirectory() as directory:
+        yield directory
+
+
+def read_column(directory, day, name, code):
+    values = array(code)
+    with open(os.path.join(directory, day, f"{name}.col"), "rb") as f:
+        values.frombytes(f.read())
+    return values.tolist()
+
+
+class TestCheckHistory:
+    """Test the columnar check history files."""
+
+    def test_rows_split_by_day(self, directory):
+        """Test rows are appended to per-day column files."""
+        history = CheckHistory(directory)
+        history.record("web", T0, True, 0.25)
+        history.record("db", T0 + 1800, False, 5.0, "Timed out after 5 seconds")
+        history.record("web", T0 + 3600, False, None, "HTTP status 502")
+
+        history.flush(T0)
+
+        assert read_column(directory, "2024-03-01", "service", "I") == [0, 1]
+        assert read_column(directory, "2024-03-01", "up", "B") == [1, 0]
+        latency = read_column(directory, "2024-03-01", "latency", "f")
+        assert latency[0] == 0.25
+        assert latency[1] != latency[1]  # NaN: failed rounds have no latency
+        assert read_column(directory, "2024-03-02", "reason", "I") == [2]
+        with open(os.path.join(directory, "reasons.json")) as f:
+            assert json.load(f) == [
+                "",
+                "Timed out after 5 seconds",
+                "HTTP status 502",
+            ]
+
+    def test_dictionaries_survive_restart(self, directory):
+        """Test ids stay stable when the history is reopened."""
+        history = CheckHistory(directory)
+        history.record("web", T0, True)
+        history.record("db", T0, True)
+        history.flush(T0)
+
+        reopened = CheckHistory(directory)
+        reopened.record("db", T0 + 1, True)
+        reopened.flush(T0)
+
+        assert read_column(directory, "2024-03-01", "service", "I") == [0, 1, 1]
+
+    def test_retention(self, directory):
+        """Test day partitions older than the retention are removed."""
+        history = CheckHistory(directory, retention_days=2)
+        history.record("web", T0 - 5 * 86400, True)
+        history.record("web", T0, True)
+
+        history.flush(T0)
+
+        assert sorted(os.listdir(directory)) == ["2024-03-01", "services.json"]
+
+    def test_day_partitions(self):
+        """Test ranges map to the UTC days they overlap."""
+        assert day_partitions(T0, T0 + 3600) == ["2024-03-01"]
+        assert day_partitions(T0, T0 + 3601) == ["2024-03-01", "2024-03-02"]
@@ -0,0 +1,242 @@
+import os
+
+import pytest
+from aiohttp import web
+
+from uptime_monitor import ServiceMonitor
+from uptime_monitor.assertions import ContentAssertion
+from uptime_monitor.probes import target_key
+
+
+class FakeContent:
+    """Stand-in for aiohttp's StreamReader yielding fixed chunks."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.consumed = 0
+
+    async def iter_chunked(self, size):
+        for chunk in self.chunks:
+            self.consumed += 1
+            yield chunk
+
+
+class TestContentAssertion:
+    """Test incremental matching over streamed chunks."""
+
+    def test_from_config(self):
+        """Test assertions are only built when an expectation is configured."""
+        assert ContentAssertion.from_config(None) is None
+        assert ContentAssertion.from_config({"max_bytes": 10}) is None
+        assertion = ContentAssertion.from_config({"keyword": "OK", "regex": "v\\d"})
+        assert assertion.describe() == "keyword 'OK' and regex 'v\\\\d'"
+
+    @pytest.mark.asyncio
+    async def test_keyword_across_chunks_stops_early(self):
+        """Test a keyword split over two chunks matches and stops reading."""
+        content = FakeContent([b"...sta", b"tus: hea", b"lthy...", b"never read"])
+        assertion = ContentAssertion(keyword="status: healthy")
+
+        ok, read = await assertion.matches(content)
+
+        assert ok is True
+        assert content.consumed == 3
+        assert read == 21
+
+    @pytest.mark.asyncio
+    async def test_regex_across_chunks(self):
+        """Test a regex match spanning a chunk border."""
+        content = FakeContent([b'{"version": "1.', b'42.0"}'])
+        assertion = ContentAssertion(regex=r'"version": "1\.\d+\.0"')
+
+        ok, _ = await assertion.matches(content)
+
+        assert ok is True
+
+    @pytest.mark.asyncio
+    async def test_byte_cap(self):
+        """Test reading stops at max_bytes when nothing matched."""
+        content = FakeContent([b"x" * 100] * 10)
+        assertion = ContentAssertion(keyword="OK", max_bytes=250)
+
+        ok, read = await assertion.matches(content)
+
+        assert ok is False
+        assert read == 250
+        assert content.consumed == 3
+
+
+class TestHttpContentChecks:
+    """Test content assertions, HEAD and conditional GET against a server."""
+
+    @pytest.fixture
+    async def server(self):
+        state = {"sent_chunks": 0, "full_responses": 0, "methods": []}
+
+        async def stream(request):
+            state["methods"].append(request.method)
+            response = web.StreamResponse()
+            await response.prepare(request)
+            try:
+                for index in range(200):
+                    text = "status: healthy " if index == 2 else "padding " * 512
+                    await response.write(text.encode())
+                    state["sent_chunks"] += 1
+            except (ConnectionResetError, RuntimeError):
+                pass
+            return response
+
+        async def cached(request):
+            if request.headers.get("If-None-Match") == '"v1"':
+                return web.Response(status=304)
+            state["full_responses"] += 1
+            return web.Response(text="all good", headers={"ETag": '"v1"'})
+
+        app = web.Application()
+        app.router.add_get("/stream", stream)
+        app.router.add_get("/cached", cached)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        state["base"] = f"http://127.0.0.1:{port}"
+        yield state
+        await runner.cleanup()
+
+    @pytest.mark.asyncio
+    async def test_keyword_found(self, config_file, server):
+        """Test a streamed page passes when the keyword appears early."""
+        monitor = ServiceMonitor(config_file)
+        service = {
+            "type": "http",
+            "url": server["base"] + "/stream",
+            "timeout": 5,
+            "expect": {"keyword": "status: healthy"},
+        }
+
+        assert await monitor._check_http(service) is True
+        assert target_key(service) not in monitor.http_failures
+
+        os.unlink(config_file)
+
+    @pytest.mark.asyncio
+    async def test_keyword_missing_within_cap(self, config_file, server):
+        """Test an error page with status 200 fails with a reason."""
+        monitor = ServiceMonitor(config_file)
+        service = {
+            "type": "http",
+            "url": server["base"] + "/stream",
+            "timeout": 5,
+            "expect": {"keyword": "never there", "max_bytes": 20000},
+        }
+
+        assert await monitor._check_http(service) is False
+        reason = monitor.http_failures[target_key(service)]
+        assert "'never there' not found in first 20000 bytes" in reason
+
+        os.unlink(config_file)
+
+    @pytest.mark.asyncio
+    async def test_head_request(self, config_file, server):
+        """Test HEAD checks don't fetch a body."""
+        monitor = ServiceMonitor(config_file)
+        service = {
+            "type": "http",
+            "url": server["base"] + "/cached",
+            "timeout": 5,
+            "method": "head",
+            "expect": {"keyword": "ignored for HEAD"},
+        }
+
+        assert await monitor._check_http(service) is True
+        assert server["full_responses"] == 1
+
+        os.unlink(config_file)
+
+    @pytest.mark.asyncio
+    async def test_conditional_get(self, config_file, server):
+        """Test unchanged pages answer 304 and keep the previous outcome."""
+        monitor = ServiceMonitor(config_file)
+        service = {
+            "type": "http",
+            "url": server["base"] + "/cached",
+            "timeout": 5,
+            "conditional": True,
+            "expect": {"keyword": "all good"},
+        }
+
+        assert await monitor._check_http(service) is True
+        assert await monitor._check_http(service) is True
+        assert await monitor._check_http(service) is True
+
+        assert server["full_responses"] == 1
+        assert monitor.http_validators[target_key(service)]["etag"] == '"v1"'
+
+        os.unlink(config_file)
+
+    @pytest.mark.asyncio
+    async def test_conditional_get_per_assertion(self, config_file, server):
+        """Test a 304 never stands for another service's content check."""
+        monitor = ServiceMonitor(config_file)
+        url = server["base"] + "/cached"
+        passing = {"type": "http", "url": url, "timeout": 5, "conditional": True}
+        passing["expect"] = {"keyword": "all good"}
+        failing = dict(passing, expect={"keyword": "missing"})
+
+        assert await monitor._check_http(passing) is True
+        assert await monitor._check_http(failing) is False
+        assert await monitor._check_http(failing) is False
+        assert await monitor._check_http(passing) is True
+
+        # One full response per assertion, then 304s
+        assert server["full_responses"] == 2
+
+        os.unlink(config_file)
+
+    @pytest.mark.asyncio
+    async def test_conditional_get_keeps_failure(self, config_file, server):
+        """Test a 304 for a page that failed its assertion still fails."""
+        monitor = ServiceMonitor(config_file)
+        service = {
+            "type": "http",
+            "url": server["base"] + "/cached",
+            "timeout": 5,
+            "conditional": True,
+            "expect": {"keyword": "missing"},
+        }
+
+        assert await monitor._check_http(service) is False
+        assert await monitor._check_http(service) is False
+        assert server["full_responses"] == 1
+
+        os.unlink(config_file)
+
+    @pytest.mark.asyncio
+    async def test_failures_kept_per_target(self, config_file, server):
+        """Test services checking one URL differently keep their own reasons."""
+        monitor = ServiceMonitor(config_file)
+        url = server["base"] + "/stream"
+        strict = {"type": "http", "url": url, "timeout": 5}
+        strict["expect"] = {"keyword": "never there", "max_bytes": 100}
+        plain = {"type": "http", "url": url, "timeout": 5}
+
+        assert await monitor._check_http(strict) is False
+        assert await monitor._check_http(plain) is True
+
+        assert "never there" in monitor._failure_reason(strict)
+        assert target_key(plain) not in monitor.http_failures
+        assert target_key(plain) in monitor.http_timings
+
+        os.unlink(config_file)
+
+    @pytest.mark.asyncio
+    async def test_status_failure_reason(self, config_file, server):
+        """Test non-200 responses record the status as failure reason."""
+        monitor = ServiceMonitor(config_file)
+        service = {"type": "http", "url": server["base"] + "/missing", "timeout": 5}
+
+        assert await monitor._check_http(service) is False
+        assert monitor.http_failures[target_key(service)] == "HTTP status 404"
+
+        os.unlink(config_file)
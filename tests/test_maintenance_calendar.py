@@ -0,0 +1,226 @@
+from datetime import date, datetime, timezone
+
+import pytest
+import pytz
+import yaml
+
+from uptime_monitor.clock import VirtualClock
+from uptime_monitor.dashboard import WebServiceMonitor
+from uptime_monitor.maintenance import MaintenanceCalendar, Timeline, _Rule
+
+
+def timestamp(*args):
+    return datetime(*args, tzinfo=timezone.utc).timestamp()
+
+
+def calendar(services, maintenance):
+    return MaintenanceCalendar(
+        {"maintenance": maintenance, "services": services}, pytz.UTC, lambda s: pytz.UTC
+    )
+
+
+class TestTimeline:
+    """Test lookups in sorted, merged windows."""
+
+    def test_lookups(self):
+        """Test active windows, the next change and upcoming windows."""
+        timeline = Timeline([(50, 60), (10, 20), (15, 30), (30, 40)])
+
+        assert timeline.starts == [10, 50]
+        assert timeline.ends == [40, 60]
+        assert not timeline.active(5)
+        assert timeline.active(10) and timeline.active(40)
+        assert not timeline.active(45)
+        assert timeline.next_change(5) == 10
+        assert timeline.next_change(25) == 40
+        assert timeline.next_change(45) == 50
+        assert timeline.next_change(70) is None
+        assert timeline.upcoming(25) == [(10, 40), (50, 60)]
+        assert timeline.upcoming(45, limit=1) == [(50, 60)]
+
+
+class TestRules:
+    """Test which days recurring windows apply to."""
+
+    def test_weekly_and_monthly(self):
+        """Test days of the week, days of the month and weeks of the month."""
+        patch_tuesday = _Rule(
+            {"days": ["tue"], "weeks": [2], "start": "22:00", "end": "02:00"}, "x"
+        )
+        month_end = _Rule({"monthdays": [-1], "start": "01:00", "end": "02:00"}, "x")
+        last_friday = _Rule(
+            {"days": "fri", "weeks": [-1], "start": "01:00", "end": "02:00"}, "x"
+        )
+
+        november = [date(2026, 11, day) for day in range(1, 31)]
+        assert [d.day for d in november if patch_tuesday.matches(d)] == [10]
+        assert [d.day for d in november if month_end.matches(d)] == [30]
+        assert [d.day for d in november if last_friday.matches(d)] == [27]
+        assert month_end.matches(date(2024, 2, 29))
+
+        (window,) = patch_tuesday.expand(
+            pytz.UTC, date(2026, 11, 9), date(2026, 11, 11)
+        )
+        assert window == (timestamp(2026, 11, 10, 22), timestamp(2026, 11, 11, 2))
+
+    def test_invalid_windows(self, ping):
+        """Test bad days, reversed one-off windows and unknown groups."""
+        with pytest.raises(ValueError, match="unknown day funday"):
+            _Rule({"days": ["funday"], "start": "01:00", "end": "02:00"}, "x")
+        with pytest.raises(ValueError, match="ends before it starts"):
+            _Rule({"from": "2026-11-03 22:00", "to": "2026-11-03 21:00"}, "x")
+        with pytest.raises(ValueError, match="unknown maintenance group rack-z"):
+            calendar({"db": ping("db", maintenance=["rack-z"])}, {})
+
+
+class TestMaintenanceCalendar:
+    """Test schedules built from groups and service windows."""
+
+    def test_groups_share_timelines(self, ping):
+        """Test services matched by glob or tag share one timeline."""
+        services = {
+            "db-1": ping("db-1"),
+            "db-2": ping("db-2"),
+            "cache": ping("cache", tags=["rack-a"]),
+            "web": ping("web", maintenance=["rack-a"]),
+            "mail": ping("mail"),
+        }
+        maintenance = {
+            "groups": {
+                "rack-a": {
+                    "services": ["db-*"],
+                    "tags": ["rack-a"],
+                    "windows": [
+                        {"days": ["sun"], "start": "02:00", "end": "04:00"},
+                        {"from": "2026-11-03 22:00", "to": "2026-11-04 01:30"},
+                    ],
+                }
+            }
+        }
+        cal = calendar(services, maintenance)
+        now = timestamp(2026, 11, 1, 3)  # a Sunday
+
+        timelines = [
+            cal.timeline(services[name], now, name)
+            for name in ("db-1", "db-2", "cache", "web")
+        ]
+        assert all(timeline is timelines[0] for timeline in timelines)
+        assert cal.timeline(services["mail"], now, "mail") is None
+        assert timelines[0].active(now)
+        assert timelines[0].upcoming(now, 3) == [
+            (timestamp(2026, 11, 1, 2), timestamp(2026, 11, 1, 4)),
+            (timestamp(2026, 11, 3, 22), timestamp(2026, 11, 4, 1, 30)),
+            (timestamp(2026, 11, 8, 2), timestamp(2026, 11, 8, 4)),
+        ]
+
+    def test_expanded_again_past_the_horizon(self, ping):
+        """Test lookups beyond the horizon expand the rules again."""
+        services = {"db": ping("db", maintenance=[{"start": "02:00", "end": "03:00"}])}
+        cal = calendar(services, {"horizon_days": 2})
+        first = cal.timeline(services["db"], timestamp(2026, 1, 1), "db")
+
+        later = cal.timeline(services["db"], timestamp(2026, 6, 1, 2, 30), "db")
+
+        assert later is not first
+        assert later.active(timestamp(2026, 6, 1, 2, 30))
+        assert len(later.starts) <= 5
+
+    def test_reload(self, ping):
+        """Test a reload drops cached schedules and keeps them when invalid."""
+        services = {"db": ping("db", tags=["rack-a"])}
+        group = {"tags": ["rack-a"], "windows": [{"start": "02:00", "end": "03:00"}]}
+        cal = calendar(services, {})
+        now = timestamp(2026, 1, 1, 2, 30)
+        assert cal.timeline(services["db"], now, "db") is None
+
+        cal.reload({"maintenance": {"groups": {"a": group}}, "services": services})
+        assert cal.timeline(services["db"], now, "db").active(now)
+
+        broken = {"db": ping("db", maintenance=["missing"])}
+        with pytest.raises(ValueError, match="unknown maintenance group"):
+            cal.reload({"maintenance": {}, "services": broken})
+        assert cal.timeline(services["db"], now, "db").active(now)
+
+
+class TestMonitorMaintenance:
+    """Test the monitor skips checks until a window is over."""
+
+    def test_sleeps_through_window(self, ping, create_monitor, run_monitor):
+        """Test no rounds run in a window and checks resume when it ends."""
+        # Starts on Monday 2024-01-01 00:00 UTC, inside the window
+        monitor = create_monitor(
+            {"db": ping("db", maintenance=["nightly"])},
+            maintenance={
+                "groups": {"nightly": {"windows": [{"start": "00:00", "end": "02:00"}]}}
+            },
+        )
+        checked = []
+
+        async def check_ping(service):
+            checked.append(monitor.clock.now(timezone.utc))
+            return True
+
+        monitor._check_ping = check_ping
+        run_monitor(monitor, 3 * 3600)
+
+        assert checked[0] == datetime(2024, 1, 1, 2, 0, 1, tzinfo=timezone.utc)
+        assert 55 < len(checked) <= 61
+
+    def test_reload_wakes_sleeping_services(self, ping, create_monitor, run_monitor):
+        """Test removing a window resumes checks without waiting it out."""
+        monitor = create_monitor(
+            {"db": ping("db", maintenance=["nightly"])},
+            maintenance={
+                "groups": {"nightly": {"windows": [{"start": "00:00", "end": "06:00"}]}}
+            },
+        )
+        checked = []
+
+        async def check_ping(service):
+            checked.append(monitor.clock.now(timezone.utc))
+            return True
+
+        async def steps(monitor):
+            await monitor.clock.sleep(30)
+            with open(monitor.config_path, "w") as f:
+                yaml.dump({"services": {"db": ping("db")}}, f)
+            assert monitor.reload_maintenance()
+            await monitor.clock.sleep(30)
+
+        monitor._check_ping = check_ping
+        run_monitor(monitor, steps)
+
+        assert checked and checked[0] < datetime(2024, 1, 1, 0, 1, tzinfo=timezone.utc)
+        assert "maintenance" not in monitor.config["services"]["db"]
+
+    def test_invalid_reload_keeps_schedules(self, ping, create_monitor):
+        """Test a broken config file leaves the current schedules in place."""
+        monitor = create_monitor(
+            {"db": ping("db", maintenance=[{"start": "00:00", "end": "06:00"}])}
+        )
+        with open(monitor.config_path, "w") as f:
+            yaml.dump({"services": {"db": ping("db", maintenance=["missing"])}}, f)
+
+        assert not monitor.reload_maintenance()
+        assert monitor._is_in_maintenance(monitor.config["services"]["db"], "db")
+
+    def test_dashboard_windows(self, ping, write_config):
+        """Test the upcoming windows of a service on the dashboard API."""
+        monitor = WebServiceMonitor(
+            write_config(
+                {"db": ping("db", maintenance=[{"start": "02:00", "end": "04:00"}])}
+            ),
+            clock=VirtualClock(datetime(2024, 1, 15, 3, tzinfo=timezone.utc)),
+        )
+        client = monitor.app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = "1"
+            session["_fresh"] = True
+
+        body = client.get("/api/services/db/maintenance?limit=2").get_json()
+        assert body["active"]
+        assert [window["start"] for window in body["windows"]] == [
+            "2024-01-15T02:00:00+00:00",
+            "2024-01-16T02:00:00+00:00",
+        ]
+        assert client.get("/api/services/nope/maintenance").status_code == 404
@@ -52,7 +52,7 @@ class TestMaintenanceWindow:
         service = monitor.config["services"]["test-service"]
 
         # Test during maintenance window
-        with patch("uptime_monitor.datetime") as mock_dt:
+        with patch("uptime_monitor.clock.datetime") as mock_dt:
             mock_dt.now.return_value = datetime(2024, 1, 15, 3, 0, 0, tzinfo=pytz.UTC)
             mock_dt.combine = datetime.combine
             mock_dt.strptime = datetime.strptime
@@ -61,7 +61,7 @@ class TestMaintenanceWindow:
             assert result is True
 
         # Test outside maintenance window
-        with patch("uptime_monitor.datetime") as mock_dt:
+        with patch("uptime_monitor.clock.datetime") as mock_dt:
             mock_dt.now.return_value = datetime(2024, 1, 15, 5, 0, 0, tzinfo=pytz.UTC)
             mock_dt.combine = datetime.combine
             mock_dt.strptime = datetime.strptime
@@ -79,7 +79,7 @@ class TestMaintenanceWindow:
         service = monitor.config["services"]["test-service"]
 
         # Test during maintenance window (before midnight)
-        with patch("uptime_monitor.datetime") as mock_dt:
+        with patch("uptime_monitor.clock.datetime") as mock_dt:
             mock_dt.now.return_value = datetime(2024, 1, 15, 23, 30, 0, tzinfo=pytz.UTC)
             mock_dt.combine = datetime.combine
             mock_dt.strptime = datetime.strptime
@@ -88,7 +88,7 @@ class TestMaintenanceWindow:
             assert result is True
 
         # Test during maintenance window (after midnight)
-        with patch("uptime_monitor.datetime") as mock_dt:
+        with patch("uptime_monitor.clock.datetime") as mock_dt:
             mock_dt.now.return_value = datetime(2024, 1, 16, 0, 30, 0, tzinfo=pytz.UTC)
             mock_dt.combine = datetime.combine
             mock_dt.strptime = datetime.strptime
@@ -97,7 +97,7 @@ class TestMaintenanceWindow:
             assert result is True
 
         # Test outside maintenance window
-        with patch("uptime_monitor.datetime") as mock_dt:
+        with patch("uptime_monitor.clock.datetime") as mock_dt:
             mock_dt.now.return_value = datetime(2024, 1, 15, 12, 0, 0, tzinfo=pytz.UTC)
             mock_dt.combine = datetime.combine
             mock_dt.strptime = datetime.strptime
@@ -115,7 +115,7 @@ class TestMaintenanceWindow:
         service = monitor.config["services"]["test-service"]
 
         # Test on January 31st at 23:30 (should work with timedelta fix)
-        with patch("uptime_monitor.datetime") as mock_dt:
+        with patch("uptime_monitor.clock.datetime") as mock_dt:
             mock_dt.now.return_value = datetime(2024, 1, 31, 23, 30, 0, tzinfo=pytz.UTC)
             mock_dt.combine = datetime.combine
             mock_dt.strptime = datetime.strptime
@@ -125,7 +125,7 @@ class TestMaintenanceWindow:
             assert result is True
 
         # Test on February 1st at 00:30 (after the fix)
-        with patch("uptime_monitor.datetime") as mock_dt:
+        with patch("uptime_monitor.clock.datetime") as mock_dt:
             mock_dt.now.return_value = datetime(2024, 2, 1, 0, 30, 0, tzinfo=pytz.UTC)
             mock_dt.combine = datetime.combine
             mock_dt.strptime = datetime.strptime
@@ -143,7 +143,7 @@ class TestMaintenanceWindow:
         service = monitor.config["services"]["test-service"]
 
         # Test on February 29th, 2024 (leap year) at 23:30
-        with patch("uptime_monitor.datetime") as mock_dt:
+        with patch("uptime_monitor.clock.datetime") as mock_dt:
             mock_dt.now.return_value = datetime(2024, 2, 29, 23, 30, 0, tzinfo=pytz.UTC)
             mock_dt.combine = datetime.combine
             mock_dt.strptime = datetime.strptime
@@ -164,7 +164,7 @@ class TestMaintenanceWindow:
         service = monitor.config["services"]["test-service"]
 
         # Test during maintenance window in NY timezone
-        with patch("uptime_monitor.datetime") as mock_dt:
+        with patch("uptime_monitor.clock.datetime") as mock_dt:
             ny_tz = pytz.timezone("America/New_York")
             mock_dt.now.return_value = datetime(2024, 1, 15, 3, 0, 0, tzinfo=ny_tz)
             mock_dt.combine = datetime.combine
@@ -186,7 +186,7 @@ class TestMaintenanceWindow:
         service = monitor.config["services"]["test-service"]
 
         with patch("uptime_monitor.logging") as mock_logging:
-            with patch("uptime_monitor.datetime") as mock_dt:
+            with patch("uptime_monitor.clock.datetime") as mock_dt:
                 mock_dt.now.return_value = datetime(
                     2024, 1, 15, 3, 0, 0, tzinfo=pytz.UTC
                 )
@@ -207,7 +207,7 @@ class TestMaintenanceWindow:
         service = monitor.config["services"]["test-service"]
 
         # Test at exactly midnight
-        with patch("uptime_monitor.datetime") as mock_dt:
+        with patch("uptime_monitor.clock.datetime") as mock_dt:
             mock_dt.now.return_value = datetime(2024, 1, 15, 0, 0, 0, tzinfo=pytz.UTC)
             mock_dt.combine = datetime.combine
             mock_dt.strptime = datetime.strptime
@@ -226,7 +226,7 @@ class TestMaintenanceWindow:
         service = monitor.config["services"]["test-service"]
 
         # Test at exact start time
-        with patch("uptime_monitor.datetime") as mock_dt:
+        with patch("uptime_monitor.clock.datetime") as mock_dt:
             mock_dt.now.return_value = datetime(2024, 1, 15, 2, 0, 0, tzinfo=pytz.UTC)
             mock_dt.combine = datetime.combine
             mock_dt.strptime = datetime.strptime
@@ -235,7 +235,7 @@ class TestMaintenanceWindow:
             assert result is True
 
         # Test at exact end time
-        with patch("uptime_monitor.datetime") as mock_dt:
+        with patch("uptime_monitor.clock.datetime") as mock_dt:
             mock_dt.now.return_value = datetime(2024, 1, 15, 4, 0, 0, tzinfo=pytz.UTC)
             mock_dt.combine = datetime.combine
             mock_dt.strptime = datetime.strptime
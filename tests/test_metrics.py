@@ -0,0 +1,173 @@
+import asyncio
+import os
+import socket
+from unittest.mock import AsyncMock, patch
+
+import aiohttp
+import pytest
+
+from uptime_monitor import ServiceMonitor
+from uptime_monitor.metrics import MetricsRegistry
+
+
+class StopLoop(Exception):
+    """Raised from a patched sleep to leave the endless check loop."""
+
+
+class TestMetricsRegistry:
+    """Test the metric families and the text exposition format."""
+
+    def test_counter_and_gauge_render(self):
+        """Test counters and gauges render with labels."""
+        registry = MetricsRegistry()
+        counter = registry.counter("test_total", "A counter", ("service",))
+        gauge = registry.gauge("test_gauge", "A gauge")
+
+        counter.inc(service="web")
+        counter.inc(2, service="web")
+        gauge.set(1.5)
+
+        output = registry.render()
+        assert "# TYPE test_total counter" in output
+        assert 'test_total{service="web"} 3' in output
+        assert "test_gauge 1.5" in output
+        assert counter.get(service="web") == 3
+
+    def test_label_values_are_escaped(self):
+        """Test label values with quotes are escaped."""
+        registry = MetricsRegistry()
+        registry.counter("test_total", "A counter", ("service",)).inc(service='a"b')
+
+        assert 'test_total{service="a\\"b"} 1' in registry.render()
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test histogram samples are cumulative and include sum and count."""
+        registry = MetricsRegistry()
+        histogram = registry.histogram("test_seconds", "A histogram", buckets=(1, 5))
+
+        histogram.observe(0.5)
+        histogram.observe(3)
+        histogram.observe(10)
+
+        output = registry.render()
+        assert 'test_seconds_bucket{le="1"} 1' in output
+        assert 'test_seconds_bucket{le="5"} 2' in output
+        assert 'test_seconds_bucket{le="+Inf"} 3' in output
+        assert "test_seconds_sum 13.5" in output
+        assert "test_seconds_count 3" in output
+
+    def test_histogram_quantile(self):
+        """Test quantile estimation from buckets."""
+        registry = MetricsRegistry()
+        histogram = registry.histogram("test_seconds", "A histogram", buckets=(1, 2))
+
+        assert histogram.quantile(0.5) is None
+        for _ in range(10):
+            histogram.observe(0.5)
+
+        assert 0 < histogram.quantile(0.99) <= 1
+
+
+class TestMonitorMetrics:
+    """Test metrics recorded by the ServiceMonitor."""
+
+    @pytest.mark.asyncio
+    async def test_run_blocking_tracks_executor(self, config_file):
+        """Test executor gauges return to zero after a blocking job."""
+        monitor = ServiceMonitor(config_file)
+
+        result = await monitor._run_blocking("port", lambda x: x * 2, 21)
+
+        assert result == 42
+        assert monitor.metrics.executor_queue_depth.get(pool="port") == 0
+        assert monitor.metrics.executor_running.get(pool="port") == 0
+        monitor.close_executors()
+
+        os.unlink(config_file)
+
+    @pytest.mark.asyncio
+    async def test_check_round_records_metrics(self, config_file):
+        """Test a failing check round records attempts, retries and state."""
+        monitor = ServiceMonitor(config_file)
+        service = monitor.config["services"]["test-port"]
+
+        async def fake_sleep(delay):
+            if delay == service["interval"]:
+                raise StopLoop()
+
+        with (
+            patch.object(monitor, "_check_port", AsyncMock(return_value=False)),
+            patch.object(monitor, "_send_email_notification", AsyncMock()),
+            patch.object(monitor.clock, "sleep", side_effect=fake_sleep),
+        ):
+            with pytest.raises(StopLoop):
+                await monitor._check_service("test-port", service)
+
+        labels = {"service": "test-port", "type": "port"}
+        assert monitor.metrics.check_attempts.get(**labels) == 3
+        assert monitor.metrics.check_retries.get(**labels) == 2
+        assert monitor.metrics.check_failures.get(**labels) == 3
+        assert monitor.metrics.service_up.get(**labels) == 0
+        assert monitor.metrics.check_duration.get(type="port").count == 3
+        assert monitor.metrics.scheduler_lag.get().count == 1
+
+        os.unlink(config_file)
+
+    @pytest.mark.asyncio
+    async def test_email_notification_failure_counted(self, config_file):
+        """Test failed email delivery increments the failure counter."""
+        monitor = ServiceMonitor(config_file)
+
+        with patch.object(
+            monitor, "_send_email_sync", side_effect=OSError("SMTP down")
+        ):
+            await monitor._send_email_notification("test-http", "DOWN")
+
+        assert monitor.metrics.notification_failures.get(channel="email") == 1
+        assert monitor.metrics.notification_duration.get(channel="email").count == 1
+
+        os.unlink(config_file)
+
+    @pytest.mark.asyncio
+    async def test_event_loop_lag_measured(self, config_file):
+        """Test the event loop monitor records a lag sample."""
+        monitor = ServiceMonitor(config_file)
+
+        task = asyncio.create_task(monitor._monitor_event_loop(interval=0.01))
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+        assert monitor.metrics.event_loop_lag.get() is not None
+        assert monitor.metrics.event_loop_lag_histogram.get().count >= 1
+
+        os.unlink(config_file)
+
+    @pytest.mark.asyncio
+    async def test_standalone_metrics_listener(self, config_file):
+        """Test the standalone listener serves the metrics text."""
+        monitor = ServiceMonitor(config_file)
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        monitor.metrics_config = {"host": "127.0.0.1", "port": port}
+        monitor.metrics.service_up.set(1, service="test-http", type="http")
+
+        task = asyncio.create_task(monitor._serve_metrics())
+        try:
+            for _ in range(50):
+                try:
+                    async with aiohttp.ClientSession() as session:
+                        async with session.get(
+                            f"http://127.0.0.1:{port}/metrics"
+                        ) as response:
+                            body = await response.text()
+                            break
+                except aiohttp.ClientConnectorError:
+                    await asyncio.sleep(0.01)
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        assert 'uptime_service_up{service="test-http",type="http"} 1' in body
+
+        os.unlink(config_file)
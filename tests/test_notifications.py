@@ -0,0 +1,240 @@
+import asyncio
+import os
+import tempfile
+from datetime import timedelta
+from unittest.mock import AsyncMock
+
+import pytest
+import yaml
+from aiohttp import web
+
+from uptime_monitor import ServiceMonitor
+from uptime_monitor.clock import Clock, VirtualClock
+from uptime_monitor.notifications import RateLimiter, WebhookNotifier, build_payload
+
+
+def event(service, status="DOWN", reason="refused"):
+    return {
+        "service": service,
+        "status": status,
+        "reason": reason,
+        "message": f"{service} is {status}",
+    }
+
+
+class WebhookServer:
+    """Local stand-in for webhook endpoints, recording request bodies."""
+
+    def __init__(self):
+        self.received = {}
+        self.responses = {}  # path -> statuses to answer before 200
+        self.delays = {}  # path -> seconds to wait before answering
+
+    async def handler(self, request):
+        path = request.match_info["path"]
+        self.received.setdefault(path, []).append(await request.json())
+        await asyncio.sleep(self.delays.get(path, 0))
+        statuses = self.responses.get(path)
+        if statuses:
+            return web.Response(status=statuses.pop(0))
+        return web.Response(text="ok")
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_post("/{path}", self.handler)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.base = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.runner.cleanup()
+
+
+class TestRateLimiter:
+    """Test the per-webhook token bucket."""
+
+    def test_burst_then_rate(self):
+        """Test a burst passes at once and later requests are spaced out."""
+        clock = VirtualClock()
+        limiter = RateLimiter(clock, rate=2, burst=3)
+
+        async def acquire(count):
+            times = []
+            for _ in range(count):
+                await limiter.acquire()
+                times.append(clock.monotonic())
+            return times
+
+        times = clock.run(acquire(6))
+
+        start = times[0]
+        assert [t - start for t in times] == pytest.approx([0, 0, 0, 0.5, 1.0, 1.5])
+
+
+class TestBuildPayload:
+    """Test request bodies per webhook format."""
+
+    def test_formats(self):
+        """Test JSON events, arrays when batching and chat messages."""
+        events = [event("web"), event("db", "UP")]
+
+        assert (
+            build_payload({"format": "json", "batch": False}, events[:1]) == events[0]
+        )
+        assert build_payload({"format": "json", "batch": True}, events) == events
+        assert build_payload(
+            {"format": "slack", "batch": True, "channel": "#ops"}, events
+        ) == {"text": "web is DOWN\ndb is UP", "channel": "#ops"}
+
+    def test_invalid_config(self):
+        """Test webhooks without url or with an unknown format are rejected."""
+        with pytest.raises(ValueError, match="has no url"):
+            WebhookNotifier({"ops": {"format": "slack"}}, Clock())
+        with pytest.raises(ValueError, match="unknown format"):
+            WebhookNotifier({"ops": {"url": "http://x", "format": "teams"}}, Clock())
+
+
+class TestWebhookNotifier:
+    """Test delivery to a local webhook server."""
+
+    async def test_concurrent_fan_out_keeps_order(self):
+        """Test a slow endpoint doesn't hold up the others, order is kept."""
+        async with WebhookServer() as server:
+            server.delays["slow"] = 0.3
+            notifier = WebhookNotifier(
+                {
+                    "slow": {"url": f"{server.base}/slow", "rate": 100},
+                    "fast": {"url": f"{server.base}/fast", "rate": 100},
+                },
+                Clock(),
+            )
+            await notifier.start()
+            for index in range(5):
+                notifier.notify(event(f"service-{index}"))
+
+            await asyncio.sleep(0.2)
+            assert len(server.received["fast"]) == 5
+            assert len(server.received["slow"]) == 1
+
+            await notifier.close(timeout=5)
+
+        for path in ("slow", "fast"):
+            assert [body["service"] for body in server.received[path]] == [
+                f"service-{index}" for index in range(5)
+            ]
+        assert (
+            notifier.metrics.notifications.get(channel="webhook", status="DOWN") == 10
+        )
+
+    async def test_batches_events_queued_while_rate_limited(self):
+        """Test queued events go out as arrays of up to batch_size."""
+        async with WebhookServer() as server:
+            notifier = WebhookNotifier(
+                {
+                    "ingest": {
+                        "url": f"{server.base}/ingest",
+                        "batch": True,
+                        "rate": 10,
+                        "burst": 1,
+                    }
+                },
+                Clock(),
+            )
+            await notifier.start()
+            for index in range(60):
+                notifier.notify(event(f"service-{index}"))
+            await notifier.close(timeout=5)
+
+        batches = server.received["ingest"]
+        assert [len(batch) for batch in batches] == [50, 10]
+        assert [body["service"] for batch in batches for body in batch] == [
+            f"service-{index}" for index in range(60)
+        ]
+
+    async def test_retries_server_errors(self):
+        """Test 5xx and 429 answers are retried with backoff, 4xx are not."""
+        async with WebhookServer() as server:
+            server.responses["flaky"] = [503, 429]
+            server.responses["broken"] = [400, 400]
+            notifier = WebhookNotifier(
+                {
+                    "flaky": {"url": f"{server.base}/flaky", "backoff": 0.01},
+                    "broken": {"url": f"{server.base}/broken", "backoff": 0.01},
+                },
+                Clock(),
+            )
+            await notifier.start()
+            notifier.notify(event("web"))
+            await notifier.close(timeout=5)
+
+        metrics = notifier.metrics
+        assert len(server.received["flaky"]) == 3
+        assert metrics.webhook_retries.get(webhook="flaky") == 2
+        assert len(server.received["broken"]) == 1
+        assert metrics.notification_failures.get(channel="webhook") == 1
+
+    async def test_unreachable_endpoint_gives_up(self):
+        """Test connection errors are retried up to max_tries."""
+        notifier = WebhookNotifier(
+            {"gone": {"url": "http://127.0.0.1:1/", "max_tries": 3, "backoff": 0.01}},
+            Clock(),
+        )
+        await notifier.start()
+        notifier.notify(event("web"))
+        await notifier.close(timeout=5)
+
+        assert notifier.metrics.webhook_retries.get(webhook="gone") == 2
+        assert notifier.metrics.notification_failures.get(channel="webhook") == 1
+
+    def test_not_started(self):
+        """Test events for webhooks that aren't running are dropped."""
+        notifier = WebhookNotifier({"ops": {"url": "http://ops.test"}}, Clock())
+
+        notifier.notify(event("web"), webhooks=["ops"])
+
+        assert notifier.metrics.notification_failures.get(channel="webhook") == 1
+
+
+class TestMonitorWebhooks:
+    """Test status changes reaching webhooks from the monitor."""
+
+    async def test_down_and_up_events(self):
+        """Test DOWN carries the reason and UP the downtime."""
+        async with WebhookServer() as server:
+            config = {
+                "email": {},
+                "timezone": "UTC",
+                "webhooks": {
+                    "ops": {"url": f"{server.base}/ops", "format": "mattermost"},
+                    "ingest": {"url": f"{server.base}/ingest"},
+                },
+                "services": {},
+            }
+            with tempfile.NamedTemporaryFile(
+                mode="w", suffix=".yaml", delete=False
+            ) as f:
+                yaml.dump(config, f)
+            monitor = ServiceMonitor(f.name)
+            os.unlink(f.name)
+            monitor._send_email_notification = AsyncMock()
+            service = {"type": "ping", "host": "web"}
+            await monitor.webhooks.start()
+
+            await monitor._set_state("web", service, False, "No ping response")
+            monitor.down_since["web"] -= timedelta(minutes=5)
+            await monitor._set_state("web", service, True)
+            await monitor.webhooks.close()
+
+        assert [body["text"] for body in server.received["ops"]] == [
+            "🔴 web is DOWN: No ping response",
+            "✅ web is UP after 5 minutes",
+        ]
+        down, up = server.received["ingest"]
+        assert (down["status"], down["reason"]) == ("DOWN", "No ping response")
+        assert (up["status"], up["downtime"]) == ("UP", 300)
+        assert monitor._send_email_notification.await_count == 2
+        # Cleared with the state change, not by the email channel
+        assert monitor.down_since == {}
@@ -0,0 +1,140 @@
+import json
+import os
+import tempfile
+from datetime import timedelta, timezone
+
+import pytest
+
+from uptime_monitor.clock import VirtualClock
+from uptime_monitor.persistence import StateStore
+
+
+@pytest.fixture
+def state_file():
+    with tempfile.TemporaryDirectory() as directory:
+        yield os.path.join(directory, "state.json")
+
+
+class TestStateStore:
+    """Test writing and reading state snapshots."""
+
+    def test_round_trip(self, state_file):
+        """Test a saved snapshot loads back and no temporary file is left."""
+        store = StateStore(state_file)
+
+        store.save({"sequence": 1, "services": {"web": {"up": False}}})
+
+        assert store.load()["services"] == {"web": {"up": False}}
+        assert os.listdir(os.path.dirname(state_file)) == ["state.json"]
+
+    def test_stale_snapshot_dropped(self, state_file):
+        """Test an older snapshot never overwrites a newer one."""
+        store = StateStore(state_file)
+
+        assert store.save({"sequence": 2, "services": {"web": {"up": True}}})
+        assert not store.save({"sequence": 1, "services": {"web": {"up": False}}})
+
+        assert store.load()["services"] == {"web": {"up": True}}
+
+    def test_missing_file(self, state_file):
+        """Test a missing snapshot means a fresh start."""
+        assert StateStore(state_file).load() is None
+
+    def test_unreadable_snapshot_ignored(self, state_file):
+        """Test a corrupt or foreign snapshot is ignored."""
+        with open(state_file, "w") as f:
+            f.write('{"services": ')
+        assert StateStore(state_file).load() is None
+
+        with open(state_file, "w") as f:
+            json.dump({"version": 0, "services": {}}, f)
+        assert StateStore(state_file).load() is None
+
+
+class TestRestart:
+    """Test resuming the monitor from a snapshot on virtual time."""
+
+    @pytest.fixture
+    def start(self, create_monitor, ping, state_file):
+        """Factory for monitors snapshotting to the same state file."""
+
+        def start(clock):
+            return create_monitor(
+                {name: ping(name, timeout=1) for name in ("router", "switch")},
+                clock=clock,
+                state={"file": state_file, "interval": 30},
+            )
+
+        return start
+
+    @pytest.fixture
+    def run_for(self, run_monitor):
+        """Run a monitor with stub pings and notifications."""
+
+        def run_for(monitor, seconds, up, alerts, probes):
+            async def check_ping(service):
+                probes.append((service["host"], monitor.clock.monotonic()))
+                return up(service["host"])
+
+            async def notify(service_name, status, reason=None):
+                alerts.append((service_name, status))
+
+            async def run_inline(pool, func, *args):
+                # Executor threads don't advance with virtual time
+                return func(*args)
+
+            monitor._check_ping = check_ping
+            monitor._send_email_notification = notify
+            monitor._run_blocking = run_inline
+            run_monitor(monitor, seconds)
+
+        return run_for
+
+    def test_resume_without_duplicate_alerts(self, start, run_for):
+        """Test a restart keeps states, downtimes and the schedule phase."""
+        first = start(VirtualClock())
+        alerts, probes = [], []
+        run_for(first, 100, lambda host: host != "router", alerts, probes)
+
+        assert alerts == [("router", "DOWN")]
+        down_since = first.down_since["router"]
+
+        # Restart 10 seconds after the shutdown, rounds were due at t=120
+        restarted_at = first.clock.now(timezone.utc) + timedelta(seconds=10)
+        second = start(VirtualClock(restarted_at))
+        assert second.service_states == {"router": False, "switch": True}
+        assert second.status_index.status("router") == "DOWN"
+
+        alerts, probes = [], []
+        run_for(second, 60, lambda host: host != "router", alerts, probes)
+
+        # The first rounds keep their phase instead of all running at once
+        assert probes == [("router", 10), ("switch", 10)]
+        # Still DOWN: no second DOWN email, and the downtime start is kept
+        assert alerts == []
+        assert second.down_since["router"] == down_since
+
+    def test_overdue_rounds_are_spread(self, start, run_for):
+        """Test rounds overdue after a long stop start within the spread."""
+        first = start(VirtualClock())
+        run_for(first, 100, lambda host: True, [], [])
+
+        restarted_at = first.clock.now(timezone.utc) + timedelta(hours=1)
+        second = start(VirtualClock(restarted_at))
+        probes = []
+        run_for(second, 40, lambda host: True, [], probes)
+
+        assert len(probes) == 2
+        assert all(0 <= at <= 30 for _, at in probes)
+
+    def test_periodic_snapshots(self, start, run_for):
+        """Test the snapshot is refreshed while the monitor runs."""
+        monitor = start(VirtualClock())
+        monitor.state_store.save = lambda snapshot: saved.append(snapshot)
+        saved = []
+
+        run_for(monitor, 95, lambda host: True, [], [])
+
+        # Three periodic snapshots plus one on shutdown
+        assert len(saved) == 4
+        assert saved[0]["services"]["router"]["up"] is True
@@ -0,0 +1,107 @@
+import argparse
+import json
+
+import pytest
+
+from uptime_monitor.planning import failing_round, plan_capacity, plan_main
+
+
+def port(name, **overrides):
+    service = {
+        "type": "port",
+        "host": name,
+        "port": 5432,
+        "timeout": 5,
+        "interval": 60,
+        "max_tries": 1,
+    }
+    service.update(overrides)
+    return service
+
+
+class TestFailingRound:
+    """Test the modelled duration of rounds where every attempt fails."""
+
+    def test_backoff_between_attempts(self):
+        """Test attempts time out with backoff in between."""
+        service = port("db", timeout=10, max_tries=3)
+        policy = {
+            "deadline": 60,
+            "backoff": 0.5,
+            "multiplier": 2.0,
+            "backoff_max": 10.0,
+        }
+
+        assert failing_round(service, policy) == (31.5, 30, 3)
+
+    def test_cut_off_by_deadline(self):
+        """Test the round deadline ends the round early."""
+        service = port("db", timeout=10, max_tries=3)
+        policy = {"deadline": 15, "backoff": 1, "multiplier": 2.0, "backoff_max": 10}
+
+        assert failing_round(service, policy) == (15, 14, 2)
+
+
+class TestPlanCapacity:
+    """Test predicted load of a schedule."""
+
+    def test_rates_and_concurrency(self, create_monitor):
+        """Test probe rates and concurrency grow with the failure rate."""
+        monitor = create_monitor({f"db-{i}": port(f"db-{i}") for i in range(10)})
+
+        plan = plan_capacity(monitor, [0, 1], latency=1)
+        healthy, failing = plan["scenarios"]
+
+        assert plan["services"] == 10
+        assert healthy["rounds_per_second"] == pytest.approx(10 / 61)
+        assert healthy["mean_concurrent_probes"] == pytest.approx(10 / 61)
+        assert failing["mean_concurrent_probes"] == pytest.approx(50 / 65)
+        assert failing["notifications"]["alerts"] == 10
+        assert not plan["intervals"]
+        assert not healthy["problems"] and not failing["problems"]
+
+    def test_overloaded_schedule(self, create_monitor):
+        """Test missed intervals, saturated executors and the probe budget."""
+        services = {"slow": port("slow", timeout=10, interval=15, max_tries=3)}
+        monitor = create_monitor(
+            services,
+            probe_budget=1,
+            executors={"port": {"workers": 2, "queue_size": 5}},
+            webhooks={"chat": {"url": "http://chat.test", "queue_size": 100}},
+        )
+
+        plan = plan_capacity(monitor, [1], scale=300)
+        (scenario,) = plan["scenarios"]
+
+        assert plan["services"] == 300
+        assert plan["intervals"] == [
+            "slow: failing rounds take 30.0s, checked every 45.0s instead of "
+            "15.0s while DOWN"
+        ]
+        assert plan["startup"]["problems"] == [
+            "300 port checks at startup overflow the port executor "
+            "(2 workers, queue of 5)"
+        ]
+        assert scenario["stretch"] == pytest.approx(20)
+        assert scenario["executors"]["port"]["utilization"] > 1
+        assert scenario["notifications"]["drain_seconds"]["webhook chat"] == 295
+        assert any("probe_budget" in p for p in scenario["problems"])
+        assert any("queue of webhook chat" in p for p in scenario["problems"])
+
+    def test_plan_command(self, write_config, capsys):
+        """Test the command prints the plan and exits non-zero on problems."""
+        config_file = write_config({"db": port("db")})
+        args = argparse.Namespace(
+            config=config_file, failure_rate=[0.5], scale=1.0, latency=None, json=True
+        )
+        assert plan_main(args) == 0
+        plan = json.loads(capsys.readouterr().out)
+        assert plan["scenarios"][0]["failure_rate"] == 0.5
+
+        args.json = False
+        args.scale = 2000
+        assert plan_main(args) == 1
+
+        out = capsys.readouterr().out
+        assert "2000 services probed locally" in out
+        assert "port executor needs" in out
@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+from uptime_monitor.clock import VirtualClock
+from uptime_monitor.priorities import RoundDispatcher
+
+
+class TestRoundDispatcher:
+    """Test priority ordering of round slots."""
+
+    def test_higher_priority_first(self):
+        """Test waiting rounds get slots by priority, then by due time."""
+        clock = VirtualClock()
+        dispatcher = RoundDispatcher(
+            {
+                "priorities": {"max_concurrent_rounds": 1},
+                "services": {
+                    "payments": {"priority": "critical"},
+                    "test-box": {"priority": "low"},
+                    "blog": {},
+                    "shop": {},
+                },
+            },
+            clock,
+        )
+        order = []
+
+        async def round_(name, due):
+            await dispatcher.acquire(name, due)
+            order.append(name)
+            await clock.sleep(1)
+            dispatcher.release()
+
+        async def run():
+            await dispatcher.acquire("holder", 0)
+            tasks = [
+                asyncio.create_task(round_(name, due))
+                for name, due in [
+                    ("test-box", 0),
+                    ("shop", 3),
+                    ("blog", 2),
+                    ("payments", 5),
+                ]
+            ]
+            await asyncio.sleep(0)
+            dispatcher.release()
+            await asyncio.gather(*tasks)
+
+        clock.run(run())
+
+        assert order == ["payments", "blog", "shop", "test-box"]
+        assert dispatcher.running == 0
+
+    def test_stretch_when_overloaded(self):
+        """Test stretched tiers wait longer only while overloaded."""
+        dispatcher = RoundDispatcher(
+            {
+                "priorities": {"stretch": ["normal"], "stretch_factor": 3},
+                "services": {"payments": {"priority": "critical"}, "blog": {}},
+            },
+            VirtualClock(),
+        )
+
+        assert dispatcher.interval("blog", 60) == 60
+        dispatcher.overloaded = True
+        assert dispatcher.interval("blog", 60) == 180
+        assert dispatcher.interval("payments", 60) == 60
+        assert dispatcher.report()["services"] == {
+            "blog": {
+                "priority": "normal",
+                "delayed_rounds": 1,
+                "delay": 120,
+                "shed_rounds": 0,
+            }
+        }
+
+    def test_invalid_priority(self):
+        """Test unknown priority classes fail at load time."""
+        with pytest.raises(ValueError, match="unknown priority urgent"):
+            RoundDispatcher({"services": {"x": {"priority": "urgent"}}}, VirtualClock())
+        with pytest.raises(ValueError, match="Unknown priority lowest"):
+            RoundDispatcher({"priorities": {"shed": ["lowest"]}}, VirtualClock())
+
+
+class TestMonitorPriorities:
+    """Test the monitor under more load than it can run."""
+
+    def test_overload_sheds_low_priority(self, ping, create_monitor, run_monitor):
+        """Test critical rounds stay on time while low ones are shed."""
+        services = {"payments": ping("payments", interval=10, priority="critical")}
+        services.update(
+            {
+                f"box-{i}": ping(f"box-{i}", interval=10, priority="low")
+                for i in range(10)
+            }
+        )
+        # 11 rounds of 4s every 10s need 4.4 slots, only 2 are available
+        monitor = create_monitor(
+            services, priorities={"max_concurrent_rounds": 2, "lag_threshold": 5}
+        )
+
+        async def check_ping(service):
+            await monitor.clock.sleep(4)
+            return True
+
+        monitor._check_ping = check_ping
+        run_monitor(monitor, 600)
+
+        services = monitor.dispatcher.report()["services"]
+        # At most one running round of 4s ahead of each critical round
+        payments = services["payments"]
+        assert payments["shed_rounds"] == 0
+        assert payments["delay"] / payments["delayed_rounds"] <= 4
+        assert all(services[f"box-{i}"]["shed_rounds"] > 0 for i in range(10))
+        assert monitor.metrics.rounds_shed.get(service="box-9", priority="low") > 0
+        assert monitor.metrics.round_delay.get(
+            service="payments", priority="critical"
+        ) == pytest.approx(payments["delay"])
@@ -0,0 +1,177 @@
+import asyncio
+
+import pytest
+
+from uptime_monitor.clock import VirtualClock
+from uptime_monitor.probes import ProbeCoalescer, group_by_probe, probe_key
+
+
+class TestProbeKeys:
+    """Test detection of identical probe specs."""
+
+    def test_identical_specs_share_key(self):
+        """Test schedule settings don't change the probe key."""
+        first = {"type": "http", "url": "https://a.example", "interval": 60}
+        second = {"type": "http", "url": "https://a.example", "method": "get"}
+
+        assert probe_key(first) == probe_key(second)
+
+    def test_different_specs(self):
+        """Test target, method and expectations change the probe key."""
+        base = {"type": "http", "url": "https://a.example"}
+
+        assert probe_key(base) != probe_key({**base, "method": "HEAD"})
+        assert probe_key(base) != probe_key({**base, "expect": {"keyword": "ok"}})
+        assert probe_key({"type": "port", "host": "a", "port": 22}) != probe_key(
+            {"type": "port", "host": "a", "port": 80}
+        )
+        assert probe_key({"type": "composite"}) is None
+
+    def test_timeout_changes_key(self):
+        """Test services with different timeouts never share a probe."""
+        service = {"type": "ping", "host": "router", "timeout": 5}
+
+        assert probe_key(service) != probe_key({**service, "timeout": 30})
+
+    def test_group_by_probe(self):
+        """Test services are grouped by probe spec."""
+        services = {
+            "team-a": {"type": "ping", "host": "router"},
+            "team-b": {"type": "ping", "host": "router"},
+            "other": {"type": "ping", "host": "switch"},
+        }
+
+        groups = group_by_probe(services)
+
+        assert sorted(groups.values()) == [["other"], ["team-a", "team-b"]]
+
+
+class TestProbeCoalescer:
+    """Test single-flight and short-window result sharing."""
+
+    def test_concurrent_probes_single_flight(self):
+        """Test concurrent callers share one running probe."""
+        clock = VirtualClock()
+        coalescer = ProbeCoalescer(clock, window=0)
+        calls = []
+
+        async def probe():
+            calls.append(clock.monotonic())
+            await clock.sleep(1)
+            return True
+
+        async def run():
+            return await asyncio.gather(
+                *(coalescer.run("target", probe) for _ in range(5))
+            )
+
+        results = clock.run(run())
+
+        assert len(calls) == 1
+        assert [result for result, _ in results] == [True] * 5
+        assert [how for _, how in results] == [None] + ["inflight"] * 4
+        assert coalescer.saved == 4
+
+    def test_recent_result_reused_within_window(self):
+        """Test a result is reused within the window and refreshed after it."""
+        clock = VirtualClock()
+        coalescer = ProbeCoalescer(clock, window=5)
+        calls = []
+
+        async def probe():
+            calls.append(clock.monotonic())
+            return False
+
+        async def run():
+            first = await coalescer.run("target", probe)
+            await clock.sleep(3)
+            second = await coalescer.run("target", probe)
+            await clock.sleep(3)
+            third = await coalescer.run("target", probe)
+            return first, second, third
+
+        results = clock.run(run())
+
+        assert results == ((False, None), (False, "recent"), (False, None))
+        assert calls == [0, 6]
+
+    def test_fresh_skips_recent_results(self):
+        """Test a fresh run probes again but still joins a running probe."""
+        clock = VirtualClock()
+        coalescer = ProbeCoalescer(clock, window=5)
+        calls = []
+
+        async def probe():
+            calls.append(clock.monotonic())
+            await clock.sleep(1)
+            return True
+
+        async def run():
+            await coalescer.run("target", probe)
+            running = asyncio.ensure_future(coalescer.run("target", probe, fresh=True))
+            await asyncio.sleep(0)
+            joined = await coalescer.run("target", probe, fresh=True)
+            return await running, joined
+
+        results = clock.run(run())
+
+        assert results == ((True, None), (True, "inflight"))
+        assert calls == [0, 1]
+
+    def test_exception_shared(self):
+        """Test a failing probe raises for every subscriber."""
+        clock = VirtualClock()
+        coalescer = ProbeCoalescer(clock)
+
+        async def probe():
+            await clock.sleep(1)
+            raise OSError("unreachable")
+
+        async def run():
+            return await asyncio.gather(
+                coalescer.run("target", probe),
+                coalescer.run("target", probe),
+                return_exceptions=True,
+            )
+
+        results = clock.run(run())
+
+        assert all(isinstance(result, OSError) for result in results)
+
+
+class TestMonitorProbeSharing:
+    """Test services with the same target share probes in the monitor."""
+
+    @pytest.mark.parametrize(
+        "config, expected_calls", [({}, 10), ({"probe_dedup": {"enabled": False}}, 30)]
+    )
+    def test_identical_services_share_probes(
+        self, create_monitor, run_monitor, config, expected_calls
+    ):
+        """Test three alert routes for one URL run one probe per round."""
+        services = {
+            f"route-{team}": {
+                "type": "http",
+                "url": "https://shared.example.com",
+                "timeout": 5,
+                "interval": 60,
+                "max_tries": 1,
+            }
+            for team in ("a", "b", "c")
+        }
+        monitor = create_monitor(services, **config)
+        calls = []
+
+        async def check_http(service):
+            calls.append(service["url"])
+            await monitor.clock.sleep(0.5)
+            return True
+
+        monitor._check_http = check_http
+        run_monitor(monitor, 599)
+
+        assert len(calls) == expected_calls
+        assert monitor.service_states == {name: True for name in services}
+        saved = monitor.metrics.probes_deduplicated.get(reason="inflight")
+        assert saved == (0 if config else 20)
+        assert monitor.metrics.probe_targets.get() == 1
@@ -0,0 +1,219 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from aiohttp import web
+
+from uptime_monitor import ServiceMonitor
+from uptime_monitor.dashboard import WebServiceMonitor
+from uptime_monitor.profiling import CostTracker, CpuMeter, StackSampler
+
+
+def burn(seconds):
+    started = time.thread_time()
+    while time.thread_time() - started < seconds:
+        pass
+
+
+def busy_function(stop):
+    while not stop.is_set():
+        burn(0.001)
+
+
+SERVICES = {
+    "db": {
+        "type": "port",
+        "host": "db",
+        "port": 5432,
+        "timeout": 5,
+        "interval": 60,
+        "max_tries": 1,
+    }
+}
+
+
+class TestCpuMeter:
+    """Test CPU time accounting per coroutine."""
+
+    async def test_only_own_steps_count(self):
+        """Test CPU used by other tasks while the coroutine waits is excluded."""
+        tracker = CostTracker()
+        cost = tracker.record("web")
+
+        async def round_():
+            burn(0.02)
+            await asyncio.sleep(0.01)
+            burn(0.02)
+            return "done"
+
+        async def neighbour():
+            burn(0.1)
+
+        other = asyncio.create_task(neighbour())
+        assert await CpuMeter(round_(), cost) == "done"
+        await other
+
+        assert 0.035 < cost.cpu < 0.08
+
+    async def test_exceptions_propagate(self):
+        """Test errors and cancellation pass through the meter."""
+        cost = CostTracker().record("web")
+
+        async def failing():
+            await asyncio.sleep(0)
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError, match="boom"):
+            await CpuMeter(failing(), cost)
+
+        async def waiting():
+            await CpuMeter(asyncio.sleep(10), cost)
+
+        task = asyncio.create_task(waiting())
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    def test_top(self):
+        """Test services are ranked by the chosen cost."""
+        tracker = CostTracker()
+        for name, cpu, rounds in [("a", 1.0, 10), ("b", 3.0, 100), ("c", 2.0, 1)]:
+            cost = tracker.record(name)
+            cost.cpu, cost.rounds = cpu, rounds
+        tracker.record("idle")
+
+        assert [row["service"] for row in tracker.top()] == ["b", "c", "a"]
+        assert [row["service"] for row in tracker.top(1, "cpu_per_round")] == ["c"]
+        with pytest.raises(ValueError, match="Unknown cost"):
+            tracker.top(sort="memory")
+
+
+class TestStackSampler:
+    """Test stack sampling into folded stacks."""
+
+    def test_folded_stacks(self):
+        """Test busy threads show up with their call stacks."""
+        stop = threading.Event()
+        worker = threading.Thread(target=busy_function, args=(stop,), name="worker")
+        sampler = StackSampler(interval=0.001)
+        worker.start()
+        sampler.start()
+        time.sleep(0.1)
+        sampler.stop()
+        stop.set()
+        worker.join()
+
+        folded = sampler.folded()
+        assert sampler.samples > 10
+        lines = [line for line in folded.splitlines() if line.startswith("worker;")]
+        assert lines
+        stack, count = lines[0].rsplit(" ", 1)
+        assert "busy_function (test_profiling.py:" in stack
+        assert int(count) > 0
+        assert "uptime-profiler" not in folded
+
+
+class TestMonitorCosts:
+    """Test per-service costs recorded by checks."""
+
+    async def test_executor_time_charged(self, write_config):
+        """Test blocking work is charged to the service that started it."""
+        monitor = ServiceMonitor(write_config(SERVICES))
+        monitor._check_port_sync = lambda service: time.sleep(0.05) or True
+        service = monitor.config["services"]["db"]
+
+        async def check():
+            monitor.costs.bind("db")
+            return await monitor._check_port(service)
+
+        try:
+            assert await asyncio.create_task(check())
+        finally:
+            monitor.close_executors()
+
+        assert monitor.costs.services["db"].executor >= 0.05
+
+    async def test_http_bytes_charged(self, write_config):
+        """Test HTTP checks count request and response bytes."""
+
+        async def handler(request):
+            return web.Response(text="ok" * 100)
+
+        app = web.Application()
+        app.router.add_get("/", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        monitor = ServiceMonitor(write_config(SERVICES))
+
+        async def check():
+            monitor.costs.bind("web")
+            return await monitor._check_http(
+                {"url": f"http://127.0.0.1:{port}/", "timeout": 5}
+            )
+
+        try:
+            assert await asyncio.create_task(check())
+        finally:
+            await runner.cleanup()
+
+        cost = monitor.costs.services["web"]
+        assert cost.sent > 20
+        assert cost.received > 50
+
+    async def test_profile(self, write_config):
+        """Test a profile samples the event loop and runs one at a time."""
+        monitor = ServiceMonitor(write_config(SERVICES))
+
+        first = asyncio.create_task(monitor.profile(0.1, interval=0.001))
+        await asyncio.sleep(0)
+        with pytest.raises(RuntimeError, match="already running"):
+            await monitor.profile(0.1)
+        folded = await first
+
+        assert "MainThread;" in folded
+
+    def test_dashboard_endpoints(self, write_config):
+        """Test the costs view and that profiling needs a running monitor."""
+        monitor = WebServiceMonitor(write_config(SERVICES))
+        cost = monitor.costs.record("db")
+        cost.rounds, cost.cpu = 4, 0.02
+        client = monitor.app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = "1"
+            session["_fresh"] = True
+
+        (row,) = client.get("/api/costs").get_json()
+        assert row["service"] == "db"
+        assert row["cpu_per_round"] == pytest.approx(0.005)
+        assert client.get("/api/costs?sort=memory").status_code == 400
+        own_page = {"Origin": "http://localhost"}
+        assert (
+            client.post("/api/profile?seconds=5", headers=own_page).status_code == 503
+        )
+        assert (
+            client.post("/api/profile?seconds=3600", headers=own_page).status_code
+            == 400
+        )
+
+    def test_profile_needs_same_origin_or_token(self, write_config):
+        """Test cookie-authenticated profiles must come from the dashboard."""
+        monitor = WebServiceMonitor(write_config(SERVICES, control={"token": "s3cret"}))
+        client = monitor.app.test_client()
+
+        assert client.post("/api/profile").status_code == 401
+        token = {"Authorization": "Bearer s3cret"}
+        assert client.post("/api/profile", headers=token).status_code == 503
+
+        with client.session_transaction() as session:
+            session["_user_id"] = "1"
+            session["_fresh"] = True
+        assert client.post("/api/profile").status_code == 403
+        other_site = {"Origin": "https://evil.example"}
+        assert client.post("/api/profile", headers=other_site).status_code == 403
+        referer = {"Referer": "http://localhost/"}
+        assert client.post("/api/profile", headers=referer).status_code == 503
@@ -0,0 +1,160 @@
+import asyncio
+import socket
+import time
+
+import aiohttp
+import pytest
+
+from uptime_monitor import ServiceMonitor
+from uptime_monitor.dashboard import WebServiceMonitor
+from uptime_monitor.push import PushTracker
+
+
+def push(token, period=60, **extra):
+    service = {"type": "push", "token": token, "period": period, "grace": 10}
+    service.update(extra)
+    return service
+
+
+class TestPushTracker:
+    """Test the deadline heap of push services."""
+
+    def test_expiry_order(self):
+        """Test services expire by deadline, pings push deadlines back."""
+        tracker = PushTracker(
+            {"backup": push("a", period=100), "cron": push("b", period=50)}
+        )
+        tracker.ping("backup", 0)
+        tracker.ping("cron", 0)
+
+        assert tracker.expired(59) == []
+        tracker.ping("cron", 59)
+        assert tracker.expired(110) == ["backup"]
+        assert tracker.expired(118) == []
+        assert tracker.expired(119) == ["cron"]
+        assert tracker.next_deadline() is None
+
+    def test_one_heap_entry_per_service(self):
+        """Test pings don't grow the heap."""
+        tracker = PushTracker({f"job-{i}": push(f"t{i}") for i in range(100)})
+
+        for now in range(50):
+            for i in range(100):
+                tracker.ping(f"job-{i}", now)
+
+        assert len(tracker._heap) == 100
+        assert tracker.expired(70) == []  # first deadlines, moved since
+        assert tracker.next_deadline() == 119
+
+    def test_invalid_config(self):
+        """Test push services need a unique token and a period."""
+        with pytest.raises(ValueError, match="has no token"):
+            PushTracker({"job": {"type": "push", "period": 60}})
+        with pytest.raises(ValueError, match="has no period"):
+            PushTracker({"job": {"type": "push", "token": "x"}})
+        with pytest.raises(ValueError, match="share a token"):
+            PushTracker({"a": push("x"), "b": push("x")})
+
+
+class TestMonitorPush:
+    """Test push services in the monitor."""
+
+    def test_missed_ping_alerts(self, create_monitor, run_monitor):
+        """Test DOWN after period plus grace without a ping, UP on the next."""
+        monitor = create_monitor(
+            {"backup": push("secret-1"), "cron": push("secret-2", period=3600)}
+        )
+        alerts = []
+
+        async def notify(service_name, status, reason=None):
+            alerts.append((round(monitor.clock.monotonic() - start), status, reason))
+
+        async def steps(monitor):
+            for _ in range(3):
+                await monitor.clock.sleep(30)
+                assert monitor.record_ping("secret-1")
+            await monitor.clock.sleep(200)  # last ping at 90: DOWN at 160
+            assert monitor.record_ping("secret-1")
+            assert not monitor.record_ping("wrong")
+            await monitor.clock.sleep(5)
+            assert monitor.record_ping("secret-2", failed=True)
+            await monitor.clock.sleep(5)
+
+        monitor._send_email_notification = notify
+        start = monitor.clock.monotonic()
+        run_monitor(monitor, steps)
+
+        assert alerts == [
+            (160, "DOWN", "No ping for 1 minutes, 10 seconds"),
+            (290, "UP", None),
+            (295, "DOWN", "Failure reported by ping"),
+        ]
+        assert monitor.metrics.push_pings.get(service="backup") == 4
+        assert len(monitor.push._heap) == 2
+
+    def test_ping_throughput(self, create_monitor):
+        """Test steady pings of UP services are cheap."""
+        services = {f"host-{i}": push(f"token-{i}") for i in range(1000)}
+        monitor = create_monitor(services)
+        for name in services:
+            monitor.service_states[name] = True
+
+        started = time.perf_counter()
+        for _ in range(20):
+            for i in range(1000):
+                monitor.record_ping(f"token-{i}")
+        elapsed = time.perf_counter() - started
+
+        assert elapsed < 1.0  # 20,000 pings
+        assert monitor._push_updates == set()
+        assert len(monitor.push._heap) == 1000
+
+    async def test_ping_endpoint(self, write_config):
+        """Test the standalone listener takes pings and rejects unknown tokens."""
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        monitor = ServiceMonitor(
+            write_config(
+                {"backup": push("secret-1")},
+                metrics={
+                    "host": "127.0.0.1",
+                    "port": port,
+                    "event_loop_interval": 3600,
+                },
+            )
+        )
+        monitor._send_email_notification = lambda *args: asyncio.sleep(0)
+        task = asyncio.create_task(monitor.start_monitoring())
+        try:
+            async with aiohttp.ClientSession() as session:
+                for _ in range(50):
+                    try:
+                        async with session.get(f"http://127.0.0.1:{port}/metrics"):
+                            break
+                    except aiohttp.ClientConnectorError:
+                        await asyncio.sleep(0.05)
+                base = f"http://127.0.0.1:{port}/ping"
+                async with session.post(f"{base}/secret-1") as response:
+                    assert response.status == 200
+                async with session.get(f"{base}/nope") as response:
+                    assert response.status == 404
+            await asyncio.sleep(0.05)
+            assert monitor.service_states["backup"] is True
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    def test_dashboard_endpoint(self, write_config):
+        """Test the dashboard checks the token and needs a running monitor."""
+        monitor = WebServiceMonitor(write_config({"backup": push("secret-1")}))
+        client = monitor.app.test_client()
+
+        assert client.get("/ping/nope").status_code == 404
+        assert client.post("/ping/secret-1").status_code == 503
+        with client.session_transaction() as session:
+            session["_user_id"] = "1"
+            session["_fresh"] = True
+        backup = client.get("/api/services").get_json()["services"]["backup"]
+        assert backup["period"] == 60
+        assert "last_ping" not in backup
@@ -0,0 +1,222 @@
+import asyncio
+import os
+from collections import deque
+
+import pytest
+
+from uptime_monitor import ServiceMonitor
+from uptime_monitor.clock import VirtualClock
+
+
+@pytest.fixture
+def monitor(config_file):
+    monitor = ServiceMonitor(config_file, clock=VirtualClock())
+    yield monitor
+    os.unlink(config_file)
+
+
+def make_service(**overrides):
+    service = {
+        "type": "port",
+        "host": "example.com",
+        "port": 80,
+        "timeout": 5,
+        "interval": 300,
+        "max_tries": 3,
+    }
+    service.update(overrides)
+    return service
+
+
+class TestRetryPolicy:
+    """Test retry policy configuration and backoff."""
+
+    def test_policy_defaults_and_overrides(self, monitor):
+        """Test service settings override global ones, which override defaults."""
+        monitor.config["retry"] = {"backoff": 2, "jitter": 0}
+        service = make_service(retry={"backoff_max": 3})
+
+        policy = monitor._retry_policy(service)
+
+        assert policy["backoff"] == 2
+        assert policy["backoff_max"] == 3
+        assert policy["jitter"] == 0
+        assert policy["deadline"] == 15
+
+    def test_backoff_is_exponential_and_capped(self, monitor):
+        """Test delays double and stop at backoff_max."""
+        policy = monitor._retry_policy(make_service(retry={"jitter": 0}))
+
+        delays = [monitor._backoff_delay(policy, retry) for retry in range(7)]
+
+        assert delays == [0.5, 1, 2, 4, 8, 10, 10]
+
+    def test_backoff_jitter_bounds(self, monitor):
+        """Test jitter stays within the configured fraction."""
+        policy = monitor._retry_policy(make_service(retry={"jitter": 0.5}))
+
+        delays = {monitor._backoff_delay(policy, 1) for _ in range(50)}
+
+        assert all(0.5 <= delay <= 1.5 for delay in delays)
+        assert len(delays) > 1
+
+
+class TestRetryRound:
+    """Test retry rounds on virtual time."""
+
+    def test_dead_service_detected_within_deadline(self, monitor):
+        """Test a hanging service is declared DOWN once the deadline passes."""
+        clock = monitor.clock
+        service = make_service(retry={"deadline": 6, "jitter": 0})
+        timeouts = []
+
+        async def hang(service):
+            timeouts.append(service["timeout"])
+            await clock.sleep(3600)
+
+        is_up, reason = clock.run(monitor._run_check_round("svc", service, hang))
+
+        assert is_up is False
+        assert clock.monotonic() == pytest.approx(6)
+        # The second attempt only gets what is left of the deadline
+        assert timeouts == [5, 0.5]
+        assert reason == "Timed out after 0.5 seconds"
+        labels = {"service": "svc", "type": "port"}
+        assert monitor.metrics.check_attempts.get(**labels) == 2
+        assert monitor.metrics.check_failures.get(**labels) == 2
+
+    def test_failures_use_backoff(self, monitor):
+        """Test fast failures retry after growing delays."""
+        clock = monitor.clock
+        service = make_service(retry={"jitter": 0})
+        started_at = []
+
+        async def refuse(service):
+            started_at.append(clock.monotonic())
+            return False
+
+        is_up, reason = clock.run(monitor._run_check_round("svc", service, refuse))
+
+        assert is_up is False
+        assert reason == "Could not connect to port 80"
+        assert started_at == [0, 0.5, 1.5]
+
+    def test_success_after_retry(self, monitor):
+        """Test a round is UP once an attempt succeeds."""
+        clock = monitor.clock
+        results = iter([False, True])
+
+        async def flaky(service):
+            return next(results)
+
+        is_up, reason = clock.run(
+            monitor._run_check_round("svc", make_service(), flaky)
+        )
+
+        assert is_up is True
+        assert reason is None
+        assert len(monitor.latency_samples["svc"]) == 1
+
+    def test_exception_reason(self, monitor):
+        """Test exceptions from a check become the failure reason."""
+
+        async def broken(service):
+            raise ValueError("boom")
+
+        is_up, reason = monitor.clock.run(
+            monitor._run_check_round("svc", make_service(max_tries=1), broken)
+        )
+
+        assert is_up is False
+        assert reason == "boom"
+
+
+class TestHedgedAttempts:
+    """Test hedged attempts for slow checks."""
+
+    def test_slow_attempt_is_hedged(self, monitor):
+        """Test a second attempt starts once the first exceeds the percentile."""
+        clock = monitor.clock
+        service = make_service(retry={"hedge_percentile": 0.95, "hedge_min_samples": 5})
+        monitor.latency_samples["svc"] = deque([0.1, 0.1, 0.2, 0.2, 0.3], maxlen=100)
+        calls = []
+
+        async def check(service):
+            calls.append(clock.monotonic())
+            # The first request got stuck, the hedge answers quickly
+            await clock.sleep(60 if len(calls) == 1 else 0.1)
+            return True
+
+        is_up, _ = clock.run(monitor._run_check_round("svc", service, check))
+
+        assert is_up is True
+        assert calls == [0, pytest.approx(0.3)]
+        assert clock.monotonic() == pytest.approx(0.4)
+        assert monitor.metrics.check_hedges.get(service="svc", type="port") == 1
+
+    def test_hedges_are_shared(self, monitor):
+        """Test services probing the same target share the hedged attempt."""
+        clock = monitor.clock
+        service = make_service(retry={"hedge_percentile": 0.95, "hedge_min_samples": 5})
+        calls = []
+        for name in ("svc-a", "svc-b"):
+            monitor.latency_samples[name] = deque([0.1, 0.2, 0.3, 0.3, 0.3])
+
+        async def check(service):
+            calls.append(clock.monotonic())
+            await clock.sleep(60 if len(calls) == 1 else 0.1)
+            return True
+
+        async def both():
+            return await asyncio.gather(
+                monitor._run_check_round("svc-a", service, check),
+                monitor._run_check_round("svc-b", service, check),
+            )
+
+        results = clock.run(both())
+
+        assert [is_up for is_up, _ in results] == [True, True]
+        assert calls == [0, pytest.approx(0.3)]
+        # One join of the stuck attempt, one of the hedge
+        assert monitor.probe_coalescer.saved == 2
+
+    def test_fast_attempt_is_not_hedged(self, monitor):
+        """Test healthy services never get a second attempt."""
+        clock = monitor.clock
+        service = make_service(retry={"hedge_percentile": 0.95, "hedge_min_samples": 5})
+        monitor.latency_samples["svc"] = deque([0.5] * 10, maxlen=100)
+        calls = []
+
+        async def check(service):
+            calls.append(clock.monotonic())
+            await clock.sleep(0.2)
+            return True
+
+        clock.run(monitor._run_check_round("svc", service, check))
+
+        assert len(calls) == 1
+        assert monitor.metrics.check_hedges.get(service="svc", type="port") == 0
+
+    def test_hedge_needs_samples(self, monitor):
+        """Test hedging stays off until enough latencies are known."""
+        policy = monitor._retry_policy(make_service(retry={"hedge_percentile": 0.9}))
+        monitor.latency_samples["svc"] = deque([0.1] * 5)
+
+        assert monitor._hedge_delay("svc", policy) is None
+
+    def test_both_hedged_attempts_fail(self, monitor):
+        """Test the attempt fails when the original and the hedge fail."""
+        clock = monitor.clock
+        service = make_service(
+            max_tries=1, retry={"hedge_percentile": 0.5, "hedge_min_samples": 1}
+        )
+        monitor.latency_samples["svc"] = deque([0.1])
+
+        async def check(service):
+            await clock.sleep(1)
+            return False
+
+        is_up, _ = clock.run(monitor._run_check_round("svc", service, check))
+
+        assert is_up is False
+        assert monitor.metrics.check_hedges.get(service="svc", type="port") == 1
@@ -0,0 +1,211 @@
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import pytest
+import yaml
+
+from uptime_monitor import ServiceMonitor
+from uptime_monitor.clock import VirtualClock
+from uptime_monitor.dashboard import WebServiceMonitor
+from uptime_monitor.rollups import UptimeRollups, cover, sla_main, sla_report
+
+DAY = 86400
+# A fixed "now" at 2024-06-30 12:34:56 UTC
+NOW = datetime(2024, 6, 30, 12, 34, 56, tzinfo=timezone.utc).timestamp()
+
+
+@pytest.fixture
+def rollups():
+    with tempfile.TemporaryDirectory() as directory:
+        yield UptimeRollups(os.path.join(directory, "rollups.db"))
+
+
+class TestCover:
+    """Test splitting ranges into buckets of mixed resolution."""
+
+    def test_coarse_buckets_with_fine_edges(self, rollups):
+        """Test whole days use day buckets and the edges finer ones."""
+        start = NOW - 30 * DAY
+
+        segments = cover(start, NOW, NOW, rollups.retention)
+
+        # The old edge is past minute retention and is read from its hour
+        sizes = sorted(size for size, _, _ in segments)
+        assert sizes == [60, 3600, 3600, 3600, DAY]
+        day = [segment for segment in segments if segment[0] == DAY][0]
+        assert (day[2] - day[1]) // DAY == 29
+        # Together the segments cover the range without overlapping
+        covered = sorted((first, last) for _, first, last in segments)
+        assert covered[0][0] <= start and covered[-1][1] >= NOW
+        assert all(a[1] == b[0] for a, b in zip(covered, covered[1:]))
+
+    def test_old_edges_rounded_out(self, rollups):
+        """Test edges older than the fine retention use coarse buckets."""
+        segments = cover(NOW - 365 * DAY, NOW - 200 * DAY, NOW, rollups.retention)
+
+        assert {size for size, _, _ in segments} == {DAY}
+
+    def test_empty_range(self, rollups):
+        """Test an empty range reads nothing."""
+        assert cover(NOW, NOW, NOW, rollups.retention) == []
+
+
+class TestUptimeRollups:
+    """Test recording, flushing and summarizing results."""
+
+    def test_summary_from_pending_and_flushed(self, rollups):
+        """Test results count before and after they are flushed."""
+        for minute in range(100):
+            at = NOW - 3 * 3600 + minute * 60
+            rollups.record("web", at, minute % 10 != 0, 0.2)
+
+        before = rollups.summary("web", NOW - DAY, NOW, NOW)
+        rollups.flush(NOW)
+        after = rollups.summary("web", NOW - DAY, NOW, NOW)
+
+        assert before == after
+        assert after["total"] == 100
+        assert after["up"] == 90
+        assert after["uptime"] == 90.0
+        assert after["latency_avg"] == pytest.approx(0.2)
+        assert after["latency_p95"] == 0.25
+
+    def test_partial_range(self, rollups):
+        """Test a range ending mid-hour only counts results inside it."""
+        for minute in range(120):
+            rollups.record("web", NOW - 7200 + minute * 60, True)
+        rollups.flush(NOW)
+
+        summary = rollups.summary("web", NOW - 3600, NOW, NOW)
+
+        assert summary["total"] == 60
+
+    def test_retention_drops_fine_buckets_only(self, rollups):
+        """Test old minute buckets are dropped while coarse counts remain."""
+        old = NOW - 10 * DAY
+        rollups.record("web", old, False)
+        rollups.record("web", NOW, True)
+        rollups.flush(NOW)
+
+        summary = rollups.summary("web", NOW - 30 * DAY, NOW, NOW)
+
+        assert summary["total"] == 2
+        assert summary["uptime"] == 50.0
+        assert rollups.services() == ["web"]
+
+    def test_sla_report(self, rollups):
+        """Test the report summarizes each requested period."""
+        rollups.record("web", NOW - 40 * DAY, False)
+        rollups.record("web", NOW - 1, True)
+
+        report = sla_report(rollups, ["web", "db"], [30, 90], NOW)
+
+        assert report["web"]["30d"]["uptime"] == 100.0
+        assert report["web"]["90d"]["uptime"] == 50.0
+        assert report["db"]["30d"]["uptime"] is None
+
+    def test_cli(self, rollups, capsys):
+        """Test the SLA command prints a table from the configured file."""
+        rollups.record("web", time.time() - 60, True)
+        rollups.flush()
+        with tempfile.NamedTemporaryFile(mode="w", suffix=".yaml", delete=False) as f:
+            yaml.dump({"rollups": {"file": rollups.path}}, f)
+
+        args = argparse.Namespace(config=f.name, service=None, days=[30], json=False)
+        try:
+            assert sla_main(args) == 0
+        finally:
+            os.unlink(f.name)
+
+        lines = capsys.readouterr().out.splitlines()
+        assert lines[0].split() == ["Service", "30d"]
+        assert lines[1].split() == ["web", "100.000%"]
+
+
+class TestMonitorRollups:
+    """Test the monitor feeding rollups and the SLA API."""
+
+    def write_config(self, path):
+        config = {
+            "email": {},
+            "timezone": "UTC",
+            "dashboard": {"password": "testpass"},
+            "metrics": {"event_loop_interval": 3600},
+            "rollups": {"file": path},
+            "services": {
+                "web": {
+                    "type": "port",
+                    "host": "example.com",
+                    "port": 80,
+                    "timeout": 5,
+                    "interval": 60,
+                    "max_tries": 1,
+                }
+            },
+        }
+        with tempfile.NamedTemporaryFile(mode="w", suffix=".yaml", delete=False) as f:
+            yaml.dump(config, f)
+        return f.name
+
+    def test_rounds_recorded(self, rollups):
+        """Test each check round is recorded and flushed on shutdown."""
+        config_file = self.write_config(rollups.path)
+        monitor = ServiceMonitor(config_file, clock=VirtualClock())
+        logging.getLogger().setLevel(logging.WARNING)
+        os.unlink(config_file)
+
+        async def check_port(service):
+            await monitor.clock.sleep(0.1)
+            return True
+
+        async def run_inline(pool, func, *args):
+            # Executor threads don't advance with virtual time
+            return func(*args)
+
+        async def run():
+            task = asyncio.create_task(monitor.start_monitoring())
+            await monitor.clock.sleep(599)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        monitor._check_port = check_port
+        monitor._run_blocking = run_inline
+        monitor.clock.run(run())
+
+        now = monitor.clock.now(timezone.utc).timestamp()
+        summary = UptimeRollups(rollups.path).summary("web", now - DAY, now, now)
+        assert summary["total"] == 10
+        assert summary["latency_avg"] == pytest.approx(0.1)
+
+    def test_sla_api(self, rollups):
+        """Test the SLA API reports configured services."""
+        config_file = self.write_config(rollups.path)
+        monitor = WebServiceMonitor(config_file)
+        os.unlink(config_file)
+        client = monitor.app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = "1"
+            session["_fresh"] = True
+        monitor.rollups.record("web", datetime.now(timezone.utc).timestamp(), True)
+
+        data = client.get("/api/sla?days=7").get_json()
+        invalid = client.get("/api/sla?days=week")
+
+        assert data == {
+            "web": {
+                "7d": {
+                    "up": 1,
+                    "total": 1,
+                    "uptime": 100.0,
+                    "latency_avg": None,
+                    "latency_p95": None,
+                    "buckets_read": data["web"]["7d"]["buckets_read"],
+                }
+            }
+        }
+        assert invalid.status_code == 400
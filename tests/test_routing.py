@@ -0,0 +1,203 @@
+import os
+import tempfile
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pytest
+import yaml
+
+from uptime_monitor import ServiceMonitor
+from uptime_monitor.routing import AlertRouter, Delivery
+
+# A Wednesday
+NOON = datetime(2024, 1, 17, 12, 0)
+NIGHT = datetime(2024, 1, 17, 23, 30)
+
+SERVICES = {
+    "db-main": {"type": "port", "tags": ["db", "prod"]},
+    "db-replica": {"type": "port", "tags": ["db"], "severity": "warning"},
+    "web-shop": {"type": "http", "tags": ["prod"]},
+    "web-blog": {"type": "http", "severity": "info"},
+}
+
+
+def route_names(router, service, status="DOWN", now=NOON):
+    return router.route(service, SERVICES.get(service, {}), status, now).routes
+
+
+class TestAlertRouter:
+    """Test compiled alert routing rules."""
+
+    def test_first_match_wins(self):
+        """Test rules apply in order and the first match stops routing."""
+        router = AlertRouter(
+            [
+                {"name": "dba", "match": {"tags": "db"}, "email": "dba@x"},
+                {"name": "prod", "match": {"tags": ["prod"]}, "email": "ops@x"},
+            ],
+            SERVICES,
+        )
+
+        assert router.route("db-main", SERVICES["db-main"], "DOWN", NOON) == Delivery(
+            ("dba",), ("dba@x",), ()
+        )
+        assert route_names(router, "web-shop") == ("prod",)
+        assert router.route("web-blog", SERVICES["web-blog"], "DOWN", NOON) == (
+            Delivery(("default",), None, None)
+        )
+
+    def test_continue(self):
+        """Test a rule with continue adds its channels to later matches."""
+        router = AlertRouter(
+            [
+                {
+                    "name": "audit",
+                    "webhooks": "ingest",
+                    "email": "audit@x",
+                    "continue": True,
+                },
+                {"name": "dba", "match": {"tags": "db"}, "email": ["dba@x", "audit@x"]},
+            ],
+            SERVICES,
+            webhooks=["ingest"],
+        )
+
+        delivery = router.route("db-main", SERVICES["db-main"], "DOWN", NOON)
+
+        assert delivery == Delivery(("audit", "dba"), ("audit@x", "dba@x"), ("ingest",))
+
+    def test_only_continue_rules_keep_defaults(self):
+        """Test alerts matching only continue rules still reach the defaults."""
+        router = AlertRouter(
+            [
+                {"name": "audit", "webhooks": "ingest", "continue": True},
+                {"name": "dba", "match": {"tags": "db"}, "email": "dba@x"},
+            ],
+            SERVICES,
+            webhooks=["ops", "ingest"],
+            default_emails="ops@x",
+        )
+
+        delivery = router.route("web-shop", SERVICES["web-shop"], "DOWN", NOON)
+
+        assert delivery == Delivery(("audit", "default"), ("ops@x",), ("ingest", "ops"))
+        assert route_names(router, "db-main") == ("audit", "dba")
+
+    def test_match_dimensions(self):
+        """Test name globs, type, severity and status conditions."""
+        router = AlertRouter(
+            [
+                {"name": "web-up", "match": {"services": "web-*", "status": "UP"}},
+                {"name": "exact", "match": {"services": ["db-replica"]}},
+                {"name": "ports", "match": {"type": "port", "severity": "critical"}},
+                {"name": "quiet", "match": {"severity": ["warning", "info"]}},
+            ],
+            SERVICES,
+        )
+
+        assert route_names(router, "web-shop", "UP") == ("web-up",)
+        assert route_names(router, "web-shop", "DOWN") == ("default",)
+        assert route_names(router, "web-blog", "DOWN") == ("quiet",)
+        assert route_names(router, "db-replica") == ("exact",)
+        assert route_names(router, "db-main") == ("ports",)
+
+    def test_services_missing_from_config(self):
+        """Test services unknown at load time are matched on first use."""
+        router = AlertRouter([{"name": "db", "match": {"services": "db-*"}}], {})
+
+        assert route_names(router, "db-new") == ("db",)
+        assert route_names(router, "web-new") == ("default",)
+
+    def test_time_windows(self):
+        """Test hours (also across midnight) and days limit a rule."""
+        router = AlertRouter(
+            [
+                {"name": "night", "match": {"hours": "22:00-07:00"}},
+                {"name": "weekend", "match": {"days": ["sat", "sun"]}},
+                {"name": "office", "match": {"hours": "09:00-17:00", "days": "wed"}},
+            ],
+            SERVICES,
+        )
+
+        assert route_names(router, "web-shop", now=NIGHT) == ("night",)
+        assert route_names(router, "web-shop", now=NOON) == ("office",)
+        assert route_names(router, "web-shop", now=datetime(2024, 1, 20, 12)) == (
+            "weekend",
+        )
+        assert route_names(router, "web-shop", now=datetime(2024, 1, 17, 17)) == (
+            "default",
+        )
+
+    def test_invalid_rules(self):
+        """Test references to unknown webhooks, severities and days fail."""
+        with pytest.raises(ValueError, match="unknown webhook slack"):
+            AlertRouter([{"webhooks": ["slack"]}], SERVICES)
+        with pytest.raises(ValueError, match="unknown severity urgent"):
+            AlertRouter([{"match": {"severity": "urgent"}}], SERVICES)
+        with pytest.raises(ValueError, match="unknown day monday"):
+            AlertRouter([{"match": {"days": "monday"}}], SERVICES)
+
+    def test_many_rules(self):
+        """Test routing with thousands of services and hundreds of rules."""
+        services = {
+            f"svc-{i}": {"type": "http", "tags": [f"team-{i % 300}"]}
+            for i in range(5000)
+        }
+        routes = [
+            {"name": f"team-{t}", "match": {"tags": f"team-{t}"}} for t in range(300)
+        ]
+        router = AlertRouter(routes, services)
+
+        assert route_names(router, "svc-4321") == ("team-121",)
+        assert router._candidates["svc-4321"] == 1 << 121
+
+
+class TestMonitorRouting:
+    """Test the monitor alerting on routed channels."""
+
+    @pytest.fixture
+    def monitor(self):
+        config = {
+            "email": {
+                "smtp_server": "smtp.test.com",
+                "smtp_port": 587,
+                "username": "monitor@test.com",
+                "password": "secret",
+            },
+            "timezone": "UTC",
+            "routes": [
+                {"name": "dba", "match": {"tags": "db"}, "email": "dba@test.com"},
+                {"name": "silent", "match": {"services": "web-*"}},
+            ],
+            "services": {
+                "db": {"type": "port", "host": "db", "port": 5432, "tags": ["db"]},
+                "web-1": {"type": "http", "url": "http://web-1"},
+                "api": {"type": "http", "url": "http://api"},
+            },
+        }
+        with tempfile.NamedTemporaryFile(mode="w", suffix=".yaml", delete=False) as f:
+            yaml.dump(config, f)
+        monitor = ServiceMonitor(f.name)
+        os.unlink(f.name)
+        monitor._send_email_sync = MagicMock()
+        return monitor
+
+    async def test_routed_recipients(self, monitor):
+        """Test routed alerts go to the route's recipients and are counted."""
+        await monitor._notify("db", "DOWN", "Could not connect to port 5432")
+        await monitor._notify("web-1", "DOWN")
+        await monitor._notify("api", "DOWN")
+
+        (message,), _ = monitor._send_email_sync.call_args
+        assert message["To"] == "dba@test.com"
+        # web-1 is routed nowhere, api has no route and no default recipient
+        assert monitor._send_email_sync.call_count == 1
+        metrics = monitor.metrics
+        assert metrics.route_matches.get(route="silent", status="DOWN") == 1
+        assert metrics.route_matches.get(route="default", status="DOWN") == 1
+        assert (
+            metrics.route_notifications.get(
+                route="dba", channel="email", outcome="sent"
+            )
+            == 1
+        )
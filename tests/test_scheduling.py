@@ -0,0 +1,120 @@
+import pytest
+
+from uptime_monitor.scheduling import IntervalScheduler
+
+
+def make_config(count=1, interval=300, adaptive=None, probe_budget=None):
+    services = {
+        f"svc-{index}": {"type": "ping", "host": "example.com", "interval": interval}
+        for index in range(count)
+    }
+    config = {"services": services}
+    if adaptive is not None:
+        config["adaptive"] = adaptive
+    if probe_budget is not None:
+        config["probe_budget"] = probe_budget
+    return config
+
+
+class TestIntervalScheduler:
+    """Test adaptive intervals and the global probe budget."""
+
+    def test_fixed_interval_by_default(self):
+        """Test services keep their interval when adaptive mode is off."""
+        config = make_config()
+        scheduler = IntervalScheduler(config)
+        service = config["services"]["svc-0"]
+
+        assert scheduler.next_interval("svc-0", service, True) == 300
+        assert scheduler.next_interval("svc-0", service, False) == 300
+
+    def test_stable_service_backs_off_to_max(self):
+        """Test intervals grow per stable round up to max_interval."""
+        config = make_config(adaptive={"enabled": True, "max_interval": 900})
+        scheduler = IntervalScheduler(config)
+        service = config["services"]["svc-0"]
+
+        intervals = [scheduler.next_interval("svc-0", service, True) for _ in range(7)]
+
+        assert intervals == [300, 300, 300, 450, 675, 900, 900]
+
+    def test_flapping_service_does_not_back_off(self):
+        """Test backoff waits for stable_rounds consecutive UP rounds."""
+        config = make_config(
+            adaptive={"enabled": True, "recovery_rounds": 0, "stable_rounds": 2}
+        )
+        scheduler = IntervalScheduler(config)
+        service = config["services"]["svc-0"]
+
+        outcomes = [True, True, False, True, True, False, True, True, True]
+        intervals = [
+            scheduler.next_interval("svc-0", service, is_up) for is_up in outcomes
+        ]
+
+        assert intervals == [300, 300, 60, 300, 300, 60, 300, 300, 450]
+
+    def test_failure_and_recovery_probe_fast(self):
+        """Test DOWN rounds and the first rounds after recovery use min_interval."""
+        config = make_config(
+            adaptive={"enabled": True, "min_interval": 30, "recovery_rounds": 2}
+        )
+        scheduler = IntervalScheduler(config)
+        service = config["services"]["svc-0"]
+
+        for _ in range(3):
+            scheduler.next_interval("svc-0", service, True)
+        outcomes = [False, False, True, True, True, True]
+        intervals = [
+            scheduler.next_interval("svc-0", service, is_up) for is_up in outcomes
+        ]
+
+        # After the fast rounds the stability count starts over
+        assert intervals == [30, 30, 30, 30, 300, 300]
+
+    def test_defaults_relative_to_interval(self):
+        """Test min and max intervals default relative to the service interval."""
+        scheduler = IntervalScheduler(make_config(adaptive={"enabled": True}))
+
+        settings = scheduler.settings({"interval": 100})
+
+        assert settings["min_interval"] == 20
+        assert settings["max_interval"] == 400
+
+    def test_service_overrides_global(self):
+        """Test per-service adaptive settings win over global ones."""
+        config = make_config(adaptive={"enabled": True})
+        config["services"]["svc-0"]["adaptive"] = {"enabled": False}
+        scheduler = IntervalScheduler(config)
+
+        assert (
+            scheduler.next_interval("svc-0", config["services"]["svc-0"], True) == 300
+        )
+
+    def test_budget_stretches_all_intervals(self):
+        """Test demand above the probe budget stretches every interval."""
+        config = make_config(count=100, interval=10, probe_budget=5)
+        scheduler = IntervalScheduler(config)
+
+        assert scheduler.demand == pytest.approx(10)
+        assert scheduler.stretch == pytest.approx(2)
+        assert scheduler.effective_interval("svc-0") == pytest.approx(20)
+        assert scheduler.desired_interval("svc-0") == 10
+
+    def test_demand_tracks_interval_changes(self):
+        """Test demand is updated incrementally as intervals change."""
+        config = make_config(
+            count=2, interval=10, adaptive={"enabled": True, "min_interval": 1}
+        )
+        scheduler = IntervalScheduler(config)
+        service = config["services"]["svc-0"]
+
+        scheduler.next_interval("svc-0", service, False)
+
+        assert scheduler.demand == pytest.approx(1 + 0.1)
+
+    def test_unknown_service_registered(self):
+        """Test services added after start are registered on first use."""
+        scheduler = IntervalScheduler({"services": {}})
+
+        assert scheduler.next_interval("new", {"interval": 60}, True) == 60
+        assert scheduler.effective_interval("missing") is None
@@ -267,7 +267,6 @@ class TestEmailNotifications:
             assert "test-service" in msg.get_content()
             assert "UP" in msg.get_content()
             assert "Total downtime" in msg.get_content()
-            assert "test-service" not in monitor.down_since
 
         os.unlink(config_file)
 
@@ -0,0 +1,119 @@
+from uptime_monitor.status_index import StatusIndex, service_host
+
+
+def make_services():
+    services = {}
+    for index in range(40):
+        services[f"web-{index:02d}"] = {
+            "type": "http",
+            "url": f"https://web{index % 4}.example.com/health",
+            "tags": ["prod" if index % 2 == 0 else "staging"],
+        }
+    for index in range(10):
+        services[f"db-{index:02d}"] = {
+            "type": "port",
+            "host": "db.example.com",
+            "port": 5432,
+            "tags": ["prod", "database"],
+        }
+    return services
+
+
+class TestStatusIndex:
+    """Test the inverted status indexes."""
+
+    def test_service_host(self):
+        """Test the host is taken from the URL for HTTP services."""
+        assert service_host({"url": "https://example.com:8443/x"}) == "example.com"
+        assert service_host({"host": "db.local"}) == "db.local"
+        assert service_host({}) is None
+
+    def test_initial_status_unknown(self):
+        """Test every service starts as UNKNOWN."""
+        index = StatusIndex(make_services())
+
+        assert len(index) == 50
+        assert index.counts() == {"UNKNOWN": 50}
+
+    def test_set_status_moves_between_sets(self):
+        """Test status updates move services between index sets."""
+        index = StatusIndex(make_services())
+
+        index.set_status("web-00", "DOWN")
+        index.set_status("web-01", "UP")
+        index.set_status("web-01", "DOWN")
+        index.set_status("missing", "DOWN")
+
+        assert index.status("web-01") == "DOWN"
+        assert index.by_status["DOWN"] == {"web-00", "web-01"}
+        assert index.counts() == {"UNKNOWN": 48, "DOWN": 2}
+
+    def test_query_combines_filters(self):
+        """Test DOWN http services tagged prod."""
+        index = StatusIndex(make_services())
+        for name in ("web-00", "web-01", "web-02", "db-03"):
+            index.set_status(name, "DOWN")
+
+        total, names = index.query(status=["DOWN"], type=["http"], tag=["prod"])
+
+        assert total == 2
+        assert names == ["web-00", "web-02"]
+
+    def test_query_or_within_filter(self):
+        """Test several values of one filter match any of them."""
+        index = StatusIndex(make_services())
+
+        total, _ = index.query(tag=["staging", "database"])
+
+        assert total == 30
+
+    def test_query_by_host(self):
+        """Test filtering by host derived from URLs."""
+        index = StatusIndex(make_services())
+
+        total, names = index.query(host=["web1.example.com"], per_page=3)
+
+        assert total == 10
+        assert names == ["web-01", "web-05", "web-09"]
+
+    def test_pagination_and_search(self):
+        """Test paging through unfiltered and searched results."""
+        index = StatusIndex(make_services())
+
+        total, first = index.query(per_page=20)
+        _, third = index.query(page=3, per_page=20)
+        search_total, found = index.query(search="DB-0", per_page=5)
+
+        assert total == 50
+        assert first[0] == "db-00" and len(first) == 20
+        assert third == [f"web-{i:02d}" for i in range(30, 40)]
+        assert search_total == 10
+        assert found == ["db-00", "db-01", "db-02", "db-03", "db-04"]
+
+    def test_search_by_name_grams(self):
+        """Test short and long searches match anywhere in the name."""
+        index = StatusIndex(make_services())
+
+        assert index.query(search="db")[0] == 10
+        assert index.query(search="1")[1][:2] == ["db-01", "web-01"]
+        assert index.query(search="Web-3")[0] == 10
+        assert index.query(search="eb-39")[1] == ["web-39"]
+        assert index.query(search="web-399") == (0, [])
+        assert index.query(search="web-3", tag=["staging"])[0] == 5
+
+    def test_sort_by_status_and_type(self):
+        """Test status sort lists problems first and type sort groups types."""
+        index = StatusIndex(make_services())
+        index.set_status("web-10", "DOWN")
+        index.set_status("db-05", "MAINTENANCE")
+        index.set_status("web-20", "UP")
+
+        _, by_status = index.query(sort="status", per_page=50)
+        _, by_type = index.query(sort="type", per_page=50)
+        _, small = index.query(tag=["database"], sort="type", per_page=2)
+
+        assert by_status[0] == "web-10"
+        assert by_status[-2:] == ["db-05", "web-20"]
+        assert by_type[:10] == [f"web-{i:02d}" for i in range(10)]
+        assert by_type[-1] == "db-09"
+        assert small == ["db-00", "db-01"]
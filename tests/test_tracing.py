@@ -0,0 +1,70 @@
+import os
+
+import pytest
+from aiohttp import web
+
+from uptime_monitor import ServiceMonitor
+from uptime_monitor.probes import target_key
+from uptime_monitor.tracing import HttpPhaseTimings
+
+
+class TestHttpPhaseTimings:
+    """Test conversion of trace marks into phase durations."""
+
+    def test_finish_computes_phases(self):
+        """Test phases are derived from the recorded marks."""
+        timings = HttpPhaseTimings()
+        timings._marks = {
+            "request_start": 0.0,
+            "connect_start": 0.0,
+            "dns_start": 0.0,
+            "dns_end": 0.01,
+            "connect_end": 0.05,
+            "headers_sent": 0.05,
+            "response_start": 0.2,
+        }
+
+        phases = timings.finish()
+
+        assert phases["dns"] == pytest.approx(0.01)
+        assert phases["connect"] == pytest.approx(0.04)
+        assert phases["ttfb"] == pytest.approx(0.15)
+        assert phases["total"] == pytest.approx(0.2)
+
+    def test_finish_without_marks(self):
+        """Test no phases are reported when nothing was traced."""
+        assert HttpPhaseTimings().finish() == {}
+
+
+class TestHttpCheckTracing:
+    """Test phase timings recorded by real HTTP checks."""
+
+    @pytest.mark.asyncio
+    async def test_http_check_records_phases(self, config_file):
+        """Test an HTTP check against a local server records its phases."""
+
+        async def handler(request):
+            return web.Response(text="ok")
+
+        app = web.Application()
+        app.router.add_get("/", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        url = f"http://127.0.0.1:{port}/"
+
+        monitor = ServiceMonitor(config_file)
+        try:
+            service = {"type": "http", "url": url, "timeout": 5}
+            assert await monitor._check_http(service)
+        finally:
+            await runner.cleanup()
+
+        phases = monitor.http_timings[target_key(service)]
+        assert {"connect", "ttfb", "total"} <= set(phases)
+        assert phases["total"] >= phases["ttfb"]
+        assert monitor.metrics.http_phase_duration.get(phase="total").count == 1
+
+        os.unlink(config_file)
@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import os
+import tempfile
+from datetime import datetime, timezone
+
+import pytest
+import yaml
+
+from uptime_monitor import ServiceMonitor
+from uptime_monitor.clock import VirtualClock
+from uptime_monitor.dashboard import WebServiceMonitor
+from uptime_monitor.transitions import INDEX_EVERY, Run, TransitionLog
+
+T0 = datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp()
+
+
+@pytest.fixture
+def directory():
+    with tempfile.TemporaryDirectory() as directory:
+        yield directory
+
+
+def flap(log, service, count, period=3600):
+    """Alternate DOWN and UP every period, starting UP at T0."""
+    for index in range(count):
+        state = "UP" if index % 2 == 0 else "DOWN"
+        log.append(service, T0 + index * period, state, "refused" * (state == "DOWN"))
+
+
+class TestTransitionLog:
+    """Test the run-length encoded transition log."""
+
+    def test_only_changes_are_stored(self, directory):
+        """Test repeated states don't grow the log."""
+        log = TransitionLog(directory)
+
+        assert log.append("web", T0, "UP")
+        assert not log.append("web", T0 + 60, "UP")
+        assert log.append("web", T0 + 120, "DOWN", "Timed out after 5 seconds")
+        assert not log.append("web", T0 + 180, "DOWN", "Timed out after 5 seconds")
+
+        size = os.path.getsize(os.path.join(directory, "web.log"))
+        assert size < 50
+        assert log.timeline("web", T0, T0 + 300) == [
+            Run(T0, T0 + 120, "UP", None),
+            Run(T0 + 120, T0 + 300, "DOWN", "Timed out after 5 seconds"),
+        ]
+
+    def test_timeline_clipped_to_range(self, directory):
+        """Test runs overlapping the range edges are cut at them."""
+        log = TransitionLog(directory)
+        flap(log, "web", 4)
+
+        runs = log.timeline("web", T0 + 1800, T0 + 9000)
+
+        assert [(run.start - T0, run.end - T0, run.state) for run in runs] == [
+            (1800, 3600, "UP"),
+            (3600, 7200, "DOWN"),
+            (7200, 9000, "UP"),
+        ]
+        assert log.timeline("web", T0 + 20000)[0].end is None
+
+    def test_indexed_reads_match_full_scan(self, directory):
+        """Test reads starting from an index entry decode the same runs."""
+        log = TransitionLog(directory)
+        flap(log, "web", INDEX_EVERY * 5 + 3)
+        all_runs = log.timeline("web", T0, T0 + 10**7)
+
+        start, end = T0 + 3600 * 150.5, T0 + 3600 * 170
+        expected = [run for run in all_runs if run.end > start and run.start < end]
+
+        runs = log.timeline("web", start, end)
+
+        assert [(run.state, run.reason) for run in runs] == [
+            (run.state, run.reason) for run in expected
+        ]
+        assert runs[0].start == start
+        assert runs[-1].end == end
+
+    def test_reopen_continues_log(self, directory):
+        """Test a new instance resumes from the tail on disk."""
+        flap(TransitionLog(directory), "web", INDEX_EVERY + 1)
+        log = TransitionLog(directory)
+
+        assert not log.append("web", T0 + 10**6, "UP")
+        assert log.append("web", T0 + 10**6, "DOWN")
+        runs = log.timeline("web", T0, T0 + 10**6 + 1)
+        assert len(runs) == INDEX_EVERY + 2
+        assert runs[-1].state == "DOWN"
+
+    def test_torn_record_dropped(self, directory):
+        """Test a record cut off by a crash is ignored and overwritten."""
+        flap(TransitionLog(directory), "web", 2)
+        with open(os.path.join(directory, "web.log"), "ab") as f:
+            f.write(b"\x85")  # first byte of an unfinished varint
+
+        log = TransitionLog(directory)
+        assert len(log.timeline("web", T0, T0 + 7200)) == 2
+        log.append("web", T0 + 7200, "UP")
+        assert [run.state for run in log.timeline("web", T0, T0 + 8000)] == [
+            "UP",
+            "DOWN",
+            "UP",
+        ]
+
+    def test_incident_stats(self, directory):
+        """Test incidents, MTTR and MTBF come straight from the runs."""
+        log = TransitionLog(directory)
+        log.append("web", T0, "UP")
+        log.append("web", T0 + 1000, "DOWN", "refused")
+        log.append("web", T0 + 1100, "UP")
+        log.append("web", T0 + 5000, "DOWN", "refused")
+        log.append("web", T0 + 5300, "UP")
+
+        stats = log.stats("web", T0, T0 + 6000)
+
+        assert [run.duration for run in log.incidents("web", T0, T0 + 6000)] == [
+            100,
+            300,
+        ]
+        assert stats == {
+            "incidents": 2,
+            "downtime": 400,
+            "mttr": 200,
+            "mtbf": 2800,
+        }
+
+
+class TestMonitorTransitions:
+    """Test the monitor writing transitions and the incidents API."""
+
+    def write_config(self, directory):
+        config = {
+            "email": {},
+            "timezone": "UTC",
+            "dashboard": {"password": "testpass"},
+            "metrics": {"event_loop_interval": 3600},
+            "transitions": {"directory": directory},
+            "services": {
+                "router": {
+                    "type": "ping",
+                    "host": "router",
+                    "timeout": 1,
+                    "interval": 60,
+                    "max_tries": 1,
+                },
+                "web": {
+                    "type": "ping",
+                    "host": "web",
+                    "timeout": 1,
+                    "interval": 60,
+                    "max_tries": 1,
+                    "depends_on": "router",
+                },
+            },
+        }
+        with tempfile.NamedTemporaryFile(mode="w", suffix=".yaml", delete=False) as f:
+            yaml.dump(config, f)
+        return f.name
+
+    def test_transitions_logged(self, directory):
+        """Test UP, DOWN and UNREACHABLE changes are logged with reasons."""
+        config_file = self.write_config(directory)
+        monitor = ServiceMonitor(config_file, clock=VirtualClock())
+        logging.getLogger().setLevel(logging.WARNING)
+        os.unlink(config_file)
+
+        async def check_ping(service):
+            return not 100 <= monitor.clock.monotonic() < 300
+
+        async def notify(service_name, status, reason=None):
+            pass
+
+        async def run():
+            task = asyncio.create_task(monitor.start_monitoring())
+            await monitor.clock.sleep(599)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        monitor._check_ping = check_ping
+        monitor._send_email_notification = notify
+        monitor.clock.run(run())
+
+        web = monitor.transitions.timeline("web", T0, T0 + 600)
+        router = monitor.transitions.timeline("router", T0, T0 + 600)
+        assert [(run.state, run.start - T0) for run in router] == [
+            ("UP", 0),
+            ("DOWN", 120),
+            ("UP", 300),
+        ]
+        assert [(run.state, run.reason) for run in web] == [
+            ("UP", None),
+            ("UNREACHABLE", "behind router"),
+            ("UP", None),
+        ]
+
+    def test_incidents_api(self, directory):
+        """Test the incidents API reports DOWN episodes and statistics."""
+        config_file = self.write_config(directory)
+        monitor = WebServiceMonitor(config_file, clock=VirtualClock())
+        os.unlink(config_file)
+        client = monitor.app.test_client()
+        with client.session_transaction() as session:
+            session["_user_id"] = "1"
+            session["_fresh"] = True
+        # The range ends at the monitor's clock, not the wall clock
+        now = monitor.clock.now(timezone.utc).timestamp()
+        monitor.transitions.append("router", now - 3600, "UP")
+        monitor.transitions.append("router", now - 1800, "DOWN", "Host unreachable")
+        monitor.transitions.append("router", now - 1200, "UP")
+
+        data = client.get("/api/services/router/incidents?days=1").get_json()
+
+        assert data["incidents"][0]["duration"] == pytest.approx(600)
+        assert data["incidents"][0]["reason"] == "Host unreachable"
+        assert data["mttr"] == pytest.approx(600)
+        assert client.get("/api/services/missing/incidents").status_code == 404
@@ -0,0 +1,155 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytz
+
+from uptime_monitor.clock import Clock, VirtualClock
+
+DAY = 24 * 3600
+
+
+class TestVirtualClock:
+    """Test the virtual time event loop."""
+
+    def test_sleep_advances_virtual_time(self):
+        """Test long sleeps complete instantly and advance the clock."""
+        clock = VirtualClock(datetime(2024, 1, 1, tzinfo=pytz.UTC))
+
+        async def sleeper():
+            await clock.sleep(3 * DAY)
+            return clock.now(pytz.UTC)
+
+        started = time.monotonic()
+        result = clock.run(sleeper())
+
+        assert result == datetime(2024, 1, 4, tzinfo=pytz.UTC)
+        assert clock.monotonic() == 3 * DAY
+        assert time.monotonic() - started < 1
+
+    def test_timeouts_use_virtual_time(self):
+        """Test asyncio timeouts fire on virtual time."""
+        clock = VirtualClock()
+
+        async def slow():
+            try:
+                await asyncio.wait_for(clock.sleep(60), timeout=5)
+            except asyncio.TimeoutError:
+                return clock.monotonic()
+
+        assert clock.run(slow()) == 5
+
+    def test_naive_now(self):
+        """Test now() without a timezone is naive local time, like Clock."""
+        clock = VirtualClock(datetime(2024, 1, 1, 12, 0))
+        clock.advance(90)
+        utc = datetime(2024, 1, 1, 12, 1, 30, tzinfo=timezone.utc)
+
+        assert clock.now() == utc.astimezone().replace(tzinfo=None)
+        assert clock.now(timezone.utc) == utc
+        assert clock.now().tzinfo is Clock().now().tzinfo is None
+
+
+class TestVirtualTimeSimulation:
+    """Simulate the monitor over days of virtual time."""
+
+    def test_outage_retries_and_notifications(self, create_monitor, run_monitor):
+        """Test an outage produces one DOWN and one UP notification."""
+        clock = VirtualClock(datetime(2024, 1, 15, tzinfo=pytz.UTC))
+        service = {
+            "type": "http",
+            "url": "https://example.com",
+            "timeout": 5,
+            "interval": 300,
+            "max_tries": 3,
+        }
+        monitor = create_monitor({"web": service}, clock=clock)
+        outage = (DAY + 10 * 3600, DAY + 12 * 3600)
+        attempts = []
+        notifications = []
+
+        async def check_http(service):
+            attempts.append(clock.monotonic())
+            await clock.sleep(0.2)
+            return not outage[0] <= clock.monotonic() < outage[1]
+
+        async def notify(service_name, status, reason=None):
+            notifications.append((status, clock.monotonic()))
+            if status == "UP":
+                monitor.down_since.pop(service_name, None)
+
+        monitor._check_http = check_http
+        monitor._send_email_notification = notify
+
+        run_monitor(monitor, 2 * DAY)
+
+        assert [status for status, _ in notifications] == ["DOWN", "UP"]
+        # Detected within one interval plus the retry round
+        assert notifications[0][1] - outage[0] < 300 + 3 * 1.2
+        assert notifications[1][1] - outage[1] < 300 + 1
+        # One attempt per healthy round, three per failing round
+        assert len(attempts) > 2 * DAY / 300
+
+    def test_maintenance_window_skips_checks(self, create_monitor, run_monitor):
+        """Test no checks run during a daily maintenance window."""
+        clock = VirtualClock(datetime(2024, 1, 15, tzinfo=pytz.UTC))
+        service = {
+            "type": "port",
+            "host": "example.com",
+            "port": 22,
+            "timeout": 5,
+            "interval": 60,
+            "max_tries": 1,
+            "maintenance_window": {"start": "02:00", "end": "04:00"},
+        }
+        monitor = create_monitor({"ssh": service}, clock=clock)
+        checked_at = []
+
+        async def check_port(service):
+            checked_at.append(clock.now(pytz.UTC))
+            return True
+
+        monitor._check_port = check_port
+
+        run_monitor(monitor, 3 * DAY)
+
+        assert checked_at
+        assert not [moment for moment in checked_at if 2 <= moment.hour < 4]
+        # Checks resume after each window: roughly one per minute outside of it
+        assert len(checked_at) > 3 * (22 * 60 - 5)
+
+    def test_flapping_fleet_scale(self, create_monitor, run_monitor):
+        """Test a large flapping fleet simulates a day in seconds of wall time."""
+        clock = VirtualClock(datetime(2024, 1, 15, tzinfo=pytz.UTC))
+        services = {
+            f"svc-{index}": {
+                "type": "ping",
+                "host": f"host-{index}",
+                "timeout": 2,
+                "interval": 600,
+                "max_tries": 2,
+            }
+            for index in range(200)
+        }
+        monitor = create_monitor(services, clock=clock)
+        notifications = []
+
+        async def check_ping(service):
+            await clock.sleep(0.05)
+            # Every service flaps: down for the first 15 minutes of each
+            # 4-hour block
+            return clock.monotonic() % (4 * 3600) >= 900
+
+        async def notify(service_name, status, reason=None):
+            notifications.append(status)
+
+        monitor._check_ping = check_ping
+        monitor._send_email_notification = notify
+
+        started = time.monotonic()
+        run_monitor(monitor, DAY)
+
+        assert time.monotonic() - started < 30
+        assert notifications.count("DOWN") == 200 * 6
+        assert notifications.count("UP") == 200 * 6
+        assert clock.now(timezone.utc) - clock.start == timedelta(days=1)